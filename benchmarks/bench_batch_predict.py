@@ -0,0 +1,49 @@
+# Rows/sec of predict_crops_batch against the per-call predict_crop path
+# Run from the repository root: python benchmarks/bench_batch_predict.py
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+from model_script import predict_crop, predict_crops_batch
+
+# Same bounds as the number inputs on the prediction page
+LOW = np.array([0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+HIGH = np.array([140, 145, 205, 50.0, 100.0, 14.0, 300.0])
+SIZES = [1_000, 100_000, 1_000_000]
+# The per-call path is far too slow to run to completion at 1M rows, so its
+# rate is measured on a sample and reported as rows/sec
+PER_CALL_SAMPLE = 200
+
+
+def random_samples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return LOW + rng.random((n, len(LOW))) * (HIGH - LOW)
+
+
+def per_call_rate(X):
+    sample = X[:PER_CALL_SAMPLE]
+    start = time.perf_counter()
+    for row in sample:
+        predict_crop(*row)
+    return len(sample) / (time.perf_counter() - start)
+
+
+def batch_rate(X, **kwargs):
+    start = time.perf_counter()
+    predict_crops_batch(X, **kwargs)
+    return len(X) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    print(f"{'rows':>10} {'per-call rows/s':>16} {'batch rows/s':>14} {'threaded rows/s':>16} {'speedup':>8}")
+    for n in SIZES:
+        X = random_samples(n)
+        single = per_call_rate(X)
+        batch = batch_rate(X)
+        threaded = batch_rate(X, chunk_size=25_000, n_threads=os.cpu_count())
+        print(f"{n:>10} {single:>16,.0f} {batch:>14,.0f} {threaded:>16,.0f} {max(batch, threaded) / single:>7.0f}x")
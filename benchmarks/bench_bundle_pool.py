@@ -0,0 +1,58 @@
+# Regional model pool: cold loads, warm region switches and LRU thrash when regions outnumber the pool
+# Run from the repository root: python benchmarks/bench_bundle_pool.py [regions] [pool size]
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import model_script
+from bundle_store import BundleStore, ModelPool
+from model_registry import MODEL_PATH
+
+ROW = [90, 42, 43, 20.9, 82.0, 6.5, 202.9]
+ROUNDS = 20
+
+
+def per_call(pool, regions, rounds=ROUNDS):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for region in regions:
+            pool.get(region).engine.predict([ROW])
+    return (time.perf_counter() - start) / (rounds * len(regions))
+
+
+if __name__ == "__main__":
+    n_regions = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    pool_size = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    directory = tempfile.mkdtemp(prefix="bundles-")
+    try:
+        store = BundleStore(directory)
+        start = time.perf_counter()
+        regions = [f"region-{i:02d}" for i in range(n_regions)]
+        for region in regions:
+            store.publish(region, MODEL_PATH)
+        print(f"published {n_regions} bundles in {time.perf_counter() - start:.2f}s")
+
+        default = model_script.get_model()
+        start = time.perf_counter()
+        for _ in range(ROUNDS * 10):
+            default.engine.predict([ROW])
+        single = (time.perf_counter() - start) / (ROUNDS * 10)
+
+        pool = ModelPool(store, max_models=pool_size)
+        cold = per_call(pool, regions[:pool_size], rounds=1)
+        warm = per_call(pool, regions[:pool_size])
+        thrash = per_call(pool, regions)
+        print(f"one model, no routing:         {single * 1e3:.2f} ms/call")
+        print(f"cold load per region:          {cold * 1e3:.1f} ms/call")
+        print(f"switching among {pool_size} warm regions: {warm * 1e3:.2f} ms/call")
+        print(f"cycling {n_regions} regions through {pool_size} slots: {thrash * 1e3:.1f} ms/call")
+        stats = pool.stats()
+        print(f"pool: hit rate {stats['hit_rate']:.0%}, {stats['evictions']} evictions, {len(stats['models'])} resident")
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,44 @@
+# CSV Visualizations charts: one-time aggregation, then cold draw and cache hits per figure
+# Run from the repository root: python benchmarks/bench_charts.py [csv path]
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import charts
+import data_stats
+
+HITS = 20
+
+
+def seconds(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "Crop_recommendation_corrected.csv"
+    df = data_stats.load_dataset(csv_path)
+    csv_stats = data_stats.compute_statistics(df)
+    data = {}
+    aggregate = seconds(lambda: data.update(charts.aggregate(df, csv_stats)))
+    print(f"{len(df):,} rows, aggregated once in {aggregate:.2f}s")
+
+    # A private cache directory so every figure starts cold
+    charts.CACHE_DIR = tempfile.mkdtemp(prefix="charts-")
+    charts._draw("crop_distribution", data, {}, charts.FORMAT)  # font cache and imports
+    print(f"{'figure':<18} {'cold s':>8} {'disk ms':>8} {'memory ms':>10} {'KB':>6}")
+    for name in charts.FIGURES:
+        cold = seconds(lambda: charts.render(name, data, "bench"))
+        charts._memory.clear()
+        disk = seconds(lambda: charts.render(name, data, "bench"))
+        memory = seconds(lambda: [charts.render(name, data, "bench") for _ in range(HITS)]) / HITS
+        size = len(charts.render(name, data, "bench").data) / 1e3
+        print(f"{name:<18} {cold:>8.2f} {disk * 1e3:>8.2f} {memory * 1e3:>10.3f} {size:>6.0f}")
+    shutil.rmtree(charts.CACHE_DIR)
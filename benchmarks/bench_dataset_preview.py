@@ -0,0 +1,51 @@
+# Dataset Preview: pd.read_csv per rerun vs. pages from the columnar cache
+# Run from the repository root: python benchmarks/bench_dataset_preview.py [big.csv]
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import dataset_store
+
+CSV_PATH = sys.argv[1] if len(sys.argv) > 1 else "Crop_recommendation_corrected.csv"
+PAGE_ROWS = 100
+QUERIES = {
+    "all rows": {},
+    "one crop": {"crops": ["rice"]},
+    "crop + N range": {"crops": ["rice"], "ranges": {"N": (60.0, 90.0)}},
+    "sorted by rainfall": {"sort_by": "rainfall", "ascending": False},
+    "crop, sorted": {"crops": ["rice"], "sort_by": "rainfall"},
+}
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1e3
+
+
+if __name__ == "__main__":
+    cache_dir = tempfile.mkdtemp(prefix="dataset-")
+    dataset, convert_ms = timed(lambda: dataset_store.ColumnarDataset.from_csv(CSV_PATH, cache_dir))
+    print(f"{CSV_PATH}: {dataset.n_rows:,} rows, converted once in {convert_ms / 1e3:.2f} s")
+    _, reopen_ms = timed(lambda: dataset_store.ColumnarDataset.from_csv(CSV_PATH, cache_dir))
+    print(f"reopen cache: {reopen_ms:.2f} ms, peak RSS so far {peak_mb():.0f} MB")
+
+    print(f"{'query':<20} {'matches':>11} {'first view ms':>14} {'page ms':>9} {'deep page ms':>13}")
+    for name, query in QUERIES.items():
+        view, count_ms = timed(lambda: len(dataset.view(**query)))
+        view = dataset.view(**query)
+        _, page_ms = timed(lambda: view.page(0, PAGE_ROWS))
+        _, deep_ms = timed(lambda: view.page(max(0, len(view) // PAGE_ROWS - 1), PAGE_ROWS))
+        print(f"{name:<20} {len(view):>11,} {count_ms:>14.1f} {page_ms:>9.2f} {deep_ms:>13.2f}")
+
+    _, read_ms = timed(lambda: pd.read_csv(CSV_PATH))
+    print(f"previous page: pd.read_csv on every rerun {read_ms:.0f} ms, peak RSS {peak_mb():.0f} MB")
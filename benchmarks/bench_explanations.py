@@ -0,0 +1,62 @@
+# Explanations vs plain prediction: single-row latency, batch throughput and cache hits
+# Run from the repository root: python benchmarks/bench_explanations.py [csv path]
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import data_stats
+import model_script
+
+CALLS = 2_000
+BATCH_ROWS = 100_000
+
+
+def per_call(fn, rows):
+    fn(rows[0])
+    start = time.perf_counter()
+    for i in range(CALLS):
+        fn(rows[i % len(rows)])
+    return (time.perf_counter() - start) / CALLS
+
+
+def seconds(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "Crop_recommendation_corrected.csv"
+    X = model_script.as_feature_matrix(data_stats.load_dataset(csv_path))
+    bundle = model_script.get_model()
+    build = seconds(lambda: bundle.explainer(len(model_script.FEATURES)))
+    explainer = bundle.explainer(len(model_script.FEATURES))
+    print(f"contribution table: {explainer.table.nbytes / 1e6:.1f} MB, built in {build * 1e3:.0f} ms")
+
+    # Contributions plus the root baseline must add back up to the forest's probabilities
+    probabilities, contributions = explainer.explain(X)
+    error = np.abs(explainer.bias + contributions.sum(axis=1) - bundle.engine.predict_proba(X)).max()
+    print(f"max |baseline + contributions - predict_proba|: {error:.1e}")
+
+    predict = per_call(lambda row: model_script.predict_crop(*row), X)
+    explain = per_call(lambda row: model_script.explain_crop(*row), X)
+    print(f"single row: predict_crop {predict * 1e6:.0f} us, explain_crop {explain * 1e6:.0f} us "
+          f"({explain / predict:.1f}x)")
+
+    batch = X[np.arange(BATCH_ROWS) % len(X)]
+    predict = seconds(lambda: model_script.predict_crops_batch(batch))
+    explain = seconds(lambda: model_script.explain_crops_batch(batch))
+    print(f"{BATCH_ROWS:,} rows: predict_crops_batch {BATCH_ROWS / predict:,.0f} rows/s, "
+          f"explain_crops_batch {BATCH_ROWS / explain:,.0f} rows/s")
+
+    cache = model_script.enable_explanation_cache()
+    cold = per_call(lambda row: model_script.explain_crop(*row), X)
+    warm = per_call(lambda row: model_script.explain_crop(*row), X)
+    print(f"with explanation cache: first pass {cold * 1e6:.0f} us, repeats {warm * 1e6:.0f} us "
+          f"(hit rate {cache.stats()['hit_rate']:.0%})")
+    model_script.disable_explanation_cache()
@@ -0,0 +1,78 @@
+# Page payload and image render time: full-size PNGs through st.image vs. image_service renditions
+# Run from the repository root: python benchmarks/bench_images.py
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+from PIL import Image
+from streamlit.elements import image as st_image
+import image_service
+
+PAGES = {
+    "Overview": ["overview.png"],
+    "CSV Visualizations": ["crop_distribution.png", "correlation_matrix.png", "better_nutrient_histograms.png",
+                           "3d_nutrients.png", "6_nutrient_heatmap.png", "cropwise_boxplots.png"],
+    "Model Evaluation": ["confusion_matrix.png"],
+    "Image Visualizations": ["class_distribution.png", "all_crops_color_comparison.png", "scientific_insights.png",
+                             "banana_comparison.png", "apple_anomaly_map.png"],
+}
+DOWNLOADS = {"CSV Visualizations", "Image Visualizations"}
+
+
+def legacy_render(path, download):
+    # What st.image(Image.open(path), use_column_width=True) did on every rerun, plus the download read
+    image = Image.open(path)
+    fmt = st_image._validate_image_format_string(image, "auto")
+    data = st_image._PIL_to_bytes(image, fmt)
+    data = st_image._ensure_image_size_and_format(data, st_image.WidthBehaviour.COLUMN, fmt)
+    if download:
+        with open(path, "rb") as f:
+            f.read()
+    return len(data)
+
+
+def service_render(path, download):
+    uri = image_service.data_uri(image_service.rendition(path))
+    if download:
+        image_service.original_bytes(path)
+    return len(uri)
+
+
+def clear_memory():
+    image_service._memory.clear()
+    image_service._memory_bytes = 0
+
+
+def measure(render, page, files):
+    start = time.perf_counter()
+    payload = sum(render(os.path.join(image_service.IMAGE_DIR, f), page in DOWNLOADS) for f in files)
+    return payload, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    image_service.CACHE_DIR = tempfile.mkdtemp(prefix="renditions-")
+    print(f"{'page':<22} {'before KB':>10} {'before ms':>10} {'after KB':>9} "
+          f"{'cold ms':>9} {'disk ms':>9} {'memory ms':>10}")
+    totals = [0, 0.0, 0, 0.0, 0.0, 0.0]
+    for page, files in PAGES.items():
+        before, before_time = measure(legacy_render, page, files)
+        clear_memory()
+        after, cold = measure(service_render, page, files)
+        clear_memory()
+        _, disk = measure(service_render, page, files)
+        _, memory = measure(service_render, page, files)
+        row = [before, before_time, after, cold, disk, memory]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{page:<22} {before / 1e3:>10.0f} {before_time * 1e3:>10.0f} {after / 1e3:>9.0f} "
+              f"{cold * 1e3:>9.0f} {disk * 1e3:>9.1f} {memory * 1e3:>10.2f}")
+    before, before_time, after, cold, disk, memory = totals
+    print(f"{'total':<22} {before / 1e3:>10.0f} {before_time * 1e3:>10.0f} {after / 1e3:>9.0f} "
+          f"{cold * 1e3:>9.0f} {disk * 1e3:>9.1f} {memory * 1e3:>10.2f}")
+    print(f"payload {before / after:.1f}x smaller (after includes base64), "
+          f"warm render {before_time / memory:.0f}x faster; rendition format {image_service.FORMAT}")
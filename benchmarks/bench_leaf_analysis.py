@@ -0,0 +1,54 @@
+# Leaf hue feature extraction: full build per worker count, no-op rerun and an incremental update
+# Run from the repository root: python benchmarks/bench_leaf_analysis.py path/to/leaf_images
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import leaf_analysis
+
+PIXEL_ROWS = 64
+
+
+def seconds(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    root = sys.argv[1] if len(sys.argv) > 1 else leaf_analysis.IMAGE_DIR
+    files = leaf_analysis.scan(root)
+    print(f"{len(files):,} images under {root}")
+
+    paths = [os.path.join(root, path) for path, *_ in files[:PIXEL_ROWS]]
+    decode = seconds(lambda: [leaf_analysis.load_pixels(path) for path in paths]) / len(paths)
+    pixels = np.stack([leaf_analysis.load_pixels(path) for path in paths])
+    features = seconds(lambda: leaf_analysis.hue_features(pixels)) / len(paths)
+    print(f"per image: decode + resize {decode * 1e3:.2f} ms, hue features {features * 1e3:.2f} ms")
+
+    workdir = tempfile.mkdtemp(prefix="leaf-bench-")
+    try:
+        for workers in sorted({1, os.cpu_count() or 1}):
+            cache_dir = os.path.join(workdir, f"workers-{workers}")
+            full = seconds(lambda: leaf_analysis.update_table(root, cache_dir, workers))
+            print(f"full build, {workers} workers: {full:.1f}s ({len(files) / full:,.0f} images/s)")
+        noop = seconds(lambda: leaf_analysis.update_table(root, cache_dir))
+        print(f"rerun, nothing changed: {noop * 1e3:.0f} ms")
+
+        # Forget 1% of the rows, as if those files had just been added
+        table = leaf_analysis.FeatureTable.load(cache_dir)
+        forget = np.arange(len(table)) % 100 == 0
+        table.take(~forget).save(cache_dir)
+        incremental = seconds(lambda: leaf_analysis.update_table(root, cache_dir))
+        print(f"rerun, {int(forget.sum()):,} new files: {incremental:.2f}s")
+        statistics = seconds(lambda: leaf_analysis.crop_statistics(leaf_analysis.FeatureTable.load(cache_dir)))
+        print(f"per-crop tests from the table: {statistics * 1e3:.0f} ms")
+    finally:
+        shutil.rmtree(workdir)
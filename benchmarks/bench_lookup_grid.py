@@ -0,0 +1,56 @@
+# Grid mode vs. the exact forest: single-row and batch latency, size and disagreement
+# Run from the repository root after `python lookup_grid.py`: python benchmarks/bench_lookup_grid.py [grid dir]
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import model_script
+from lookup_grid import DOMAIN, GRID_DIR
+
+ROWS = 2_000
+BATCH_ROWS = 200_000
+
+
+def per_call_us(fn, rows):
+    for row in rows[:50]:
+        fn(*row)
+    start = time.perf_counter()
+    for row in rows:
+        fn(*row)
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+
+if __name__ == "__main__":
+    grid_dir = sys.argv[1] if len(sys.argv) > 1 else GRID_DIR
+    low = np.array([low for _, low, _ in DOMAIN], dtype=np.float64)
+    high = np.array([high for _, _, high in DOMAIN], dtype=np.float64)
+    rng = np.random.default_rng(0)
+    rows = (low + rng.random((ROWS, len(DOMAIN))) * (high - low)).tolist()
+    X = low + rng.random((BATCH_ROWS, len(DOMAIN))) * (high - low)
+
+    model_script.disable_grid_mode()
+    model_script.get_model()
+    exact_single = per_call_us(model_script.predict_crop, rows)
+    start = time.perf_counter()
+    exact = model_script.predict_crops_batch(X)
+    exact_batch = (time.perf_counter() - start) / BATCH_ROWS * 1e6
+
+    grid = model_script.enable_grid_mode(grid_dir)
+    grid_single = per_call_us(model_script.predict_crop, rows)
+    start = time.perf_counter()
+    approx = model_script.predict_crops_batch(X)
+    grid_batch = (time.perf_counter() - start) / BATCH_ROWS * 1e6
+    model_script.disable_grid_mode()
+
+    print(f"grid {grid.shape}: {grid.classes.nbytes / 1e6:.1f} MB memory-mapped from {grid_dir}")
+    print(f"{'':<8} {'row us':>9} {'batch us/row':>13}")
+    print(f"{'forest':<8} {exact_single:>9.1f} {exact_batch:>13.3f}")
+    print(f"{'grid':<8} {grid_single:>9.1f} {grid_batch:>13.3f}   ({exact_single / grid_single:.0f}x single row)")
+    print(f"disagreement on {BATCH_ROWS:,} random domain rows: {(approx != exact).mean():.2%}")
+    for name, rate in grid.disagreement.items():
+        print(f"recorded at build time, {name}: {rate:.2%}")
@@ -0,0 +1,36 @@
+# Import, cold load and warm load time of the model, each in a fresh process
+# Run from the repository root: python benchmarks/bench_model_load.py
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+PROBE = """
+import json, time, warnings
+warnings.filterwarnings("ignore")
+start = time.perf_counter()
+import model_script
+import_seconds = time.perf_counter() - start
+model_script.get_model()
+for _ in range(1000):
+    model_script.get_model()
+stats = model_script.load_stats()
+print(json.dumps({"import": import_seconds, "cold": stats["cold_load_seconds"], "warm": stats["warm_load_seconds"]}))
+"""
+
+
+def probe():
+    # Run outside the repository to make sure paths don't depend on the CWD
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=os.path.expanduser("~"), check=True,
+                            capture_output=True, text=True, env={**os.environ, "PYTHONPATH": REPO_DIR}).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    results = [probe() for _ in range(RUNS)]
+    for key in ["import", "cold", "warm"]:
+        values = sorted(result[key] for result in results)
+        print(f"{key:>6}: median {values[len(values) // 2] * 1e3:10.4f} ms  min {values[0] * 1e3:10.4f} ms")
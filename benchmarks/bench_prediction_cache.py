@@ -0,0 +1,65 @@
+# Prediction cache on a sensor-like stream with many repeated readings
+# Run from the repository root: python benchmarks/bench_prediction_cache.py
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_script
+from prediction_cache import DEFAULT_RESOLUTION
+
+warnings.filterwarnings("ignore")
+
+LOW = np.array([0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+HIGH = np.array([140, 145, 205, 50.0, 100.0, 14.0, 300.0])
+DISTINCT_READINGS = 2_000
+STREAM_ROWS = 100_000
+SINGLE_CALLS = 5_000
+
+
+def sensor_stream(seed=0):
+    # Readings at sensor precision, drawn with replacement from a fixed pool
+    rng = np.random.default_rng(seed)
+    resolution = np.asarray(DEFAULT_RESOLUTION)
+    pool = np.round((LOW + rng.random((DISTINCT_READINGS, 7)) * (HIGH - LOW)) / resolution) * resolution
+    return pool[rng.integers(0, DISTINCT_READINGS, STREAM_ROWS)]
+
+
+def time_single(X):
+    start = time.perf_counter()
+    labels = [model_script.predict_crop(*row) for row in X[:SINGLE_CALLS].tolist()]
+    return SINGLE_CALLS / (time.perf_counter() - start), labels
+
+
+def time_batch(X):
+    start = time.perf_counter()
+    labels = model_script.predict_crops_batch(X, chunk_size=10_000)
+    return len(X) / (time.perf_counter() - start), labels
+
+
+if __name__ == "__main__":
+    X = sensor_stream()
+    model_script.get_model()
+
+    single_plain, single_labels = time_single(X)
+    batch_plain, batch_labels = time_batch(X)
+
+    cache = model_script.enable_prediction_cache()
+    single_cold, _ = time_single(X)
+    single_warm, single_cached_labels = time_single(X)
+    cache.clear()
+    batch_cold, batch_cached_labels = time_batch(X)
+    batch_warm, _ = time_batch(X)
+    model_script.disable_prediction_cache()
+
+    agreement = np.mean(np.asarray(batch_labels) == np.asarray(batch_cached_labels))
+    single_agreement = np.mean(np.asarray(single_labels) == np.asarray(single_cached_labels))
+    print(f"{DISTINCT_READINGS} distinct readings, {STREAM_ROWS} rows (rows/s)")
+    print(f"{'':>7} {'uncached':>10} {'cold cache':>11} {'warm cache':>11}")
+    print(f"{'single':>7} {single_plain:>10,.0f} {single_cold:>11,.0f} {single_warm:>11,.0f}")
+    print(f"{'batch':>7} {batch_plain:>10,.0f} {batch_cold:>11,.0f} {batch_warm:>11,.0f}")
+    print(f"agreement with uncached labels: single {single_agreement:.4%}, batch {agreement:.4%}")
+    print("cache stats:", cache.stats())
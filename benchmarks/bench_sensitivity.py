@@ -0,0 +1,43 @@
+# What-if sweeps: one vectorized call per grid vs clicking predict_crop per cell, and cache hits
+# Run from the repository root: python benchmarks/bench_sensitivity.py
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import model_script
+from sensitivity import sweep_axes, sweep_rows
+
+BASE = [90, 42, 43, 20.9, 82.0, 6.5, 202.9]
+SWEEPS = [(["N"], 100), (["N", "P"], 50), (["N", "P"], 100), (["K", "rainfall"], 150)]
+LOOP_CELLS = 200
+
+
+def seconds(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    model_script.get_model()
+    model_script.predict_crop(*BASE)
+    print(f"{'features':<14} {'grid':>8} {'cold ms':>8} {'hit ms':>7} {'per-cell loop s':>16} {'flips':>6}")
+    for features, steps in SWEEPS:
+        cold = seconds(lambda: model_script.sweep_crop(BASE, features, steps))
+        hit = seconds(lambda: model_script.sweep_crop(BASE, features, steps))
+        sweep = model_script.sweep_crop(BASE, features, steps)
+
+        # The same grid one predict_crop call at a time, extrapolated from a sample of cells
+        rows = sweep_rows(sweep.base, sweep.columns, sweep_axes(features, steps))[1:1 + sweep.class_ids.size]
+        sample = rows[np.linspace(0, len(rows) - 1, LOOP_CELLS).astype(int)]
+        loop = seconds(lambda: [model_script.predict_crop(*row) for row in sample]) / LOOP_CELLS * len(rows)
+
+        shape = "x".join(str(n) for n in sweep.class_ids.shape)
+        print(f"{'+'.join(features):<14} {shape:>8} {cold * 1e3:>8.0f} {hit * 1e3:>7.2f} {loop:>16.2f} "
+              f"{len(sweep.crossings()):>6}")
+    print(model_script.sweep_cache.stats())
@@ -0,0 +1,54 @@
+# recommend_top_k against the single-label prediction path
+# Run from the repository root: python benchmarks/bench_top_k.py
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import model_script
+
+LOW = np.array([0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+HIGH = np.array([140, 145, 205, 50.0, 100.0, 14.0, 300.0])
+SINGLE_CALLS = 2_000
+BATCH_ROWS = 100_000
+
+
+def rate(fn, rows, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return rows * repeats / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    X = LOW + np.random.default_rng(0).random((BATCH_ROWS, 7)) * (HIGH - LOW)
+    rows = X[:SINGLE_CALLS].tolist()
+    bundle = model_script.get_model()
+
+    def two_passes(data):
+        # What the dashboard would do with separate predict and predict_proba calls
+        bundle.engine.predict(data)
+        bundle.engine.predict_proba(data)
+
+    single = {
+        "predict_crop": rate(lambda: [model_script.predict_crop(*row) for row in rows], SINGLE_CALLS),
+        "recommend_top_k": rate(lambda: [model_script.recommend_top_k(row, k=3) for row in rows], SINGLE_CALLS),
+        "predict + predict_proba": rate(lambda: [two_passes(np.array([row])) for row in rows], SINGLE_CALLS),
+    }
+    batch = {
+        "predict_crops_batch": rate(lambda: model_script.predict_crops_batch(X), BATCH_ROWS),
+        "recommend_top_k": rate(lambda: model_script.recommend_top_k(X, k=3), BATCH_ROWS),
+        "predict + predict_proba": rate(lambda: two_passes(X), BATCH_ROWS),
+    }
+    for name, results in [("single row", single), (f"batch of {BATCH_ROWS:,}", batch)]:
+        print(name)
+        for label, value in results.items():
+            print(f"  {label:>24} {value:>10,.0f} rows/s")
+
+    top1 = model_script.recommend_top_k(X[:20_000], k=1)[0][:, 0]
+    agreement = np.mean(top1 == model_script.predict_crops_batch(X[:20_000]))
+    print(f"top-1 agrees with predict_crops_batch on {agreement:.2%} of rows")
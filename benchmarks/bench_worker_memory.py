@@ -0,0 +1,79 @@
+# Resident memory per worker with the pickled model vs the memory-mapped array directory
+# Run from the repository root after `python forest_engine.py export`:
+#   python benchmarks/bench_worker_memory.py
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PICKLE_PATH = os.path.join(REPO_DIR, "crop_recommender_rf.pkl")
+ARRAYS_PATH = os.path.join(REPO_DIR, "crop_recommender_rf")
+WORKERS = 4
+
+WORKER = """
+import sys, warnings
+import numpy as np
+warnings.filterwarnings("ignore")
+import model_script
+print(open("/proc/self/smaps_rollup").read(), flush=True)
+model_script.predict_crops_batch(np.random.default_rng(0).random((5000, 7)) * 100)
+print("ready", flush=True)
+sys.stdin.read()
+"""
+
+
+def smaps_rollup(text):
+    # Values in kB, e.g. "Pss:  1234 kB"
+    fields = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def private_kb(fields):
+    return fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def measure(model_path):
+    env = {**os.environ, "PYTHONPATH": REPO_DIR, "CROP_MODEL_PATH": model_path}
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                text=True, env=env) for _ in range(WORKERS)]
+    baselines = []
+    for worker in workers:
+        lines = []
+        for line in worker.stdout:
+            if line.strip() == "ready":
+                break
+            lines.append(line)
+        baselines.append(smaps_rollup("".join(lines)))
+
+    # Read every worker while all of them are alive so Pss reflects the sharing
+    loaded = []
+    for worker in workers:
+        with open(f"/proc/{worker.pid}/smaps_rollup") as f:
+            loaded.append(smaps_rollup(f.read()))
+    for worker in workers:
+        worker.communicate("")
+    return baselines, loaded
+
+
+def report(name, baselines, loaded):
+    def mean(values):
+        return sum(values) / len(values) / 1024
+
+    print(f"{name}: {WORKERS} workers")
+    print(f"  RSS per worker   {mean([f['Rss'] for f in loaded]):8.1f} MB "
+          f"(+{mean([l['Rss'] - b['Rss'] for b, l in zip(baselines, loaded)]):.1f} MB for the model)")
+    print(f"  PSS per worker   {mean([f['Pss'] for f in loaded]):8.1f} MB "
+          f"(+{mean([l['Pss'] - b['Pss'] for b, l in zip(baselines, loaded)]):.1f} MB for the model)")
+    print(f"  Private per worker {mean([private_kb(f) for f in loaded]):6.1f} MB "
+          f"(+{mean([private_kb(l) - private_kb(b) for b, l in zip(baselines, loaded)]):.1f} MB for the model)")
+
+
+if __name__ == "__main__":
+    if not os.path.isdir(ARRAYS_PATH):
+        sys.exit(f"{ARRAYS_PATH} not found; run `python forest_engine.py export` first")
+    report("pickle", *measure(PICKLE_PATH))
+    report("mmap", *measure(ARRAYS_PATH))
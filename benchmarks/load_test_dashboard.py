@@ -0,0 +1,70 @@
+# Simulated concurrent dashboard sessions on the Crop Prediction page: each session is a
+# thread (as Streamlit runs scripts) clicking "Recommend Crop" after a short think time.
+# Compares calling recommend_top_k per click with the shared PredictionExecutor.
+# Run from the repository root: python benchmarks/load_test_dashboard.py
+import os
+import sys
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import model_script
+from prediction_executor import PredictionExecutor
+
+SESSIONS = [1, 10, 50, 100, 200]
+CLICKS_PER_SESSION = 40
+# Seconds between a session's clicks, drawn uniformly from this range
+THINK_TIMES = {"interactive": (0.0, 0.05), "saturated": (0.0, 0.0)}
+LOW = np.array([0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+HIGH = np.array([140, 145, 205, 50.0, 100.0, 14.0, 300.0])
+
+
+def run_sessions(n_sessions, click, think_time):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(n_sessions)
+
+    def session(seed):
+        rng = np.random.default_rng(seed)
+        rows = LOW + rng.random((CLICKS_PER_SESSION, 7)) * (HIGH - LOW)
+        mine = []
+        barrier.wait()
+        for row in rows:
+            time.sleep(rng.uniform(*think_time))
+            start = time.perf_counter()
+            click(row)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=session, args=(seed,)) for seed in range(n_sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    return p50, p99, len(latencies) / elapsed
+
+
+if __name__ == "__main__":
+    model_script.get_model()
+    executor = PredictionExecutor(k=3)
+    modes = {
+        "per click": lambda row: model_script.recommend_top_k(row, k=3),
+        "executor": executor.predict,
+    }
+    print(f"{'load':>12} {'mode':>10} {'sessions':>9} {'p50 ms':>9} {'p99 ms':>9} {'clicks/s':>9} {'mean batch':>11}")
+    for load, think_time in THINK_TIMES.items():
+        for n_sessions in SESSIONS:
+            for mode, click in modes.items():
+                executor.batch_sizes.clear()
+                p50, p99, rate = run_sessions(n_sessions, click, think_time)
+                batch = f"{executor.stats()['mean_batch_size']:>11.1f}" if mode == "executor" else f"{'':>11}"
+                print(f"{load:>12} {mode:>10} {n_sessions:>9} {p50:>9.2f} {p99:>9.2f} {rate:>9.0f} {batch}")
+    executor.close()
@@ -0,0 +1,111 @@
+# Load test for prediction_service.py: p50/p99 latency and throughput per concurrency level
+# Run from the repository root: python benchmarks/load_test_service.py
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONCURRENCY = [1, 8, 32, 128]
+REQUESTS_PER_LEVEL = 2_000
+BATCH_ROWS = 1_000
+LOW = np.array([0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+HIGH = np.array([140, 145, 205, 50.0, 100.0, 14.0, 300.0])
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_level(port, concurrency, total, path, make_payload):
+    latencies = []
+    statuses = []
+    per_client = total // concurrency
+
+    async def client():
+        connection = await Connection.open(port)
+        for _ in range(per_client):
+            start = time.perf_counter()
+            status, _ = await connection.request("POST", path, make_payload())
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+        connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    ok = sum(status == 200 for status in statuses)
+    return p50, p99, len(latencies) / elapsed, ok, len(statuses)
+
+
+async def main(port):
+    rng = np.random.default_rng(0)
+
+    def single():
+        return (LOW + rng.random(7) * (HIGH - LOW)).tolist()
+
+    def batch():
+        return {"samples": (LOW + rng.random((BATCH_ROWS, 7)) * (HIGH - LOW)).tolist()}
+
+    print(f"{'endpoint':>14} {'clients':>8} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9} {'rows/s':>10} {'ok':>11}")
+    for concurrency in CONCURRENCY:
+        p50, p99, rate, ok, total = await run_level(port, concurrency, REQUESTS_PER_LEVEL, "/predict", single)
+        print(f"{'/predict':>14} {concurrency:>8} {p50:>9.2f} {p99:>9.2f} {rate:>9.0f} {rate:>10.0f} {ok:>5}/{total:<5}")
+    for concurrency in [1, 4]:
+        p50, p99, rate, ok, total = await run_level(port, concurrency, 20, "/predict/batch", batch)
+        print(f"{'/predict/batch':>14} {concurrency:>8} {p50:>9.2f} {p99:>9.2f} {rate:>9.1f} "
+              f"{rate * BATCH_ROWS:>10.0f} {ok:>5}/{total:<5}")
+
+    connection = await Connection.open(port)
+    _, metrics = await connection.request("GET", "/metrics")
+    connection.close()
+    print("server batcher:", json.dumps(metrics["batcher"]))
+
+
+if __name__ == "__main__":
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "prediction_service.py"), "--port", str(port)],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        server.stdout.readline()  # "Serving ..." once the model is loaded
+        asyncio.run(main(port))
+    finally:
+        server.terminate()
+        server.wait()
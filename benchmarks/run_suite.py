@@ -0,0 +1,238 @@
+# Offline benchmark suite with a stored baseline; exits 1 when a tracked metric regresses
+# Run from the repository root:
+#   python benchmarks/run_suite.py                      # compare against benchmarks/baseline.json
+#   python benchmarks/run_suite.py --update-baseline    # record this machine's numbers
+#   python benchmarks/run_suite.py --max-rows 10000000 --only stats
+#   python benchmarks/run_suite.py --only parity         # exactness checks alone
+# Parity checks (tests/test_parity.py, also run alone with pytest) fail the run on any mismatch
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+warnings.filterwarnings("ignore")
+
+import numpy as np
+import pandas as pd
+from tests.test_parity import PARITY_CHECKS
+
+BASELINE_PATH = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+CSV_PATH = os.path.join(REPO_DIR, "Crop_recommendation_corrected.csv")
+STATS_ROWS = [1_500, 100_000, 1_000_000, 10_000_000]
+# Relative change tolerated before a metric counts as a regression
+DEFAULT_THRESHOLD = 0.30
+LOW = np.array([0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+HIGH = np.array([140, 145, 205, 50.0, 100.0, 14.0, 300.0])
+
+BENCHMARKS = []
+
+
+def benchmark(group, unit, higher_is_better=False):
+    """Register a function returning {metric name: value} under ``group``"""
+    def register(fn):
+        BENCHMARKS.append((group, fn, unit, higher_is_better))
+        return fn
+    return register
+
+
+def median_time(fn, repeats=5, number=1):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return float(np.median(timings))
+
+
+def random_rows(n, seed=0):
+    return LOW + np.random.default_rng(seed).random((n, 7)) * (HIGH - LOW)
+
+
+def synthetic_dataset(n_rows, seed=0):
+    """The CSV resampled to ``n_rows`` with 2% feature noise, in load_dataset's dtypes"""
+    import data_stats
+    base = data_stats.load_dataset(CSV_PATH)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(base), n_rows)
+    data = {}
+    for feature in data_stats.FEATURES:
+        values = base[feature].to_numpy(dtype=np.float32)[picks]
+        data[feature] = values * (1 + rng.normal(0, 0.02, n_rows).astype(np.float32))
+    data["label"] = base["label"].to_numpy()[picks]
+    return pd.DataFrame(data).astype(data_stats.CSV_DTYPES)
+
+
+@benchmark("predict", "us/row")
+def predict_latency():
+    import model_script
+    model_script.get_model()
+    rows = random_rows(500).tolist()
+    single = median_time(lambda: [model_script.predict_crop(*row) for row in rows]) / len(rows)
+    X = random_rows(100_000, seed=1)
+    batch = median_time(lambda: model_script.predict_crops_batch(X), repeats=3) / len(X)
+    return {"predict_crop single row": single * 1e6, "predict_crops_batch 100k rows": batch * 1e6}
+
+
+@benchmark("model load", "ms")
+def model_load():
+    probe = ("import json, time, warnings; warnings.filterwarnings('ignore'); t = time.perf_counter(); "
+             "import model_script; i = time.perf_counter() - t; model_script.get_model(); "
+             "t = time.perf_counter(); model_script.get_model(); w = time.perf_counter() - t; "
+             "print(json.dumps([i, model_script.load_stats()['cold_load_seconds'], w]))")
+    runs = []
+    for _ in range(3):
+        output = subprocess.run([sys.executable, "-c", probe], cwd=REPO_DIR, check=True, capture_output=True,
+                                text=True, env={**os.environ, "PYTHONPATH": REPO_DIR}).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    imported, cold, warm = np.median(runs, axis=0)
+    return {"import model_script": imported * 1e3, "cold get_model": cold * 1e3, "warm get_model": warm * 1e3}
+
+
+@benchmark("csv", "ms")
+def csv_load():
+    import data_stats
+    return {"load_dataset 1.5k rows": median_time(lambda: data_stats.load_dataset(CSV_PATH)) * 1e3}
+
+
+@benchmark("stats", "s")
+def statistics(max_rows):
+    import data_stats
+    results = {}
+    for n_rows in [n for n in STATS_ROWS if n <= max_rows]:
+        df = synthetic_dataset(n_rows)
+        repeats = 3 if n_rows <= 100_000 else 1
+        results[f"compute_statistics {n_rows:,} rows"] = median_time(lambda: data_stats.compute_statistics(df),
+                                                                     repeats=repeats)
+        del df
+    return results
+
+
+@benchmark("images", "ms")
+def image_renditions():
+    import image_service
+    path = os.path.join(image_service.IMAGE_DIR, "3d_nutrients.png")
+    cache_dir = tempfile.mkdtemp(prefix="renditions-")
+    saved_dir, image_service.CACHE_DIR = image_service.CACHE_DIR, cache_dir
+    try:
+        def cold():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            image_service._memory.clear()
+            image_service._memory_bytes = 0
+            image_service.rendition(path)
+
+        def from_disk():
+            image_service._memory.clear()
+            image_service._memory_bytes = 0
+            image_service.rendition(path)
+
+        results = {"rendition 3d_nutrients cold": median_time(cold, repeats=3) * 1e3,
+                   "rendition 3d_nutrients from disk": median_time(from_disk) * 1e3}
+        image_service.rendition(path)
+        results["rendition 3d_nutrients from memory"] = median_time(lambda: image_service.rendition(path),
+                                                                    number=100) * 1e3
+        return results
+    finally:
+        image_service.CACHE_DIR = saved_dir
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def run_parity_checks(only=None):
+    """Names of parity checks that found mismatching rows"""
+    if only and "parity" not in only:
+        return []
+    failures = []
+    for fn in PARITY_CHECKS:
+        start = time.perf_counter()
+        for name, mismatches in fn().items():
+            print(f"{'parity':<11} {name:<52} {mismatches:>6} {'ok' if mismatches == 0 else 'MISMATCH'}")
+            if mismatches:
+                failures.append(name)
+        print(f"{'':<11} ({time.perf_counter() - start:.1f} s)")
+    return failures
+
+
+def run(only=None, max_rows=1_000_000):
+    results = {}
+    for group, fn, unit, higher_is_better in BENCHMARKS:
+        if only and group not in only:
+            continue
+        start = time.perf_counter()
+        values = fn(max_rows) if group == "stats" else fn()
+        for name, value in values.items():
+            results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+            print(f"{group:<11} {name:<40} {value:>12.3f} {unit}")
+        print(f"{'':<11} ({time.perf_counter() - start:.1f} s)")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Metric names whose value got worse than the baseline by more than ``threshold``"""
+    regressions = []
+    print(f"\n{'metric':<40} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline["metrics"]:
+            continue
+        before = baseline["metrics"][name]["value"]
+        now = result["value"]
+        change = (now - before) / before if before else 0.0
+        worse = -change if result["higher_is_better"] else change
+        limit = baseline.get("thresholds", {}).get(name, threshold)
+        flag = "REGRESSION" if worse > limit else ""
+        print(f"{name:<40} {before:>12.3f} {now:>12.3f} {change:>+8.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the prediction and dashboard hot paths")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that fails the run (per-metric overrides in the baseline)")
+    parser.add_argument("--max-rows", type=int, default=1_000_000, help="largest synthetic dataset for stats")
+    parser.add_argument("--only", nargs="*", help="groups to run: predict, 'model load', csv, stats, images, parity")
+    parser.add_argument("--output", help="also write this run's results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.only, args.max_rows)
+    parity_failures = run_parity_checks(args.only)
+    if parity_failures:
+        print(f"\n{len(parity_failures)} parity check(s) found mismatching rows: {parity_failures}")
+        sys.exit(1)
+    record = {"machine": f"{platform.node()} {platform.processor() or platform.machine()}, "
+                         f"{os.cpu_count()} CPU, Python {platform.python_version()}",
+              "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "metrics": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(record, f, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        previous = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+        # Keep metrics of groups not run this time, and any hand-tuned thresholds
+        record["metrics"] = {**previous.get("metrics", {}), **results}
+        record["thresholds"] = previous.get("thresholds", {})
+        with open(args.baseline, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed more than the threshold: {regressions}")
+        sys.exit(1)
+    print("\nNo regressions")
@@ -0,0 +1,333 @@
+# Versioned per-region model bundles (model + label map + dataset) and an LRU pool of warm models
+# Each region has immutable version directories and a manifest naming the current one:
+#
+#   bundles/<region>/manifest.json     {"current": 2, "versions": [{"version": 1, "bundle_hash": ...}, ...]}
+#   bundles/<region>/v0001/            crop_recommender_rf.pkl (or an exported directory), label_mapping.json,
+#                                      dataset.csv (optional)
+#
+#   python bundle_store.py publish kenya out/crop_recommender_rf.pkl --dataset kenya.csv
+#   python bundle_store.py promote kenya 1      # roll back
+#   python bundle_store.py list
+#   model_script.predict_crop(90, 42, 43, 20.9, 82.0, 6.5, 202.9, region="kenya")
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+import joblib
+from data_stats import file_hash
+from model_registry import BASE_DIR, RELOAD_CHECK_SECONDS, ModelRegistry, artifact_hash, artifact_stamp
+
+BUNDLE_DIR = os.environ.get("CROP_BUNDLE_DIR", os.path.join(BASE_DIR, "bundles"))
+MANIFEST_FILE = "manifest.json"
+LABEL_MAPPING_FILE = "label_mapping.json"
+DATASET_FILE = "dataset.csv"
+# Warm models kept in memory; the least recently used one is dropped beyond this
+POOL_MODELS = int(os.environ.get("CROP_POOL_MODELS", "8"))
+# Region keys double as directory names
+REGION_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]*")
+
+
+class UnknownRegion(KeyError):
+    """No bundle for the requested region or version"""
+
+
+def check_region(region):
+    if not isinstance(region, str) or not REGION_PATTERN.fullmatch(region):
+        raise ValueError(f"Region keys are letters, digits, '-' and '_', got {region!r}")
+    return region
+
+
+def content_hash(path):
+    # File names are not part of a file's hash, so a copy under a version directory still matches
+    return artifact_hash(path) if os.path.isdir(path) else file_hash(path)
+
+
+def write_manifest(region_dir, manifest):
+    tmp = os.path.join(region_dir, f".{MANIFEST_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(region_dir, MANIFEST_FILE))
+
+
+def copy_artifact(source, target):
+    if os.path.isdir(source):
+        shutil.copytree(source, target)
+    else:
+        shutil.copy2(source, target)
+
+
+class BundleStore:
+    """Per-region version directories, each holding one model, its label map and optionally its dataset.
+
+    Versions are never modified after publishing; ``current`` in the region's
+    manifest selects the one that is served, so promoting or rolling back is
+    one atomic manifest write.
+    """
+
+    def __init__(self, directory=BUNDLE_DIR):
+        self.directory = directory
+
+    def _region_dir(self, region):
+        return os.path.join(self.directory, check_region(region))
+
+    def _manifest_path(self, region):
+        return os.path.join(self._region_dir(region), MANIFEST_FILE)
+
+    def regions(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if REGION_PATTERN.fullmatch(name) and os.path.exists(self._manifest_path(name)))
+
+    def manifest(self, region):
+        path = self._manifest_path(region)
+        if not os.path.exists(path):
+            raise UnknownRegion(f"No bundles for region {region!r} in {self.directory}")
+        with open(path) as f:
+            return json.load(f)
+
+    def manifest_stamp(self, region):
+        return artifact_stamp(self._manifest_path(region))
+
+    def entry(self, region, version=None):
+        """Manifest entry of ``version`` (default: the current one)"""
+        manifest = self.manifest(region)
+        version = manifest["current"] if version is None else int(version)
+        for entry in manifest["versions"]:
+            if entry["version"] == version:
+                return entry
+        raise UnknownRegion(f"Region {region!r} has no version {version}")
+
+    def paths(self, region, version=None):
+        """Absolute model, label map and dataset (or None) paths of a version"""
+        entry = self.entry(region, version)
+        version_dir = os.path.join(self._region_dir(region), entry["directory"])
+        files = entry["files"]
+        return {name: os.path.join(version_dir, files[name]["file"]) if name in files else None
+                for name in ("model", "label_mapping", "dataset")}
+
+    def publish(self, region, model_path, label_mapping_path=None, dataset_path=None, promote=True):
+        """Copy the artifacts in as the region's next version and return its number.
+
+        A pickle's embedded label map (train_model.py) is stored as the
+        version's label_mapping.json; otherwise the label map defaults to the
+        one inside or next to the model. Publishing content identical to an
+        existing version returns that version instead of storing a copy.
+        """
+        region_dir = self._region_dir(region)
+        embedded = None if os.path.isdir(model_path) else joblib.load(model_path).get("label_mapping")
+        if embedded is not None and label_mapping_path is not None:
+            with open(label_mapping_path) as f:
+                if json.load(f) != embedded:
+                    raise ValueError(f"{label_mapping_path} is not the label map embedded in {model_path}")
+        if embedded is not None:
+            label_mapping_path = model_path  # written out of the pickle below
+        elif label_mapping_path is None:
+            bundled = os.path.join(model_path, LABEL_MAPPING_FILE)
+            label_mapping_path = bundled if os.path.isdir(model_path) else os.path.join(
+                os.path.dirname(os.path.abspath(model_path)), LABEL_MAPPING_FILE)
+        sources = {"model": model_path, "label_mapping": label_mapping_path}
+        if dataset_path is not None:
+            sources["dataset"] = dataset_path
+        hashes = {name: content_hash(path) for name, path in sources.items()}
+        if embedded is not None:
+            embedded_json = json.dumps(embedded).encode()
+            hashes["label_mapping"] = hashlib.sha256(embedded_json).hexdigest()
+        bundle_hash = hashlib.sha256(json.dumps(hashes, sort_keys=True).encode()).hexdigest()
+
+        manifest = self.manifest(region) if os.path.exists(self._manifest_path(region)) else {
+            "region": region, "current": None, "versions": []}
+        existing = [entry for entry in manifest["versions"] if entry["bundle_hash"] == bundle_hash]
+        if existing:
+            version = existing[0]["version"]
+        else:
+            version = max((entry["version"] for entry in manifest["versions"]), default=0) + 1
+            directory = f"v{version:04d}"
+            names = {"model": os.path.basename(os.path.normpath(model_path)),
+                     "label_mapping": LABEL_MAPPING_FILE, "dataset": DATASET_FILE}
+            # Filled under a temporary name and renamed, so a version directory is always complete
+            staging = os.path.join(region_dir, f".{directory}.{os.getpid()}.tmp")
+            os.makedirs(staging)
+            for name, path in sources.items():
+                if name == "label_mapping" and embedded is not None:
+                    with open(os.path.join(staging, names[name]), "wb") as f:
+                        f.write(embedded_json)
+                else:
+                    copy_artifact(path, os.path.join(staging, names[name]))
+            os.rename(staging, os.path.join(region_dir, directory))
+            with open(os.path.join(region_dir, directory, LABEL_MAPPING_FILE)) as f:
+                crops = sorted(json.load(f))
+            manifest["versions"].append({
+                "version": version,
+                "directory": directory,
+                "bundle_hash": bundle_hash,
+                "files": {name: {"file": names[name], "sha256": hashes[name], "source": os.path.abspath(path)}
+                          for name, path in sources.items()},
+                "crops": crops,
+                "published_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            })
+        if promote or manifest["current"] is None:
+            manifest["current"] = version
+        write_manifest(region_dir, manifest)
+        return version
+
+    def promote(self, region, version):
+        """Serve ``version`` from now on (also how to roll back)"""
+        manifest = self.manifest(region)
+        self.entry(region, version)
+        manifest["current"] = int(version)
+        write_manifest(self._region_dir(region), manifest)
+
+    def verify(self, region, version=None):
+        """Names of the version's files whose content no longer matches the recorded hash"""
+        entry = self.entry(region, version)
+        paths = self.paths(region, entry["version"])
+        return [name for name, recorded in entry["files"].items() if content_hash(paths[name]) != recorded["sha256"]]
+
+
+class ModelPool:
+    """Warm models for many regions, at most ``max_models`` in memory, least recently used dropped first.
+
+    Each pooled model is a ModelRegistry over one immutable bundle version, so
+    concurrent first calls for a region load it once and other regions are
+    not blocked meanwhile. A region's manifest is re-read every
+    ``check_seconds``; a promoted version is loaded on the next call while
+    the previous one ages out of the pool.
+    """
+
+    def __init__(self, store=None, max_models=POOL_MODELS, check_seconds=RELOAD_CHECK_SECONDS):
+        self.store = store or BundleStore()
+        self.max_models = max_models
+        self.check_seconds = check_seconds
+        self._models = OrderedDict()  # (region, version) -> ModelRegistry
+        self._validators = {}         # (region, version) -> InputValidator, dropped with its model
+        self._current = {}            # region -> (version, manifest stamp, next check)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def current_version(self, region):
+        now = time.monotonic()
+        cached = self._current.get(region)
+        if cached is not None and (now < cached[2] or not self.check_seconds):
+            return cached[0]
+        stamp = self.store.manifest_stamp(region)
+        if cached is None or stamp != cached[1]:
+            version = self.store.entry(region)["version"]
+        else:
+            version = cached[0]
+        self._current[region] = (version, stamp, now + self.check_seconds)
+        return version
+
+    def registry(self, region, version=None):
+        """The pooled ModelRegistry for a region's version (default: current), created on first use"""
+        key = (region, self.current_version(region) if version is None else int(version))
+        with self._lock:
+            registry = self._models.get(key)
+            if registry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return registry
+            paths = self.store.paths(*key)
+            registry = ModelRegistry(paths["model"], paths["label_mapping"], reload_check_seconds=0)
+            self._models[key] = registry
+            self.misses += 1
+            while len(self._models) > self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                self._validators.pop(evicted, None)
+                self.evictions += 1
+        return registry
+
+    def get(self, region, version=None):
+        """ModelBundle for a region; the first call per version loads it outside the pool lock"""
+        return self.registry(region, version).get()
+
+    def validator(self, region, version=None):
+        """InputValidator for a region's version (default: current), profiled from its dataset while it is pooled"""
+        # Imported here so serving without validation doesn't load scipy
+        from input_validation import InputValidator
+
+        key = (region, self.current_version(region) if version is None else int(version))
+        self.registry(*key)  # pools the version (without loading its model), so eviction drops both together
+        with self._lock:
+            validator = self._validators.get(key)
+        if validator is not None:
+            return validator
+        dataset = self.store.paths(*key)["dataset"]
+        if dataset is None:
+            raise ValueError(f"Region {region!r} was published without a dataset to validate against")
+        validator = InputValidator.from_csv(dataset)
+        with self._lock:
+            if key in self._models:
+                validator = self._validators.setdefault(key, validator)
+        return validator
+
+    def warm(self, regions):
+        """Load these regions' current models now, e.g. at startup"""
+        for region in regions:
+            self.get(region)
+
+    def stats(self):
+        with self._lock:
+            models = {f"{region}@v{version}": registry.stats() for (region, version), registry in self._models.items()}
+        lookups = self.hits + self.misses
+        return {
+            "max_models": self.max_models,
+            "models": models,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versioned per-region model bundles")
+    parser.add_argument("--store", default=BUNDLE_DIR, help="bundle directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="store a model (and label map, dataset) as a region's next version")
+    publish.add_argument("region")
+    publish.add_argument("model", help="pickle or exported model directory")
+    publish.add_argument("--labels", help="label_mapping.json (default: next to the model)")
+    publish.add_argument("--dataset", help="the region's training CSV")
+    publish.add_argument("--no-promote", action="store_true", help="store without serving it yet")
+    promote = commands.add_parser("promote", help="serve another version of a region")
+    promote.add_argument("region")
+    promote.add_argument("version", type=int)
+    verify = commands.add_parser("verify", help="re-hash every version's files")
+    verify.add_argument("region", nargs="?")
+    commands.add_parser("list", help="regions, versions and crop sets")
+    args = parser.parse_args()
+
+    store = BundleStore(args.store)
+    if args.command == "publish":
+        version = store.publish(args.region, args.model, args.labels, args.dataset, promote=not args.no_promote)
+        entry = store.entry(args.region, version)
+        print(f"{args.region} v{version}: {len(entry['crops'])} crops, bundle {entry['bundle_hash'][:12]}"
+              + (" (current)" if store.manifest(args.region)["current"] == version else ""))
+    elif args.command == "promote":
+        store.promote(args.region, args.version)
+        print(f"{args.region} now serves v{args.version}")
+    elif args.command == "verify":
+        failed = False
+        for region in [args.region] if args.region else store.regions():
+            for entry in store.manifest(region)["versions"]:
+                mismatched = store.verify(region, entry["version"])
+                failed |= bool(mismatched)
+                print(f"{region} v{entry['version']}: " + (f"MODIFIED {', '.join(mismatched)}" if mismatched else "ok"))
+        if failed:
+            raise SystemExit(1)
+    else:
+        for region in store.regions():
+            manifest = store.manifest(region)
+            for entry in manifest["versions"]:
+                marker = "*" if entry["version"] == manifest["current"] else " "
+                dataset = "with dataset" if "dataset" in entry["files"] else "no dataset"
+                print(f"{marker} {region} v{entry['version']}: {len(entry['crops'])} crops, {dataset}, "
+                      f"bundle {entry['bundle_hash'][:12]}, published {entry['published_at']}")
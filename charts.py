@@ -0,0 +1,306 @@
+# Charts of the "CSV Visualizations" page drawn from the current dataset (the figures
+# Notebooks/Final_csv.ipynb saved as static PNGs). Each figure is drawn from
+# pre-aggregated data (binned histograms, per-crop quantiles, a per-crop point sample),
+# so drawing cost does not grow with the row count, and cached by dataset hash + parameters.
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from PIL import Image
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import blended_transform_factory
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401  registers the 3d projection
+from data_stats import FEATURES, NUTRIENTS, SHORT_NAMES
+from image_service import FORMAT, WEBP_QUALITY, Rendition
+from timings import timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "figures")
+# Bump when drawing code changes so cached figures are redrawn
+FIGURE_VERSION = 1
+
+# 13.3 in at 110 dpi is the dashboard's 1460 px inline width
+DPI = 110
+WIDTH_INCHES = 13.3
+# Histogram bins for the bars; the density line is drawn from KDE_BINS smoothed counts
+HIST_BINS = 40
+KDE_BINS = 400
+KDE_BANDWIDTH_BINS = 6
+# Rows drawn per crop in the 3-D and scatter-matrix views
+POINTS_PER_CROP = 60
+# Figures kept in memory, least recently used dropped first
+MEMORY_FIGURES = 64
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+stats = {"memory_hits": 0, "disk_hits": 0, "drawn": 0}
+
+
+def aggregate(df, csv_stats, seed=0):
+    """Everything the charts need, in a size independent of the row count.
+
+    ``csv_stats`` is data_stats.compute_statistics(df); this adds histograms,
+    per-crop min/max for the whiskers and a sample of points per crop.
+    """
+    crops = list(csv_stats["crop_counts"].index)
+    histograms = {}
+    for feature in FEATURES:
+        x = df[feature].to_numpy()
+        low, high = float(csv_stats["summary"].loc[feature, "min"]), float(csv_stats["summary"].loc[feature, "max"])
+        counts, edges = np.histogram(x, bins=KDE_BINS, range=(low, high if high > low else low + 1))
+        histograms[feature] = (counts, edges)
+
+    grouped = df.groupby("label", observed=True)[FEATURES]
+    crop_min, crop_max = grouped.min().reindex(crops), grouped.max().reindex(crops)
+
+    # A uniform sample first (cheap at any size), then at most POINTS_PER_CROP rows of each crop
+    rng = np.random.default_rng(seed)
+    sample_rows = min(len(df), POINTS_PER_CROP * len(crops) * 20)
+    picks = np.sort(rng.choice(len(df), size=sample_rows, replace=False))
+    sample = df.iloc[picks].groupby("label", observed=True).head(POINTS_PER_CROP)
+    points = sample[FEATURES].to_numpy(dtype=np.float64)
+    point_crops = pd.Categorical(sample["label"].astype(str), categories=crops).codes
+
+    return {
+        "n_rows": csv_stats["n_rows"],
+        "crops": crops,
+        "crop_counts": csv_stats["crop_counts"].to_numpy(),
+        "correlation": csv_stats["correlation"],
+        "crop_mean": csv_stats["crop_mean"],
+        "crop_q1": csv_stats["crop_q1"],
+        "crop_median": csv_stats["crop_median"],
+        "crop_q3": csv_stats["crop_q3"],
+        "crop_min": crop_min,
+        "crop_max": crop_max,
+        "histograms": histograms,
+        "points": points,
+        "point_crops": point_crops,
+    }
+
+
+def _crop_colors(n, palette="tab20"):
+    return sns.color_palette(palette, n)
+
+
+def crop_distribution_figure(data):
+    order = np.argsort(-data["crop_counts"], kind="stable")
+    fig = Figure(figsize=(WIDTH_INCHES, 7))
+    ax = fig.add_subplot()
+    ax.barh(np.array(data["crops"])[order], data["crop_counts"][order],
+            color=sns.color_palette("viridis", len(order)))
+    ax.invert_yaxis()
+    ax.set_title("Crop Distribution Analysis", fontsize=16)
+    ax.set_xlabel("Count")
+    ax.set_ylabel("Crop Type")
+    fig.subplots_adjust(left=0.1, right=0.98, top=0.94, bottom=0.08)
+    return fig
+
+
+def correlation_figure(data):
+    fig = Figure(figsize=(WIDTH_INCHES * 0.75, WIDTH_INCHES * 0.62))
+    ax = fig.add_subplot()
+    sns.heatmap(data["correlation"], annot=True, cmap="coolwarm", fmt=".2f", ax=ax)
+    ax.set_title("Feature Correlation Heatmap", fontsize=16)
+    fig.subplots_adjust(left=0.13, right=1.0, top=0.94, bottom=0.12)
+    return fig
+
+
+def _density(counts, edges, scale=1.0):
+    """Gaussian-smoothed fine histogram, a KDE stand-in; ``scale`` matches it to wider bars"""
+    offsets = np.arange(-3 * KDE_BANDWIDTH_BINS, 3 * KDE_BANDWIDTH_BINS + 1)
+    kernel = np.exp(-0.5 * (offsets / KDE_BANDWIDTH_BINS) ** 2)
+    smooth = np.convolve(counts, kernel / kernel.sum(), mode="same")
+    centers = (edges[:-1] + edges[1:]) / 2
+    return centers, smooth * scale
+
+
+def histograms_figure(data, bins=HIST_BINS):
+    fig = Figure(figsize=(WIDTH_INCHES, WIDTH_INCHES * 0.5))
+    axes = fig.subplots(2, 4).ravel()
+    # Bars merge runs of the fine KDE_BINS histogram
+    starts = np.linspace(0, KDE_BINS, min(bins, KDE_BINS) + 1).round().astype(np.intp)
+    for ax, feature in zip(axes, FEATURES):
+        counts, edges = data["histograms"][feature]
+        ax.stairs(np.add.reduceat(counts, starts[:-1]), edges[starts], fill=True, color="teal", alpha=0.8,
+                  edgecolor="black")
+        ax.plot(*_density(counts, edges, KDE_BINS / bins), color="teal")
+        ax.set_title(f"{feature} Distribution", fontsize=12, weight="bold")
+        ax.set_xlabel(feature)
+        ax.set_ylabel("Frequency")
+        ax.grid(True, linestyle="--", linewidth=0.5)
+    axes[-1].remove()
+    fig.suptitle("Nutrient and Climate Variables: Histograms and Density", fontsize=15, weight="bold")
+    fig.subplots_adjust(left=0.05, right=0.99, top=0.89, bottom=0.09, wspace=0.3, hspace=0.45)
+    return fig
+
+
+def scatter_matrix_figure(data, features=tuple(FEATURES)):
+    # All panels share one Axes: each feature is scaled to [0, 1] and every panel is
+    # offset on a grid, so the matrix costs one scatter call instead of n * n Axes
+    features = list(features)
+    n = len(features)
+    index = [FEATURES.index(feature) for feature in features]
+    lows = np.array([data["histograms"][feature][1][0] for feature in features])
+    highs = np.array([data["histograms"][feature][1][-1] for feature in features])
+    scaled = (data["points"][:, index] - lows) / (highs - lows)
+    pitch = 1.08
+
+    fig = Figure(figsize=(WIDTH_INCHES, WIDTH_INCHES * 0.75))
+    ax = fig.add_axes([0.06, 0.03, 0.92, 0.9])
+    xs, ys = [], []
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                xs.append(scaled[:, j] + j * pitch)
+                ys.append(scaled[:, i] - i * pitch)
+    ax.scatter(np.concatenate(xs), np.concatenate(ys), s=3, alpha=0.5, color="teal", linewidths=0)
+    for i, feature in enumerate(features):
+        counts, edges = data["histograms"][feature]
+        x, density = _density(counts, edges)
+        ax.plot((x - lows[i]) / (highs[i] - lows[i]) + i * pitch, density / density.max() * 0.95 - i * pitch,
+                color="teal")
+        name = SHORT_NAMES.get(feature, feature)
+        ax.text(-0.04, 0.5 - i * pitch, name, rotation=90, ha="right", va="center", fontsize=9)
+        ax.text(i * pitch + 0.5, -(n - 1) * pitch - 0.06, f"{name}\n{lows[i]:.4g} – {highs[i]:.4g}", ha="center",
+                va="top", fontsize=9)
+    corners = np.arange(n) * pitch
+    for x0 in corners:
+        for y0 in corners:
+            ax.add_patch(Rectangle((x0, -y0), 1, 1, fill=False, linewidth=0.6))
+    ax.set_xlim(-0.02, (n - 1) * pitch + 1.02)
+    ax.set_ylim(-(n - 1) * pitch - 0.02, 1.02)
+    ax.axis("off")
+    fig.suptitle(f"Feature Pair Relationships ({len(scaled):,} of {data['n_rows']:,} rows)", fontsize=15)
+    return fig
+
+
+def nutrients_3d_figure(data, elev=20, azim=-60):
+    fig = Figure(figsize=(WIDTH_INCHES, WIDTH_INCHES * 0.7))
+    ax = fig.add_subplot(projection="3d")
+    colors = _crop_colors(len(data["crops"]))
+    index = [FEATURES.index(feature) for feature in NUTRIENTS]
+    for code, crop in enumerate(data["crops"]):
+        rows = data["points"][data["point_crops"] == code][:, index]
+        ax.scatter(rows[:, 0], rows[:, 1], rows[:, 2], label=crop, s=25, alpha=0.7, color=colors[code])
+    ax.set_xlabel("Nitrogen (N)")
+    ax.set_ylabel("Phosphorus (P)")
+    ax.set_zlabel("Potassium (K)")
+    ax.view_init(elev=elev, azim=azim)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc="upper left", fontsize=8)
+    ax.set_title("3D Nutrient Requirements", fontsize=16)
+    fig.subplots_adjust(left=0.0, right=0.85, top=0.95, bottom=0.03)
+    return fig
+
+
+def nutrient_heatmap_figure(data):
+    fig = Figure(figsize=(WIDTH_INCHES * 0.7, WIDTH_INCHES * 0.6))
+    ax = fig.add_subplot()
+    sns.heatmap(data["crop_mean"][NUTRIENTS], annot=True, cmap="YlGnBu", fmt=".1f", linewidths=0.5,
+                cbar_kws={"label": "Nutrient Level"}, ax=ax)
+    ax.set_title("Average Nutrient Levels by Crop", fontsize=16)
+    ax.set_ylabel("Crop Type")
+    ax.set_xlabel("Nutrients")
+    fig.subplots_adjust(left=0.16, right=1.0, top=0.94, bottom=0.08)
+    return fig
+
+
+def crop_boxplots_figure(data, features=tuple(FEATURES)):
+    features = list(features)
+    columns = 3 if len(features) > 4 else len(features)
+    rows = -(-len(features) // columns)
+    fig = Figure(figsize=(WIDTH_INCHES, 4.2 * rows))
+    axes = fig.subplots(rows, columns, squeeze=False).ravel()
+    colors = sns.color_palette("Set3", len(data["crops"]))
+    positions = np.arange(len(data["crops"]))
+    for ax, feature in zip(axes, features):
+        q1, median, q3 = (data[name][feature].to_numpy() for name in ["crop_q1", "crop_median", "crop_q3"])
+        iqr = q3 - q1
+        # Whiskers at 1.5 x IQR, clipped to the crop's data range
+        low = np.maximum(q1 - 1.5 * iqr, data["crop_min"][feature].to_numpy())
+        high = np.minimum(q3 + 1.5 * iqr, data["crop_max"][feature].to_numpy())
+        # Boxes, whiskers and medians as three collections rather than artists per box
+        ax.vlines(positions, low, high, color="black", linewidth=1, zorder=1)
+        ax.bar(positions, q3 - q1, bottom=q1, width=0.6, color=colors, edgecolor="black", zorder=2)
+        ax.hlines(median, positions - 0.3, positions + 0.3, color="black", linewidth=1.5, zorder=3)
+        # Crop names as plain text: a Tick per crop on every Axes would dominate the draw
+        ax.set_xticks([])
+        ax.locator_params(axis="y", nbins=5)
+        ax.set_xlim(-0.6, len(positions) - 0.4)
+        labels = blended_transform_factory(ax.transData, ax.transAxes)
+        for position, crop in zip(positions, data["crops"]):
+            ax.text(position, -0.02, crop, transform=labels, rotation=90, ha="center", va="top", fontsize=8)
+        ax.set_title(f"{feature} Distribution by Crop", fontsize=12, weight="bold")
+        ax.set_ylabel(feature)
+    for ax in axes[len(features):]:
+        ax.remove()
+    fig.suptitle("Nutrient and Climate Feature Distribution by Crop", fontsize=15, weight="bold")
+    height = fig.get_figheight()
+    fig.subplots_adjust(left=0.05, right=0.99, top=1 - 0.8 / height, bottom=1.0 / height, wspace=0.2, hspace=0.55)
+    return fig
+
+
+FIGURES = {
+    "crop_distribution": crop_distribution_figure,
+    "correlation": correlation_figure,
+    "histograms": histograms_figure,
+    "scatter_matrix": scatter_matrix_figure,
+    "nutrients_3d": nutrients_3d_figure,
+    "nutrient_heatmap": nutrient_heatmap_figure,
+    "crop_boxplots": crop_boxplots_figure,
+}
+
+
+def figure_key(name, dataset_hash, params, fmt):
+    description = json.dumps([FIGURE_VERSION, name, dataset_hash, sorted(params.items()), fmt, DPI], default=list)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _draw(name, data, params, fmt):
+    fig = FIGURES[name](data, **params)
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        fig.savefig(buffer, format="webp", dpi=DPI, pil_kwargs={"quality": WEBP_QUALITY})
+    else:
+        fig.savefig(buffer, format="png", dpi=DPI)
+    width, height = (fig.get_size_inches() * DPI).round().astype(int)
+    return Rendition(buffer.getvalue(), f"image/{fmt.lower()}", int(width), int(height))
+
+
+@timed("chart_render")
+def render(name, data, dataset_hash, fmt=FORMAT, **params):
+    """Figure ``name`` as an image, drawn once per (dataset version, parameters)"""
+    key = figure_key(name, dataset_hash, params, fmt)
+    with _lock:
+        cached = _memory.get(key)
+        if cached is not None:
+            _memory.move_to_end(key)
+            stats["memory_hits"] += 1
+            return cached
+
+    cache_path = os.path.join(CACHE_DIR, f"{name}-{key[:16]}.{fmt.lower()}")
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            data_bytes = f.read()
+        with Image.open(io.BytesIO(data_bytes)) as image:
+            result = Rendition(data_bytes, f"image/{fmt.lower()}", *image.size)
+        stats["disk_hits"] += 1
+    else:
+        result = _draw(name, data, params, fmt)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(result.data)
+        os.replace(tmp_path, cache_path)
+        stats["drawn"] += 1
+
+    with _lock:
+        _memory[key] = result
+        while len(_memory) > MEMORY_FIGURES:
+            _memory.popitem(last=False)
+    return result
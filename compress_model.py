@@ -0,0 +1,148 @@
+# Smaller variants of crop_recommender_rf.pkl for latency-bound serving
+#
+#   python compress_model.py                     # every method, report + variants in model_variants/
+#   CROP_MODEL_PATH=model_variants/trees-25 streamlit run dashboard.py
+#
+# Each variant is an exported array directory (see forest_engine.export), so
+# model_script.use_model() or CROP_MODEL_PATH serves it through predict_crop.
+import argparse
+import json
+import os
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+from forest_engine import compile_forest, save_compiled
+from model_metrics import RANDOM_STATE, TEST_SIZE
+from model_registry import LABEL_MAPPING_PATH, MODEL_PATH, pipeline_label_mapping
+from model_script import FEATURES
+from train_model import load_training_data, score_engine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VARIANTS_DIR = os.path.join(BASE_DIR, "model_variants")
+REPORT_FILE = "report.json"
+
+# Students learn from the teacher's labels on the training rows plus jittered
+# copies of them (Gaussian noise of JITTER_SCALE feature standard deviations)
+JITTER_COPIES = 10
+JITTER_SCALE = 0.05
+# Rows used to pick trees greedily; every tree's leaf values for them are held in memory
+SELECTION_ROWS = 3_000
+
+
+def jitter(X, copies, rng):
+    noise = rng.normal(scale=JITTER_SCALE * X.std(axis=0), size=(copies,) + X.shape)
+    return (X[None] + noise).reshape(-1, X.shape[1])
+
+
+def select_trees(engine, X, target, n_trees):
+    """Greedy forward selection of the trees whose average best agrees with ``target``"""
+    votes = engine.value[engine.apply(X)].astype(np.float32)  # (rows, trees, classes)
+    rows = np.arange(len(X))
+    total = np.zeros((len(X), engine.n_classes), dtype=np.float32)
+    available = np.ones(engine.n_trees, dtype=bool)
+    chosen = []
+    for _ in range(n_trees):
+        candidate = total[:, None, :] + votes
+        agreement = (candidate.argmax(axis=2) == target[:, None]).mean(axis=0)
+        # Ties (agreement saturates quickly) go to the tree that adds the most target probability
+        support = candidate[rows, :, target].mean(axis=0) / (len(chosen) + 1)
+        gain = np.where(available, agreement + 1e-3 * support, -np.inf)
+        best = int(np.argmax(gain))
+        chosen.append(best)
+        available[best] = False
+        total += votes[:, best]
+    return np.array(chosen)
+
+
+def distill_tree(X, y, max_depth):
+    return compile_forest(DecisionTreeClassifier(max_depth=max_depth, random_state=RANDOM_STATE).fit(X, y))
+
+
+def distill_boosting(X, y, n_stages, max_depth=3):
+    model = GradientBoostingClassifier(n_estimators=n_stages, max_depth=max_depth, learning_rate=0.3,
+                                       random_state=RANDOM_STATE)
+    return compile_forest(model.fit(X, y))
+
+
+def compress(model_path=MODEL_PATH, label_mapping_path=LABEL_MAPPING_PATH, csv_path=None, out_dir=VARIANTS_DIR,
+             subsets=(10, 25, 50), depths=(4, 6, 8), tree_depths=(6, 8, 10, 12), boosting_stages=(10, 20)):
+    csv_path = csv_path or os.path.join(BASE_DIR, "Crop_recommendation_corrected.csv")
+    pipeline = joblib.load(model_path)
+    teacher = compile_forest(pipeline["model"])
+    label_mapping = pipeline_label_mapping(pipeline, label_mapping_path)
+    X, y, _ = load_training_data(csv_path)
+    X_train, X_test, _, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+
+    # Transfer set labelled by the teacher, and jittered held-out rows to measure agreement on
+    rng = np.random.default_rng(RANDOM_STATE)
+    X_transfer = np.vstack([X_train, jitter(X_train, JITTER_COPIES, rng)])
+    y_transfer = teacher.predict(X_transfer)
+    X_agree = jitter(X_test, JITTER_COPIES, rng)
+    y_agree = teacher.predict(X_agree)
+    selection = rng.choice(len(X_transfer), size=min(SELECTION_ROWS, len(X_transfer)), replace=False)
+
+    variants = [("teacher", "original forest", lambda: teacher)]
+    for n in subsets:
+        variants.append((f"trees-{n}", f"best {n} of {teacher.n_trees} trees",
+                         lambda n=n: teacher.subset(select_trees(teacher, X_transfer[selection],
+                                                                 y_transfer[selection], n))))
+    for depth in depths:
+        variants.append((f"depth-{depth}", f"all trees cut at depth {depth}", lambda d=depth: teacher.truncate(d)))
+    for depth in tree_depths:
+        variants.append((f"tree-{depth}", f"one distilled tree, depth {depth}",
+                         lambda d=depth: distill_tree(X_transfer, y_transfer, d)))
+    for stages in boosting_stages:
+        variants.append((f"boosting-{stages}", f"distilled gradient boosting, {stages} stages of depth 3",
+                         lambda s=stages: distill_boosting(X_transfer, y_transfer, s)))
+
+    report = []
+    for name, method, build in variants:
+        start = time.perf_counter()
+        engine = build()
+        build_seconds = time.perf_counter() - start
+        directory = os.path.join(out_dir, name)
+        if name != "teacher":
+            save_compiled(engine, directory, features=FEATURES, label_mapping=label_mapping)
+        row = {"variant": name, "method": method, "path": None if name == "teacher" else directory,
+               "n_trees": engine.n_trees, "max_depth": engine.max_depth,
+               "teacher_agreement": float((engine.predict(X_agree) == y_agree).mean()),
+               "build_seconds": build_seconds, **score_engine(engine, X_test, y_test)}
+        report.append(row)
+        print(f"{name:<13} {row['accuracy']:>8.4f} {row['teacher_agreement']:>9.4f} {row['n_trees']:>6} "
+              f"{row['n_nodes']:>7} {row['size_bytes'] / 1e3:>9.0f} {row['single_row_us']:>8.1f} "
+              f"{row['batch_us_per_row']:>9.2f}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def int_list(text):
+    return [int(value) for value in text.split(",")] if text else []
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Shrink the crop recommendation forest")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--labels", default=LABEL_MAPPING_PATH)
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "Crop_recommendation_corrected.csv"))
+    parser.add_argument("--out-dir", default=VARIANTS_DIR)
+    parser.add_argument("--subsets", type=int_list, default=[10, 25, 50], help="tree counts to select")
+    parser.add_argument("--depths", type=int_list, default=[4, 6, 8], help="depths to truncate every tree at")
+    parser.add_argument("--tree-depths", type=int_list, default=[6, 8, 10, 12], help="depths of a distilled tree")
+    parser.add_argument("--boosting-stages", type=int_list, default=[10, 20],
+                        help="stages of a distilled gradient-boosted model")
+    args = parser.parse_args()
+
+    print(f"{'variant':<13} {'accuracy':>8} {'agreement':>9} {'trees':>6} {'nodes':>7} {'size KB':>9} "
+          f"{'row us':>8} {'batch us':>9}")
+    compress(args.model, args.labels, args.csv, args.out_dir, args.subsets, args.depths, args.tree_depths,
+             args.boosting_stages)
+    print(f"Report and variants written to {args.out_dir}; serve one with CROP_MODEL_PATH=<variant dir>")
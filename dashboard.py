@@ -1,26 +1,119 @@
 # Crop Recommendation Dashboard in Streamlit
 import streamlit as st
+import altair as alt
 import pandas as pd
 import os
-from PIL import Image
-import joblib
-import base64
+import time
+import timings
+
+run_started = time.perf_counter()
 
 # === PAGE CONFIG ===
 st.set_page_config(page_title="\U0001F33E Crop Recommendation Dashboard", layout="wide")
 
 # === LOAD PYTHON MODEL ===
-from model_script import predict_crop  # DO NOT TOUCH MODEL
+import model_script
+
+@st.cache_resource
+def load_model():
+    # Unpickled on first use and shared by every session in this process
+    return model_script.get_model()
+
+@st.cache_resource
+def load_prediction_executor(region=None):
+    # One batching thread per process and bundle: concurrent sessions' clicks become one forest call
+    return prediction_executor.PredictionExecutor(k=3, region=region)
 
 # === LOAD DATA ===
+# charts (matplotlib, seaborn), model_metrics and leaf_analysis (scipy) are imported by the pages that use them
+import data_stats
+import image_service
+import dataset_store
+import prediction_executor
 csv_path = "Crop_recommendation_corrected.csv"
 img_dir = "images"
+
+@st.cache_data(show_spinner="Computing dataset statistics...")
+def load_csv_statistics(content_hash):
+    # Keyed on the CSV's content hash, so changed data costs exactly one recompute
+    return data_stats.compute_statistics(data_stats.load_dataset(csv_path))
+
+@st.cache_data(show_spinner="Evaluating model...")
+def load_model_evaluation(content_hash, model_hash, region=None):
+    # One evaluation per (dataset, model) version
+    return model_metrics.evaluate_model(data_stats.load_dataset(csv_path), model_script.get_model(region))
+
+@st.cache_data(show_spinner="Aggregating dataset for charts...")
+def load_chart_data(content_hash):
+    # One pass over the rows per CSV version; every chart is drawn from this summary
+    df = data_stats.load_dataset(csv_path)
+    return charts.aggregate(df, data_stats.compute_statistics(df))
+
+@st.cache_data(show_spinner="Loading leaf hue features...")
+def load_leaf_statistics(table_stamp):
+    # Recomputed only after `python leaf_analysis.py` has rewritten the feature table
+    table = leaf_analysis.FeatureTable.load()
+    return leaf_analysis.crop_statistics(table), leaf_analysis.class_counts(table)
+
+@st.cache_resource(show_spinner="Building columnar dataset cache...")
+def load_dataset_store(content_hash):
+    # Converted to typed .npy columns once per CSV version, then memory-mapped
+    return dataset_store.ColumnarDataset.from_csv(csv_path)
+
+@st.cache_resource
+def anova_tracker(path):
+    # Shared across sessions; keeps per-crop sums so appended rows update it incrementally
+    return model_metrics.CsvAnovaTracker(path)
+
+@timings.timed("show_image")
 def show_image(filename, caption="", use_container_width=True):
     path = os.path.join(img_dir, filename)
     if os.path.exists(path):
-        st.image(Image.open(path), caption=caption, use_column_width=use_container_width)
+        # Cached WebP rendition instead of re-encoding the full-size PNG on every rerun
+        width = image_service.INLINE_WIDTH if use_container_width else image_service.THUMBNAIL_WIDTH
+        rendition = image_service.rendition(path, width)
+        style = "width:100%" if use_container_width else f"max-width:100%;width:{rendition.width}px"
+        st.markdown(f'<img src="{image_service.data_uri(rendition)}" style="{style}" alt="{filename}">',
+                    unsafe_allow_html=True)
+        if caption:
+            st.caption(caption)
     else:
         st.warning(f"⚠ {filename} not found in {img_dir}")
+
+def download_image(filename):
+    # Full resolution is only ever sent for downloads; the file is read once per version
+    path = os.path.join(img_dir, filename)
+    if os.path.exists(path):
+        st.download_button("⬇️ Download Image", image_service.original_bytes(path), file_name=filename, mime="image/png")
+@timings.timed("show_chart")
+def show_chart(name, content_hash, **params):
+    # Drawn from the current dataset and cached per (dataset version, parameters)
+    rendition = charts.render(name, load_chart_data(content_hash), content_hash, **params)
+    st.markdown(f'<img src="{image_service.data_uri(rendition)}" style="width:100%" alt="{name}">',
+                unsafe_allow_html=True)
+    extension = rendition.mime.split("/")[1]
+    st.download_button("⬇️ Download Image", rendition.data, file_name=f"{name}.{extension}", mime=rendition.mime,
+                       key=f"download_{name}")
+
+@timings.timed("show_sweep")
+def show_sweep(sweep):
+    # One rect per grid cell, coloured by crop, with the entered reading marked
+    frame = sweep.frame()
+    encodings = {"color": alt.Color("crop:N", title="Crop"), "tooltip": [*sweep.features, "crop"]}
+    reading = {}
+    for channel, name, column, values in zip(("x", "y"), sweep.features, sweep.columns, sweep.axes):
+        half = (values[1] - values[0]) / 2
+        frame[f"{channel}_low"], frame[f"{channel}_high"] = frame[name] - half, frame[name] + half
+        axis = alt.X if channel == "x" else alt.Y
+        encodings[channel] = axis(f"{channel}_low:Q", title=name, scale=alt.Scale(zero=False, nice=False))
+        encodings[f"{channel}2"] = f"{channel}_high"
+        reading[channel] = axis(f"{name}:Q", title=name)
+    cells = alt.Chart(frame).mark_rect().encode(**encodings)
+    point = pd.DataFrame({name: [sweep.base[column]] for name, column in zip(sweep.features, sweep.columns)})
+    marker = alt.Chart(point).mark_point(shape="cross", size=200, filled=True, color="black").encode(**reading)
+    st.altair_chart((cells + marker).properties(height=420 if len(sweep.features) == 2 else 120),
+                    use_container_width=True)
+
 # === IMAGE DESCRIPTIONS ===
 
 # === STYLING TO REDUCE SPACING ===
@@ -38,9 +131,28 @@ st.markdown("""
 
 # === SIDEBAR ===
 st.sidebar.title("\U0001F4D1 Navigation")
-page = st.sidebar.radio("Go To", [
-    "Overview", "CSV Visualizations", "Crop Prediction Model", "Model Evaluation & ANOVA Analysis", "Image Visualizations", "Dataset Preview"
-])
+pages = ["Overview", "CSV Visualizations", "Crop Prediction Model", "Model Evaluation & ANOVA Analysis", "Image Visualizations", "Dataset Preview"]
+# Hidden unless the URL has ?perf=1 or CROP_PERF_PAGE=1 is set
+if st.query_params.get("perf") == "1" or os.environ.get("CROP_PERF_PAGE") == "1":
+    pages.append("Performance")
+page = st.sidebar.radio("Go To", pages)
+
+# === MODEL BUNDLE ===
+# Regional bundles (bundle_store.py) replace the model and, when they carry one, the dataset
+region = None
+region_dataset = None
+bundle_regions = model_script.bundle_pool.store.regions()
+if bundle_regions:
+    choice = st.sidebar.selectbox("Model bundle", ["Default"] + bundle_regions)
+    if choice != "Default":
+        region = choice
+        version = model_script.bundle_pool.current_version(region)
+        region_dataset = model_script.bundle_pool.store.paths(region, version)["dataset"]
+        bundle_crops = model_script.bundle_pool.store.entry(region, version)["crops"]
+        st.sidebar.caption(f"{region} v{version}: {len(bundle_crops)} crops"
+                           + ("" if region_dataset else "; no dataset bundled, data pages show the default CSV"))
+        if region_dataset:
+            csv_path = region_dataset
 
 # === PAGE ROUTING ===
 if page == "Overview":
@@ -75,374 +187,48 @@ This project uses a machine learning model to recommend the most suitable crop b
     show_image('overview.png')
 
 elif page == "CSV Visualizations":
+    import charts
     st.title("📊 CSV-Based Visualizations")
+    csv_hash = data_stats.file_hash(csv_path)
+    csv_stats = load_csv_statistics(csv_hash)
 
-    show_image("crop_distribution.png")
+    show_chart("crop_distribution", csv_hash)
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("This histogram shows that equal number of samples (100) for all 15 crops is taken.")
-    with open(os.path.join(img_dir, "crop_distribution.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="crop_distribution.png", mime="image/png")
+        st.markdown(data_stats.crop_distribution_markdown(csv_stats))
     st.markdown("---")
 
-    show_image("correlation_matrix.png")
+    show_chart("correlation", csv_hash)
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("🔍 Top Positive Correlation (> 0.5):\n- P & K: 0.837\n\n🔍 Top Negative Correlation (< -0.2):\n- N & K: -0.262\n- P & rainfall: -0.316\n\n✅ Key Observations:\n- Strong P–K correlation\n- Weak/Negative correlation of N with P & K\n- Rainfall positively correlates with N and humidity, but negatively with P.\n- pH is nearly uncorrelated with most variables.")
-    with open(os.path.join(img_dir, "correlation_matrix.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="correlation_matrix.png", mime="image/png")
+        st.markdown(data_stats.correlation_markdown(csv_stats))
     st.markdown("---")
 
-    show_image("better_nutrient_histograms.png")
+    show_chart("histograms", csv_hash)
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("""
-### 📊 Nutrient & Environmental Summary
-
-A statistical breakdown of key soil and climate features used in modeling:
-
----
-
-#### 🌱 *Nitrogen (N)*
-- *Mean*: 50.62    
-- *Median*: 37.00  
-- *Standard Deviation*: 37.76  
-- *Range*: 0.00 → 140.00  
-- *Skewness: 0.49*(Symmetrical)  
-
----
-
-#### 🌿 *Phosphorus (P)*
-- *Mean*: 56.65  
-- *Median*: 51.00  
-- *Standard Deviation*: 36.79  
-- *Range*: 5.00 → 145.00  
-- *Skewness: 0.93*(Right-skewed)
-
----
-
-#### 🪴 *Potassium (K)*
-- *Mean*: 55.29  
-- *Median*: 34.00  
-- *Standard Deviation*: 59.11  
-- *Range*: 5.00 → 205.00  
-- *Skewness: 1.86*(Right-skewed)  
-➡ *Highly skewed distribution – transformation may help.*
-
----
-
-#### 🌡 *Temperature*
-- *Mean*: 24.08°C  
-- *Median*: 24.14°C  
-- *Standard Deviation*: 4.69  
-- *Range*: 8.83 → 41.95  
-- *Skewness: 0.10*(Symmetrical)  
-⚠ *Potential upper outliers.*
-
----
-
-#### 💧 *Humidity*
-- *Mean*: 70.06%  
-- *Median*: 80.00%  
-- *Standard Deviation*: 23.80  
-- *Range*: 14.26 → 99.98  
-- *Skewness: -1.10*(Left-skewed)  
-➡ *Highly skewed – may require transformation.*
-
----
-
-#### ⚗ *pH*
-- *Mean*: 6.42  
-- *Median*: 6.31  
-- *Standard Deviation*: 0.71  
-- *Range*: 4.51 → 8.87  
-- *Skewness: 0.52*(Right-skewed)  
-⚠ *Slight upper-end outliers possible.*
-
----
-
-#### 🌧 *Rainfall*
-- *Mean*: 116.08 mm  
-- *Median*: 105.06 mm  
-- *Standard Deviation*: 50.94  
-- *Range*: 35.03 → 298.56  
-- *Skewness: 1.14*(Right-skewed)  
-➡ *Transformation may help skewness.*  
-⚠ *Upper outliers detected.*
-
----
-""")
-    with open(os.path.join(img_dir, "better_nutrient_histograms.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="better_nutrient_histograms.png", mime="image/png")
+        st.markdown(data_stats.feature_summary_markdown(csv_stats))
     st.markdown("---")
 
-    show_image("5_scatter_matrix.png")
+    show_chart("scatter_matrix", csv_hash)
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("""
-### Correlation Matrix Insights
-
-**Strong Correlations (|r| > 0.7):**
-- P & K: 0.84 (Strong Positive)
-
-**Top 3 Most Correlated Pairs:**
-- P & K: 0.84  
-- P & Rainfall: -0.32  
-- Humidity & Rainfall: 0.28
-
-**3 Least Correlated Pairs:**
-- N & Humidity: 0.06  
-- pH & Rainfall: -0.05  
-- P & Humidity: -0.02
-
----
-
-### Descriptive Statistics & Distribution Shape
-
-*Nitrogen (N)*  
-- Mean: 50.62  Median: 37.00  Std: 37.76  
-- Skewness: 0.49 → Approximately symmetric
-
-*Phosphorus (P)*  
-- Mean: 56.65  Median: 51.00  Std: 36.79  
-- Skewness: 0.93 → Moderately skewed
-
-*Potassium (K)*  
-- Mean: 55.29  Median: 34.00  Std: 59.11  
-- Skewness: 1.86 → Highly skewed
-
-*Temperature*  
-- Mean: 24.08°C  Median: 24.14°C  Std: 4.69  
-- Skewness: 0.10 → Approximately symmetric
-
-*Humidity*  
-- Mean: 70.06  Median: 80.00  Std: 23.80  
-- Skewness: -1.10 → Highly skewed
-
-*pH*  
-- Mean: 6.42  Median: 6.31  Std: 0.71  
-- Skewness: 0.52 → Moderately skewed
-
-*Rainfall*  
-- Mean: 116.08 mm  Median: 105.06 mm  Std: 50.94  
-- Skewness: 1.14 → Highly skewed
-""")
-    with open(os.path.join(img_dir, "5_scatter_matrix.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="5_scatter_matrix.png", mime="image/png")
+        st.markdown(data_stats.scatter_matrix_markdown(csv_stats))
     st.markdown("---")
 
-    show_image("3d_nutrients.png")
+    left, right = st.columns(2)
+    # Coarse steps keep the number of cached 3-D views small
+    elevation = left.slider("Elevation", 0, 90, 20, step=10)
+    azimuth = right.slider("Azimuth", -180, 180, -60, step=15)
+    show_chart("nutrients_3d", csv_hash, elev=elevation, azim=azimuth)
     with st.expander("📌 Statistical Analysis"):
-
-        st.markdown('''### 📊  Nutrient Requirement Analysis by Crop
-
-#### Nitrogen
-###### 🔼 Top 5 Crops by Nitrogen Requirement
-
-| Crop     | Avg Nitrogen |
-|----------|--------------|
-| Cotton   | 117.77       |
-| Coffee   | 101.20       |
-| Banana   | 100.23       |
-| Rice     | 79.89        |
-| Jute     | 78.40        |
-
-
-###### 🔽 Bottom 5 Crops by Nitrogen Requirement
-
-| Crop        | Avg Nitrogen |
-|-------------|--------------|
-| Beans       | 20.75        |
-| Mango       | 20.07        |
-| Orange      | 19.58        |
-| Pomegranate | 18.87        |
-| Lentil      | 18.77        |
-
-
-#### Phosphorus
-###### 🔼 Top 5 Crops by Phosphorus Requirement
-
-| Crop       | Avg Phosphorus |
-|------------|----------------|
-| Apple      | 134.22         |
-| Grapes     | 132.53         |
-| Banana     | 82.01          |
-| Lentil     | 68.36          |
-| Soya Bean  | 67.79          |
-
-
-###### 🔽 Bottom 5 Crops by Phosphorus Requirement
-
-| Crop        | Avg Phosphorus |
-|-------------|----------------|
-| Coffee      | 28.74          |
-| Mango       | 27.18          |
-| Pomegranate | 18.75          |
-| Coconut     | 16.93          |
-| Orange      | 16.55          |
-
-
-#### Potassium
-###### 🔼 Top 5 Crops by Potassium Requirement
-
-| Crop        | Avg Potassium |
-|-------------|----------------|
-| Grapes      | 200.11         |
-| Apple       | 199.89         |
-| Soya Bean   | 79.92          |
-| Banana      | 50.05          |
-| Pomegranate | 40.21          |
-
-
-###### 🔽 Bottom 5 Crops by Potassium Requirement
-
-| Crop    | Avg Potassium |
-|---------|----------------|
-| Beans   | 20.05          |
-| Maize   | 19.79          |
-| Cotton  | 19.56          |
-| Lentil  | 19.41          |
-| Orange  | 10.01          |
-
-### Nutrient Spread Summary (mean ± std)
-
-| Crop        | N (mean ± std)     | P (mean ± std)     | K (mean ± std)     |
-|-------------|---------------------|---------------------|---------------------|
-| Rice        | 79.89 ± 11.92       | 47.58 ± 7.90        | 39.87 ± 2.95        |
-| Maize       | 77.76 ± 11.95       | 48.44 ± 8.01        | 19.79 ± 2.94        |
-| Soya Bean   | 40.09 ± 12.15       | 67.79 ± 7.50        | 79.92 ± 3.26        |
-| Beans       | 20.75 ± 10.83       | 67.54 ± 7.57        | 20.05 ± 3.10        |
-| Lentil      | 18.77 ± 12.20       | 68.36 ± 7.34        | 19.41 ± 2.97        |
-| Pomegranate | 18.87 ± 12.62       | 18.75 ± 7.39        | 40.21 ± 3.03        |
-| Banana      | 100.23 ± 11.11      | 82.01 ± 7.69        | 50.05 ± 3.38        |
-| Mango       | 20.07 ± 12.33       | 27.18 ± 7.66        | 29.92 ± 3.10        |
-| Grapes      | 23.18 ± 12.47       | 132.53 ± 7.62       | 200.11 ± 3.27       |
-| Apple       | 20.80 ± 11.86       | 134.22 ± 8.14       | 199.89 ± 3.32       |
-| Orange      | 19.58 ± 11.94       | 16.55 ± 7.69        | 10.01 ± 3.06        |
-| Coconut     | 21.98 ± 11.76       | 16.93 ± 8.36        | 30.59 ± 3.00        |
-| Cotton      | 117.77 ± 11.63      | 46.24 ± 7.35        | 19.56 ± 3.17        |
-| Jute        | 78.40 ± 10.97       | 46.86 ± 7.20        | 39.99 ± 3.31        |
-| Coffee      | 101.20 ± 12.35      | 28.74 ± 7.28        | 29.94 ± 3.25        |
-
----
-
-### Cluster-Based Crop Grouping (Based on NPK Profiles)
-
-| Cluster | Crops                                     |
-|---------|-------------------------------------------|
-| 0       | Coconut, Mango, Orange, Pomegranate       |
-| 1       | Apple, Grapes                             |
-| 2       | Coffee, Cotton (91%), Jute, Maize, Rice   |
-| 3       | Banana, Cotton (9%)                       |
-| 4       | Beans, Lentil, Soya Bean                  |
-''')
-    with open(os.path.join(img_dir, "3d_nutrients.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="3d_nutrients.png", mime="image/png")
+        st.markdown(data_stats.nutrient_requirements_markdown(csv_stats))
     st.markdown("---")
 
-    show_image("6_nutrient_heatmap.png")
+    show_chart("nutrient_heatmap", csv_hash)
     with st.expander("📌 Statistical Analysis"):
         st.markdown("Heatmap showing Average Nutrient Levels by Crop.\nUseful for identifying high/low nutrient-demanding crops.")
-    with open(os.path.join(img_dir, "6_nutrient_heatmap.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="6_nutrient_heatmap.png", mime="image/png")
     st.markdown("---")
 
-    show_image("cropwise_boxplots.png")
+    show_chart("crop_boxplots", csv_hash)
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("""
-### 🔍 Automated Insights by Feature
-
----
-
-#### *Feature: N*
-*Top Crops by Median Value*
-- Cotton: *117.0*
-- Coffee: *103.0*
-- Banana: *100.5*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-
-#### *Feature: P*
-*Top Crops by Median Value*
-- Apple: *136.5*
-- Grapes: *133.0*
-- Banana: *81.0*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-
-#### *Feature: K*
-*Top Crops by Median Value*
-- Grapes: *201.0*
-- Apple: *200.0*
-- Soya Bean: *79.0*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-
-#### *Feature: Temperature*
-*Top Crops by Median Value*
-- Mango: *31.30*
-- Banana: *27.44*
-- Coconut: *27.39*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-
-#### *Feature: Humidity*
-*Top Crops by Median Value*
-- Coconut: *94.96*
-- Apple: *92.42*
-- Orange: *91.96*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-
-#### *Feature: pH*
-*Top Crops by Median Value*
-- Soya Bean: *7.36*
-- Orange: *7.02*
-- Lentil: *6.95*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-
-#### *Feature: Rainfall*
-*Top Crops by Median Value*
-- Rice: *233.12*
-- Jute: *175.59*
-- Coconut: *172.00*
-
-*Crops with Most Outliers*
-- Rice: 0
-- Maize: 0
-- Soya Bean: 0
-
----
-""")
-    with open(os.path.join(img_dir, "cropwise_boxplots.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="cropwise_boxplots.png", mime="image/png")
+        st.markdown(data_stats.boxplot_insights_markdown(csv_stats))
     st.markdown("---")
 
 
@@ -461,25 +247,81 @@ elif page == "Crop Prediction Model":
     pH = st.number_input("pH", 0.0, 14.0, 6.5)
     rainfall = st.number_input("Rainfall (mm)", 0.0, 300.0, 100.0)
 
-    if st.button("\U0001F33F Recommend Crop"):
-        prediction = predict_crop(N, P, K, temperature, humidity, pH, rainfall)
-        st.success(f"✅ Recommended Crop: {prediction}")
+    if region is not None:
+        model_script.get_model(region)
+    else:
+        load_model()
+    # Grid mode (CROP_GRID_PATH) only while the grid matches the served model
+    grid = model_script.active_grid(region)
+    if region is None and model_script.grid_error:
+        st.warning(f"⚠ Lookup grid turned off, answering from the full model: {model_script.grid_error}")
+    clicked = st.button("\U0001F33F Recommend Crop")
+    if clicked and grid is not None:
+        # One lookup, no probabilities
+        st.success(f"✅ Recommended Crop: {model_script.predict_crop(N, P, K, temperature, humidity, pH, rainfall)}")
+        rates = grid.disagreement
+        differs = [f"{rates[name]:.1%} of {where}" for name, where in
+                   [("csv_rows", "the dataset's rows"), ("random_domain_rows", "random inputs across the whole input range")]
+                   if name in rates]
+        st.caption("Approximate answer from the precomputed lookup grid"
+                   + (f"; it differs from the full model on {' and on '.join(differs)}." if differs else "."))
+    elif clicked:
+        crops, probabilities = load_prediction_executor(region).predict([N, P, K, temperature, humidity, pH, rainfall])
+        st.success(f"✅ Recommended Crop: {crops[0]} ({probabilities[0]:.1%} confidence)")
+
+        st.subheader("🥈 Runner-up Crops")
+        top_df = pd.DataFrame({
+            "Crop": crops,
+            "Confidence": [f"{p:.1%}" for p in probabilities]
+        }, index=range(1, len(crops) + 1))
+        st.dataframe(top_df, use_container_width=True)
+
+        # Contributions only add up for averaged trees, not boosted (softmax) variants
+        if model_script.get_model(region).engine.link == "mean":
+            explanation = model_script.explain_crop(N, P, K, temperature, humidity, pH, rainfall, region=region)
+            st.subheader("🔎 What Drove This Recommendation")
+            st.bar_chart(pd.DataFrame({"Contribution": explanation["contributions"]}))
+            st.caption(f"How far each input moved {explanation['crop']}'s probability from its "
+                       f"{explanation['base']:.1%} baseline to {explanation['probability']:.1%}.")
+
+    if clicked and (region is None or region_dataset):
+        # The model still answers, but these inputs are unlike anything it was trained on
+        for reason in model_script.region_validator(region).reasons([N, P, K, temperature, humidity, pH, rainfall]):
+            st.warning(f"⚠ Unusual input: {reason}")
+
+    st.header("🧭 What-if Sweep")
+    st.markdown("How the recommendation changes when one or two inputs vary and the rest stay at the values above.")
+    swept = st.multiselect("Inputs to vary", model_script.FEATURES, default=["N", "P"], max_selections=2)
+    steps = st.slider("Grid points per input", 20, 150, 100, step=10)
+    if swept:
+        sweep = model_script.sweep_crop([N, P, K, temperature, humidity, pH, rainfall], swept, steps, region=region)
+        show_sweep(sweep)
+        crossings = sweep.crossings()
+        if crossings.empty:
+            st.info(f"{sweep.base_crop.capitalize()} stays the recommendation across the swept range.")
+        else:
+            st.caption(f"Where the recommendation flips when one input changes on its own, nearest first "
+                       f"(currently {sweep.base_crop}).")
+            st.dataframe(crossings.round(2), use_container_width=True, hide_index=True)
 
 
 # --- Section Title ---
 elif page == "Model Evaluation & ANOVA Analysis":
+    import model_metrics
     st.title("📊 Model Evaluation & ANOVA Analysis")
     
     # --- Evaluation Metrics Table ---
     st.subheader("✅ Overall Evaluation Metrics")
 
-    eval_metrics = {
-    "Metric": ["Accuracy", "Precision", "Recall", "F1-Score"],
-    "Value": ["0.9967", "0.9968", "0.9967", "0.9967"]
-    }
+    if region is not None and not region_dataset:
+        # The default CSV has crops this model never saw; there is nothing fair to score it on
+        st.info(f"The {region} bundle was published without a dataset, so it cannot be evaluated here.")
+        st.stop()
+    evaluation = load_model_evaluation(data_stats.file_hash(csv_path), model_script.get_model(region).artifact_hash, region)
+    st.caption(f"Computed on a held-out split of {evaluation['test_rows']} rows.")
 
     # Create DataFrame
-    eval_df = pd.DataFrame(eval_metrics)
+    eval_df = evaluation["overall"].assign(Value=lambda df: df["Value"].map("{:.4f}".format))
     
     # Set index starting from 1
     eval_df.index = range(1, len(eval_df) + 1)
@@ -492,12 +334,10 @@ elif page == "Model Evaluation & ANOVA Analysis":
     
     # --- Confusion Matrix Table (Simplified Example) ---
     st.subheader("🧮 Classification Summary")
-    conf_df = pd.DataFrame({
-        "Crop": ["apple", "banana", "beans", "coconut", "coffee", "cotton", "grapes", "jute", "lentil", "maize",
-                 "mango", "orange", "pomegranate", "rice", "soya bean"],
-        "Precision": ["1.00"] * 7 + ["0.95"] + ["1.00"] * 5 + ["1.00", "1.00"],
-        "Recall":    ["1.00"] * 14 + ["1.00"],
-        "F1-score":  ["1.00"] * 7 + ["0.98"] + ["1.00"] * 5 + ["0.97", "1.00"]}, index=range(1, 16))
+    conf_df = evaluation["per_class"].drop(columns="Support")
+    for col in ["Precision", "Recall", "F1-score"]:
+        conf_df[col] = conf_df[col].map("{:.2f}".format)
+    conf_df.index = range(1, len(conf_df) + 1)
     st.dataframe(conf_df.style.set_properties(subset=slice(None), **{'text-align': 'left'}).set_table_styles([{
         'selector': 'th',
         'props': [('text-align', 'left')]
@@ -510,47 +350,62 @@ elif page == "Model Evaluation & ANOVA Analysis":
     
     # --- ANOVA Table ---
     st.subheader("🔬 ANOVA Results Across Crops")
+    tracker = anova_tracker(csv_path)
+    tracker.refresh()  # folds in appended rows only
+    anova_results = tracker.table()
     anova_data = {
-        "Parameter": ["Rainfall", "pH", "Temperature", "Humidity", "N", "P", "K"],
-        "F-value": ["868.431", "100.080", "69.727", "5656.071", "975.119", "2368.657", "37750.841"],
-        "p-value": ["0.000"] * 7
+        "Parameter": [data_stats.SHORT_NAMES[feature] for feature in anova_results.index],
+        "F-value": anova_results["F-value"].map("{:.3f}".format),
+        "p-value": anova_results["p-value"].map("{:.3f}".format)
     }
-    anova_df = pd.DataFrame(anova_data, index=range(1, 8))
+    anova_df = pd.DataFrame(anova_data).set_index(pd.RangeIndex(1, len(anova_results) + 1))
     st.dataframe(anova_df.style.set_properties(subset=slice(None), **{'text-align': 'left'}).set_table_styles([{
         'selector': 'th',
         'props': [('text-align', 'left')]
     }]), use_container_width=True)
     
-    st.success("✅ Significant differences detected among crops for all parameters.")
+    not_significant = anova_results.index[anova_results["p-value"] >= 0.05]
+    if len(not_significant) == 0:
+        st.success("✅ Significant differences detected among crops for all parameters.")
+    else:
+        names = ", ".join(data_stats.SHORT_NAMES[feature] for feature in not_significant)
+        st.warning(f"⚠ No significant difference among crops for: {names} (p ≥ 0.05).")
     
 
 elif page == "Image Visualizations":
+    import leaf_analysis
     st.title("🧭 Image-Based Visual Insights")
+    leaf_stamp = leaf_analysis.table_stamp()
+    leaf_stats, leaf_counts = load_leaf_statistics(leaf_stamp) if leaf_stamp else (None, None)
 
     show_image("class_distribution.png")
     with st.expander("📌 Statistical Analysis"):
         st.markdown("📊 This Bar Chart shows number of images per class for both healthy and diseased crops.")
-    with open(os.path.join(img_dir, "class_distribution.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="class_distribution.png", mime="image/png")
+        if leaf_counts is not None:
+            st.markdown(f"Current feature table: {leaf_counts.sum():,} images in {len(leaf_counts)} classes.")
+            st.bar_chart(leaf_counts)
+    download_image("class_distribution.png")
     st.markdown("---")
 
     show_image("bean_samples.png")
     with st.expander("📌 Statistical Analysis"):
         st.markdown("Sample images of bean leaves showing the comparison of healthy and diseased crops' leaves.")
-    with open(os.path.join(img_dir, "bean_samples.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="bean_samples.png", mime="image/png")
+    download_image("bean_samples.png")
     st.markdown("---")
 
     show_image("all_crops_color_comparison.png")
     with st.expander("📌 Statistical Analysis"):
         st.markdown("Healthy VS Diseased Leaf Color Distribution (HSV Hue Channel).")
-    with open(os.path.join(img_dir, "all_crops_color_comparison.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="all_crops_color_comparison.png", mime="image/png")
+    download_image("all_crops_color_comparison.png")
     st.markdown("---")
 
     show_image("scientific_insights.png")
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("""
+        if leaf_stats is not None:
+            st.markdown("### Key Scientific Findings (Color Shift Analysis)\n\n" + leaf_analysis.summary_markdown(leaf_stats))
+            st.dataframe(leaf_stats.round(4), use_container_width=True)
+        else:
+            st.markdown("""
 ### Key Scientific Findings (Color Shift Analysis)
 
 - *Strongest Color Shift:* Pomegranate (Δ = 0.14)  
@@ -559,13 +414,15 @@ elif page == "Image Visualizations":
 
 These findings highlight the potential of hue-based color metrics in accurately identifying disease presence across diverse crop types.
     """)
-    with open(os.path.join(img_dir, "scientific_insights.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="scientific_insights.png", mime="image/png")
+    download_image("scientific_insights.png")
     st.markdown("---")
 
     show_image("banana_comparison.png")
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("""
+        if leaf_stats is not None and "banana" in leaf_stats.index:
+            st.markdown(leaf_analysis.crop_markdown(leaf_stats, "banana"))
+        else:
+            st.markdown("""
 ###  Banana Hue Analysis
 
 - *Mean Hue (Healthy)*: 0.2188  
@@ -574,13 +431,15 @@ These findings highlight the potential of hue-based color metrics in accurately
 
 ⚪ No statistically significant hue difference between healthy and diseased banana leaf images.
     """)
-    with open(os.path.join(img_dir, "banana_comparison.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="banana_comparison.png", mime="image/png")
+    download_image("banana_comparison.png")
     st.markdown("---")
 
     show_image("apple_anomaly_map.png")
     with st.expander("📌 Statistical Analysis"):
-        st.markdown("""
+        if leaf_stats is not None and "apple" in leaf_stats.index:
+            st.markdown(leaf_analysis.crop_markdown(leaf_stats, "apple"))
+        else:
+            st.markdown("""
 ### 🍎 Apple Leaf Disease Insight
 
 - *Disease Severity:* Moderate  
@@ -591,8 +450,7 @@ These findings highlight the potential of hue-based color metrics in accurately
 
 These metrics indicate a noticeable and diffused disease manifestation in apple leaves, detectable via hue-based color analysis.
     """)
-    with open(os.path.join(img_dir, "apple_anomaly_map.png"), "rb") as file:
-        st.download_button("⬇️ Download Image", file, file_name="apple_anomaly_map.png", mime="image/png")
+    download_image("apple_anomaly_map.png")
     st.markdown("---")
 
 elif page == "Dataset Preview":
@@ -600,11 +458,62 @@ elif page == "Dataset Preview":
 
     st.markdown("Here you can explore the complete csv dataset used for training the crop recommendation model.")
 
-    # Load dataset
-    df = pd.read_csv("Crop_recommendation_corrected.csv")
-    df.index = range(1, len(df) + 1)  # Reset index to start from 1
+    # Columnar cache of the CSV; only the rows on the current page are read
+    dataset = load_dataset_store(data_stats.file_hash(csv_path))
+
+    with st.expander("🔎 Filter & sort"):
+        crops = st.multiselect("Crops", sorted(dataset.labels))
+        ranges = {}
+        range_cols = st.columns(4)
+        for i, feature in enumerate(dataset.features):
+            low, high = dataset.value_range(feature)
+            emoji, name, unit, _ = data_stats.FEATURE_DISPLAY[feature]
+            chosen = range_cols[i % 4].slider(f"{emoji} {name}", low, high, (low, high))
+            if chosen != (low, high):
+                ranges[feature] = chosen
+        sort_col, order_col = st.columns(2)
+        sort_by = sort_col.selectbox("Sort by", ["CSV order"] + dataset.features + ["label"])
+        ascending = order_col.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+
+    view = dataset.view(crops or None, ranges, None if sort_by == "CSV order" else sort_by, ascending)
+    total = len(view)
 
     # User-selectable number of rows to display
-    rows_to_show = st.selectbox("🔢 Select number of rows to display:", [10, 25, 50, 100, 200, len(df)], index=3)
+    size_col, page_col = st.columns(2)
+    rows_to_show = size_col.selectbox("🔢 Select number of rows to display:", [10, 25, 50, 100, 200], index=3)
+    pages = max(1, -(-total // rows_to_show))
+    page_number = page_col.number_input(f"📄 Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1)
+    page_number = min(page_number, pages)  # filters may have shrunk the result
+
+    st.dataframe(view.page(page_number - 1, rows_to_show), use_container_width=True)
+    first = (page_number - 1) * rows_to_show
+    st.caption(f"Rows {min(first + 1, total):,}–{min(first + rows_to_show, total):,} of {total:,} "
+               f"matching ({dataset.n_rows:,} in the dataset).")
+
+elif page == "Performance":
+    st.title("⏱️ Performance")
+    st.markdown("Wall time of the instrumented operations in this server process, across all sessions. "
+                "Percentiles cover the most recent calls of each operation.")
+    if not timings.enabled:
+        st.info("Timing is turned off (CROP_TIMINGS=0); nothing new is being recorded.")
+
+    if st.button("Reset timings"):
+        timings.reset()
+
+    snapshot = timings.snapshot()
+    if snapshot:
+        table = pd.DataFrame.from_dict(snapshot, orient="index").rename_axis("operation")
+        st.dataframe(table.round(3), use_container_width=True)
+    else:
+        st.caption("Nothing recorded yet - open a few pages first.")
+
+    st.subheader("Prediction executor")
+    st.json(load_prediction_executor().stats())
+
+    json_col, prom_col = st.columns(2)
+    json_col.download_button("⬇️ JSON", timings.to_json(), file_name="timings.json", mime="application/json")
+    prom_col.download_button("⬇️ Prometheus text", timings.to_prometheus(), file_name="timings.prom",
+                             mime="text/plain")
 
-    st.dataframe(df.head(rows_to_show), use_container_width=True)
\ No newline at end of file
+# Whole script run, i.e. what one interaction on this page costs
+timings.record(f"page {page}", time.perf_counter() - run_started)
@@ -0,0 +1,325 @@
+# Statistics behind the "CSV Visualizations" page, computed from the dataset
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from timings import timed
+
+FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+NUTRIENTS = ["N", "P", "K"]
+CSV_DTYPES = {**{feature: "float32" for feature in FEATURES}, "label": "category"}
+
+# emoji, heading, unit and number format used when rendering each feature
+FEATURE_DISPLAY = {
+    "N": ("🌱", "Nitrogen (N)", "", ".1f"),
+    "P": ("🌿", "Phosphorus (P)", "", ".1f"),
+    "K": ("🪴", "Potassium (K)", "", ".1f"),
+    "temperature": ("🌡", "Temperature", "°C", ".2f"),
+    "humidity": ("💧", "Humidity", "%", ".2f"),
+    "ph": ("⚗", "pH", "", ".2f"),
+    "rainfall": ("🌧", "Rainfall", " mm", ".2f"),
+}
+SHORT_NAMES = {"N": "N", "P": "P", "K": "K", "temperature": "Temperature", "humidity": "Humidity",
+               "ph": "pH", "rainfall": "Rainfall"}
+NUTRIENT_NAMES = {"N": "Nitrogen", "P": "Phosphorus", "K": "Potassium"}
+
+# Rows per block when accumulating the correlation matrix in float64
+CORRELATION_BLOCK_ROWS = 1_000_000
+# KMeans for the NPK crop grouping is fitted on at most this many rows
+CLUSTER_SAMPLE_ROWS = 50_000
+
+_hash_memo = {}
+
+
+def file_hash(path):
+    """SHA-256 of the file's contents, recomputed only when its size or mtime changes"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _hash_memo:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+@timed("load_dataset")
+def load_dataset(path):
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    # Older exports carry a trailing space in "humidity "
+    return df.rename(columns={"humidity ": "humidity"})
+
+
+def clean_dataset(df):
+    """The cleaning steps of load_data in Notebooks/Final_csv.ipynb"""
+    df = df.rename(columns={"humidity ": "humidity", "ph": "pH"})
+    df["label"] = df["label"].astype(str)
+    # Missing values take their crop's median
+    for col in df.columns.drop("label"):
+        if df[col].isna().any():
+            df[col] = df.groupby("label")[col].transform(lambda x: x.fillna(x.median()))
+    return df.drop_duplicates()
+
+
+def _group_quantiles(sorted_values, starts, counts, q):
+    # Linear interpolation, the same as pandas' default quantile
+    position = starts + q * (counts - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, starts + counts - 1)
+    fraction = position - lower
+    return sorted_values[lower] + fraction * (sorted_values[upper] - sorted_values[lower])
+
+
+def _correlation(X):
+    n = len(X)
+    gram = np.zeros((X.shape[1], X.shape[1]))
+    totals = np.zeros(X.shape[1])
+    for start in range(0, n, CORRELATION_BLOCK_ROWS):
+        block = X[start:start + CORRELATION_BLOCK_ROWS].astype(np.float64)
+        gram += block.T @ block
+        totals += block.sum(axis=0)
+    mean = totals / n
+    cov = gram / n - np.outer(mean, mean)
+    std = np.sqrt(np.diag(cov))
+    return cov / np.outer(std, std)
+
+
+def _nutrient_clusters(df, codes, crops, n_clusters=5, random_state=42):
+    # Same grouping as the notebook: KMeans on standardized N, P, K
+    from sklearn.cluster import KMeans
+
+    X = df[NUTRIENTS].to_numpy(dtype=np.float64)
+    X = (X - X.mean(axis=0)) / X.std(axis=0)
+    rng = np.random.default_rng(random_state)
+    sample = X if len(X) <= CLUSTER_SAMPLE_ROWS else X[rng.choice(len(X), CLUSTER_SAMPLE_ROWS, replace=False)]
+    kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state).fit(sample)
+    clusters = kmeans.predict(X)
+    counts = np.zeros((n_clusters, len(crops)), dtype=np.int64)
+    np.add.at(counts, (clusters, codes), 1)
+    return pd.DataFrame(counts, columns=crops)
+
+
+@timed("compute_statistics")
+def compute_statistics(df):
+    """Every number shown on the CSV Visualizations page, from one grouped pass per feature"""
+    labels = df["label"].astype("category")
+    crops = list(labels.cat.categories)
+    codes = labels.cat.codes.to_numpy().astype(np.intp)
+    crop_counts = np.bincount(codes, minlength=len(crops))
+    crop_starts = np.concatenate([[0], np.cumsum(crop_counts)[:-1]])
+    # Rows grouped by crop once; each feature then only sorts within its crop slices
+    crop_order = np.argsort(codes, kind="stable")
+
+    summary = {}
+    per_crop = {name: {} for name in ["mean", "std", "median", "q1", "q3", "outliers"]}
+    for feature in FEATURES:
+        x = df[feature].to_numpy(dtype=np.float64)
+        n = len(x)
+
+        # Global moments; skewness is the population (biased) estimate, as scipy.stats.skew
+        mean = x.mean()
+        centered = x - mean
+        squared = centered * centered
+        m2 = squared.mean()
+        m3 = np.dot(squared, centered) / n
+        summary[feature] = {
+            "mean": mean,
+            "median": np.median(x),
+            "std": np.sqrt(m2 * n / (n - 1)),
+            "min": x.min(),
+            "max": x.max(),
+            "skew": m3 / m2 ** 1.5 if m2 > 0 else 0.0,
+        }
+
+        # Per-crop sums and sums of squares in one bincount each
+        sums = np.bincount(codes, weights=x, minlength=len(crops))
+        squares = np.bincount(codes, weights=x * x, minlength=len(crops))
+        crop_mean = sums / crop_counts
+        crop_var = (squares - crop_counts * crop_mean ** 2) / np.maximum(crop_counts - 1, 1)
+        per_crop["mean"][feature] = crop_mean
+        per_crop["std"][feature] = np.sqrt(np.maximum(crop_var, 0.0))
+
+        # Per-crop quantiles from values sorted within each crop
+        sorted_values = x[crop_order]
+        for start, count in zip(crop_starts, crop_counts):
+            sorted_values[start:start + count].sort()
+        q1 = _group_quantiles(sorted_values, crop_starts, crop_counts, 0.25)
+        q3 = _group_quantiles(sorted_values, crop_starts, crop_counts, 0.75)
+        per_crop["q1"][feature] = q1
+        per_crop["q3"][feature] = q3
+        per_crop["median"][feature] = _group_quantiles(sorted_values, crop_starts, crop_counts, 0.5)
+
+        # Boxplot outliers: outside 1.5 x IQR of the crop, counted by binary search in the sorted slice
+        iqr = q3 - q1
+        outliers = np.zeros(len(crops), dtype=np.int64)
+        for i, (start, count) in enumerate(zip(crop_starts, crop_counts)):
+            values = sorted_values[start:start + count]
+            below = np.searchsorted(values, q1[i] - 1.5 * iqr[i], side="left")
+            above = count - np.searchsorted(values, q3[i] + 1.5 * iqr[i], side="right")
+            outliers[i] = below + above
+        per_crop["outliers"][feature] = outliers
+
+    stats = {
+        "n_rows": len(df),
+        "crop_counts": pd.Series(crop_counts, index=crops),
+        "summary": pd.DataFrame(summary).T[["mean", "median", "std", "min", "max", "skew"]],
+        "correlation": pd.DataFrame(_correlation(df[FEATURES].to_numpy()), index=FEATURES, columns=FEATURES),
+        "clusters": _nutrient_clusters(df, codes, crops),
+    }
+    for name, values in per_crop.items():
+        stats[f"crop_{name}"] = pd.DataFrame(values, index=crops)[FEATURES]
+    return stats
+
+
+def _crop_name(crop):
+    return crop.title()
+
+
+def _correlation_pairs(stats):
+    corr = stats["correlation"]
+    return [(a, b, corr.loc[a, b]) for i, a in enumerate(FEATURES) for b in FEATURES[i + 1:]]
+
+
+def _pair_name(a, b):
+    return f"{SHORT_NAMES[a]} & {SHORT_NAMES[b]}"
+
+
+def _skew_shape(skew):
+    if abs(skew) < 0.5:
+        return "Symmetrical"
+    return "Right-skewed" if skew > 0 else "Left-skewed"
+
+
+def _skew_degree(skew):
+    if abs(skew) > 1:
+        return "Highly skewed"
+    return "Moderately skewed" if abs(skew) > 0.5 else "Approximately symmetric"
+
+
+def correlation_markdown(stats):
+    pairs = sorted(_correlation_pairs(stats), key=lambda pair: pair[2], reverse=True)
+    positive = [f"- {_pair_name(a, b)}: {r:.3f}" for a, b, r in pairs if r > 0.5] or ["- None"]
+    negative = [f"- {_pair_name(a, b)}: {r:.3f}" for a, b, r in reversed(pairs) if r < -0.2] or ["- None"]
+
+    corr = stats["correlation"].to_numpy()
+    mean_abs = (np.abs(corr).sum(axis=0) - 1) / (len(FEATURES) - 1)
+    loosest = FEATURES[int(np.argmin(mean_abs))]
+    strongest = pairs[0]
+    weakest = pairs[-1]
+    observations = [
+        f"- Strongest positive correlation: {_pair_name(strongest[0], strongest[1])} ({strongest[2]:.2f})",
+        f"- Strongest negative correlation: {_pair_name(weakest[0], weakest[1])} ({weakest[2]:.2f})",
+        f"- {SHORT_NAMES[loosest]} is the least correlated with the other variables "
+        f"(mean |r| = {mean_abs.min():.2f}).",
+    ]
+    return ("🔍 Top Positive Correlation (> 0.5):\n" + "\n".join(positive)
+            + "\n\n🔍 Top Negative Correlation (< -0.2):\n" + "\n".join(negative)
+            + "\n\n✅ Key Observations:\n" + "\n".join(observations))
+
+
+def feature_summary_markdown(stats):
+    lines = ["### 📊 Nutrient & Environmental Summary", "",
+             "A statistical breakdown of key soil and climate features used in modeling:", "", "---", ""]
+    for feature in FEATURES:
+        emoji, name, unit, _ = FEATURE_DISPLAY[feature]
+        row = stats["summary"].loc[feature]
+        lines += [
+            f"#### {emoji} *{name}*",
+            f"- *Mean*: {row['mean']:.2f}{unit}  ",
+            f"- *Median*: {row['median']:.2f}{unit}  ",
+            f"- *Standard Deviation*: {row['std']:.2f}  ",
+            f"- *Range*: {row['min']:.2f} → {row['max']:.2f}  ",
+            f"- *Skewness: {row['skew']:.2f}*({_skew_shape(row['skew'])})  ",
+        ]
+        if abs(row["skew"]) > 1:
+            lines.append("➡ *Highly skewed – transformation may help.*  ")
+        if row["max"] > row["mean"] + 3 * row["std"]:
+            lines.append("⚠ *Upper outliers detected.*  ")
+        lines += ["", "---", ""]
+    return "\n".join(lines)
+
+
+def scatter_matrix_markdown(stats):
+    pairs = sorted(_correlation_pairs(stats), key=lambda pair: abs(pair[2]), reverse=True)
+    strong = [f"- {_pair_name(a, b)}: {r:.2f} ({'Strong Positive' if r > 0 else 'Strong Negative'})"
+              for a, b, r in pairs if abs(r) > 0.7] or ["- None"]
+    lines = ["### Correlation Matrix Insights", "", "**Strong Correlations (|r| > 0.7):**", *strong, "",
+             "**Top 3 Most Correlated Pairs:**", *[f"- {_pair_name(a, b)}: {r:.2f}  " for a, b, r in pairs[:3]], "",
+             "**3 Least Correlated Pairs:**", *[f"- {_pair_name(a, b)}: {r:.2f}  " for a, b, r in pairs[-3:]], "",
+             "---", "", "### Descriptive Statistics & Distribution Shape", ""]
+    for feature in FEATURES:
+        _, name, unit, _ = FEATURE_DISPLAY[feature]
+        row = stats["summary"].loc[feature]
+        lines += [
+            f"*{name}*  ",
+            f"- Mean: {row['mean']:.2f}{unit}  Median: {row['median']:.2f}{unit}  Std: {row['std']:.2f}  ",
+            f"- Skewness: {row['skew']:.2f} → {_skew_degree(row['skew'])}",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _markdown_table(headers, rows):
+    lines = ["| " + " | ".join(headers) + " |", "|" + "|".join("-" * (len(h) + 2) for h in headers) + "|"]
+    lines += ["| " + " | ".join(str(cell) for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def nutrient_requirements_markdown(stats, top=5):
+    means = stats["crop_mean"]
+    stds = stats["crop_std"]
+    lines = ["### 📊  Nutrient Requirement Analysis by Crop", ""]
+    for nutrient in NUTRIENTS:
+        name = NUTRIENT_NAMES[nutrient]
+        ranked = means[nutrient].sort_values(ascending=False)
+        lines += [f"#### {name}",
+                  f"###### 🔼 Top {top} Crops by {name} Requirement", "",
+                  _markdown_table(["Crop", f"Avg {name}"],
+                                  [(_crop_name(crop), f"{value:.2f}") for crop, value in ranked.head(top).items()]),
+                  "", "",
+                  f"###### 🔽 Bottom {top} Crops by {name} Requirement", "",
+                  _markdown_table(["Crop", f"Avg {name}"],
+                                  [(_crop_name(crop), f"{value:.2f}") for crop, value in ranked.tail(top).items()]),
+                  "", ""]
+
+    lines += ["### Nutrient Spread Summary (mean ± std)", "",
+              _markdown_table(["Crop", "N (mean ± std)", "P (mean ± std)", "K (mean ± std)"],
+                              [(_crop_name(crop), *[f"{means.loc[crop, n]:.2f} ± {stds.loc[crop, n]:.2f}"
+                                                    for n in NUTRIENTS]) for crop in means.index]),
+              "", "---", "", "### Cluster-Based Crop Grouping (Based on NPK Profiles)", ""]
+
+    rows = []
+    clusters = stats["clusters"]
+    for cluster, counts in clusters.iterrows():
+        members = []
+        for crop, count in counts[counts > 0].items():
+            share = count / clusters[crop].sum()
+            members.append(_crop_name(crop) + ("" if share == 1 else f" ({share:.0%})"))
+        rows.append((cluster, ", ".join(members)))
+    lines.append(_markdown_table(["Cluster", "Crops"], rows))
+    return "\n".join(lines)
+
+
+def boxplot_insights_markdown(stats, top=3):
+    lines = ["### 🔍 Automated Insights by Feature", "", "---", ""]
+    for feature in FEATURES:
+        fmt = FEATURE_DISPLAY[feature][3]
+        medians = stats["crop_median"][feature].sort_values(ascending=False).head(top)
+        outliers = stats["crop_outliers"][feature].sort_values(ascending=False, kind="stable").head(top)
+        lines += [f"#### *Feature: {SHORT_NAMES[feature]}*",
+                  "*Top Crops by Median Value*",
+                  *[f"- {_crop_name(crop)}: *{value:{fmt}}*" for crop, value in medians.items()],
+                  "", "*Crops with Most Outliers*",
+                  *[f"- {_crop_name(crop)}: {count}" for crop, count in outliers.items()],
+                  "", "---", ""]
+    return "\n".join(lines)
+
+
+def crop_distribution_markdown(stats):
+    counts = stats["crop_counts"]
+    if counts.nunique() == 1:
+        return (f"This histogram shows that an equal number of samples ({counts.iloc[0]}) "
+                f"for all {len(counts)} crops is taken.")
+    return (f"This histogram shows {len(counts)} crops with between {counts.min()} "
+            f"({_crop_name(counts.idxmin())}) and {counts.max()} ({_crop_name(counts.idxmax())}) samples each.")
@@ -0,0 +1,221 @@
+# Typed columnar cache of the crop CSV for the "Dataset Preview" page
+# Each column is a memory-mapped .npy file, so a page of rows costs the same at 1.5k or 10M rows.
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from data_stats import FEATURES, file_hash
+from timings import timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "dataset")
+METADATA_FILE = "metadata.json"
+FORMAT_VERSION = 1
+
+# Rows parsed per CSV chunk while converting, and rows per block when scanning a filter
+CONVERT_CHUNK_ROWS = 500_000
+SCAN_BLOCK_ROWS = 1_000_000
+# Filtered/sorted views whose per-block match counts are remembered
+MAX_CACHED_VIEWS = 32
+
+
+def _count_lines(path):
+    lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+def convert_csv(csv_path, directory):
+    """Write every CSV column to ``directory`` as .npy: float32 features, uint8/uint16 crop codes"""
+    # Upper bound on data rows: one newline per row, the header's included, the last one optional
+    capacity = max(_count_lines(csv_path), 1)
+    os.makedirs(directory, exist_ok=True)
+    columns = {feature: np.lib.format.open_memmap(os.path.join(directory, f"{feature}.npy"), mode="w+",
+                                                  dtype=np.float32, shape=(capacity,))
+               for feature in FEATURES}
+    codes = []
+    labels = {}
+    n_rows = 0
+    for chunk in pd.read_csv(csv_path, chunksize=CONVERT_CHUNK_ROWS, dtype={"label": str}):
+        chunk = chunk.rename(columns={"humidity ": "humidity"})
+        end = n_rows + len(chunk)
+        for feature in FEATURES:
+            columns[feature][n_rows:end] = chunk[feature].to_numpy(dtype=np.float32)
+        uniques, inverse = np.unique(chunk["label"].fillna("").to_numpy(dtype=str), return_inverse=True)
+        for label in uniques:
+            labels.setdefault(label, len(labels))
+        codes.append(np.array([labels[label] for label in uniques], dtype=np.uint16)[inverse])
+        n_rows = end
+
+    minimum = {}
+    maximum = {}
+    for feature, column in columns.items():
+        column.flush()
+        values = column[:n_rows]
+        minimum[feature] = float(np.nanmin(values)) if n_rows else 0.0
+        maximum[feature] = float(np.nanmax(values)) if n_rows else 0.0
+    del columns
+    codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.uint16)
+    np.save(os.path.join(directory, "label.npy"), codes.astype(np.uint8 if len(labels) <= 256 else np.uint16))
+
+    metadata = {"format_version": FORMAT_VERSION, "rows": n_rows, "features": FEATURES,
+                "labels": list(labels), "min": minimum, "max": maximum}
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+class DatasetView:
+    """Rows of a ColumnarDataset matching a crop/range filter, in row or sorted order.
+
+    Matching rows are never materialized: the view remembers how many matches
+    each block of ``SCAN_BLOCK_ROWS`` holds, so a page only rescans the blocks
+    it lands in.
+    """
+
+    def __init__(self, dataset, crops=None, ranges=None, sort_by=None, ascending=True):
+        self.dataset = dataset
+        self.crops = None if crops is None else dataset.crop_codes(crops)
+        self.ranges = dict(ranges or {})
+        self.order = dataset.sort_order(sort_by, ascending) if sort_by else None
+        self._block_counts = None
+
+    @property
+    def filtered(self):
+        return self.crops is not None or bool(self.ranges)
+
+    def _rows(self, start, stop):
+        # Positions [start, stop) of the view order, before filtering
+        return np.asarray(self.order[start:stop]) if self.order is not None else np.arange(start, stop)
+
+    def _match(self, rows):
+        mask = np.ones(len(rows), dtype=bool)
+        if self.crops is not None:
+            mask &= np.isin(self.dataset.column("label", rows), self.crops)
+        for feature, (low, high) in self.ranges.items():
+            values = self.dataset.column(feature, rows)
+            mask &= (values >= low) & (values <= high)
+        return rows[mask]
+
+    def block_counts(self):
+        if self._block_counts is None:
+            n = self.dataset.n_rows
+            self._block_counts = np.array([len(self._match(self._rows(start, min(start + SCAN_BLOCK_ROWS, n))))
+                                           for start in range(0, n, SCAN_BLOCK_ROWS)], dtype=np.int64)
+        return self._block_counts
+
+    def __len__(self):
+        return int(self.block_counts().sum()) if self.filtered else self.dataset.n_rows
+
+    def row_ids(self, start, stop):
+        """Dataset row numbers at positions [start, stop) of this view"""
+        if not self.filtered:
+            return self._rows(start, min(stop, self.dataset.n_rows))
+        counts = self.block_counts()
+        ends = np.cumsum(counts)
+        found = []
+        needed = stop - start
+        block = int(np.searchsorted(ends, start, side="right"))
+        skip = start - (ends[block - 1] if block else 0)
+        while needed > 0 and block < len(counts):
+            first = block * SCAN_BLOCK_ROWS
+            matches = self._match(self._rows(first, min(first + SCAN_BLOCK_ROWS, self.dataset.n_rows)))
+            taken = matches[skip:skip + needed]
+            found.append(taken)
+            needed -= len(taken)
+            skip = 0
+            block += 1
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    @timed("dataset_page")
+    def page(self, number, size):
+        """Page ``number`` (0-based) as a DataFrame indexed by 1-based CSV row"""
+        ids = self.row_ids(number * size, (number + 1) * size)
+        return self.dataset.frame(ids)
+
+
+class ColumnarDataset:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            self.metadata = json.load(f)
+        self.n_rows = self.metadata["rows"]
+        self.features = self.metadata["features"]
+        self.labels = self.metadata["labels"]
+        self._label_array = np.array(self.labels, dtype=object)
+        self._columns = {}
+        self._orders = {}
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    @timed("dataset_open")
+    def from_csv(cls, csv_path, cache_dir=CACHE_DIR):
+        """Open the cache for this exact CSV content, converting it on first use"""
+        directory = os.path.join(cache_dir, file_hash(csv_path)[:16])
+        if not os.path.exists(os.path.join(directory, METADATA_FILE)):
+            tmp = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+            convert_csv(csv_path, tmp)
+            try:
+                os.replace(tmp, directory)
+            except OSError:  # another process finished first
+                shutil.rmtree(tmp, ignore_errors=True)
+        return cls(directory)
+
+    def column(self, name, rows=None):
+        if name not in self._columns:
+            column = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+            self._columns[name] = column[:self.n_rows]
+        column = self._columns[name]
+        return column if rows is None else column[rows]
+
+    def value_range(self, feature):
+        return self.metadata["min"][feature], self.metadata["max"][feature]
+
+    def crop_codes(self, crops):
+        return np.array([self.labels.index(crop) for crop in crops if crop in self.labels], dtype=np.uint16)
+
+    def sort_order(self, column, ascending=True):
+        """Stable row order by ``column``, computed once and kept next to the columns"""
+        key = (column, ascending)
+        with self._lock:
+            if key not in self._orders:
+                path = os.path.join(self.directory, f"order-{column}-{'asc' if ascending else 'desc'}.npy")
+                if not os.path.exists(path):
+                    values = np.asarray(self.column(column))
+                    if column == "label":
+                        values = np.argsort(np.argsort(self.labels))[values]  # alphabetical, not code order
+                    order = np.argsort(values if ascending else -values.astype(np.float64), kind="stable")
+                    dtype = np.uint32 if self.n_rows < 2 ** 32 else np.int64
+                    tmp = f"{path}.{os.getpid()}.tmp.npy"
+                    np.save(tmp, order.astype(dtype))
+                    os.replace(tmp, path)
+                self._orders[key] = np.load(path, mmap_mode="r")
+            return self._orders[key]
+
+    def view(self, crops=None, ranges=None, sort_by=None, ascending=True):
+        """Shared view for a query, so counting matches happens once per distinct filter"""
+        key = (tuple(sorted(crops)) if crops is not None else None,
+               tuple(sorted((ranges or {}).items())), sort_by, ascending)
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+        view = DatasetView(self, crops, ranges, sort_by, ascending)
+        with self._lock:
+            self._views[key] = view
+            while len(self._views) > MAX_CACHED_VIEWS:
+                self._views.popitem(last=False)
+        return view
+
+    def frame(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        data = {feature: self.column(feature, rows) for feature in self.features}
+        data["label"] = self._label_array[self.column("label", rows)]
+        return pd.DataFrame(data, index=pd.Index(rows + 1, name="row"))
@@ -0,0 +1,77 @@
+# Per-feature explanations of the forest's class probabilities from its decision paths
+#
+#   explainer = ForestExplainer(model_script.get_model().engine, n_features=7)
+#   probabilities, contributions = explainer.explain(X)   # (n, classes), (n, features, classes)
+import numpy as np
+
+# Rows gathered at once; each holds an (n_trees, features * classes) float32 block
+EXPLAIN_CHUNK_ROWS = 64
+
+
+def path_contributions(engine, n_features):
+    """(n_nodes, n_features * n_classes) float32 table of every node's root-to-node contributions.
+
+    Stepping from a node to a child changes the class distribution by
+    ``value[child] - value[node]``; the change is credited to the feature the
+    node tests. Each row of the table holds those changes summed along the path,
+    so a leaf's row is its tree's whole explanation.
+    """
+    table = np.zeros((engine.n_nodes, n_features, engine.n_classes), dtype=np.float32)
+    pairs = np.asarray(engine.children).reshape(-1, 2)
+    frontier = np.asarray(engine.roots)
+    # One level of every tree at a time, as in CompiledForest.node_depths
+    while len(frontier):
+        below = pairs[frontier]
+        internal = below[:, 0] != frontier
+        parents, below = frontier[internal], below[internal]
+        for side in range(2):
+            children = below[:, side]
+            table[children] = table[parents]
+            table[children, engine.feature[parents]] += engine.value[children] - engine.value[parents]
+        frontier = below.ravel()
+    return table.reshape(engine.n_nodes, -1)
+
+
+class ForestExplainer:
+    """Decision-path attribution (Saabas) for an averaging forest.
+
+    For each row, ``bias + contributions.sum(axis=1)`` equals the forest's
+    class probabilities (up to float32 rounding): ``bias`` is the mean root
+    distribution over trees and ``contributions[:, f, c]`` is how much the
+    splits on feature f moved the probability of class c. The probabilities
+    ``explain`` reports are summed from the same leaves exactly as
+    engine.predict_proba sums them, so their argmax is always engine.predict's
+    class; the contributions only attribute them. An explanation costs the
+    same tree walk as a prediction plus one gather of the leaves' rows.
+    """
+
+    def __init__(self, engine, n_features):
+        if engine.link != "mean":
+            raise ValueError("Decision-path contributions need an averaging forest, not boosted scores")
+        self.engine = engine
+        self.n_features = n_features
+        self.bias = np.asarray(engine.value)[engine.roots].mean(axis=0)
+        self.table = path_contributions(engine, n_features)
+
+    def _contributions(self, leaves):
+        total = np.empty((len(leaves), self.table.shape[1]), dtype=np.float32)
+        for start in range(0, len(leaves), EXPLAIN_CHUNK_ROWS):
+            block = self.table[leaves[start:start + EXPLAIN_CHUNK_ROWS]]
+            total[start:start + len(block)] = block.sum(axis=1)
+        total /= self.engine.n_trees
+        return total.reshape(len(leaves), self.n_features, -1)
+
+    def contributions(self, X):
+        """(n, n_features, n_classes) contributions, averaged over trees"""
+        return self._contributions(self.engine.apply(X))
+
+    def explain(self, X):
+        """engine.predict_proba's probabilities and the contributions, from one walk"""
+        leaves = self.engine.apply(X)
+        proba = np.empty((len(leaves), self.engine.n_classes))
+        for start in range(0, len(leaves), EXPLAIN_CHUNK_ROWS):
+            # Trees on the leading axis: added tree by tree in float64, as predict_proba does
+            block = leaves[start:start + EXPLAIN_CHUNK_ROWS]
+            proba[start:start + len(block)] = self.engine.value[block.T].sum(axis=0)
+        proba /= self.engine.n_trees
+        return proba, self._contributions(leaves)
@@ -0,0 +1,403 @@
+# Array-backed inference engine for the crop recommendation Random Forest (and smaller tree models)
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# Rows per traversal chunk
+CHUNK_ROWS = 20_000
+# Up to this many rows, stepping all trees together beats walking tree by tree,
+# whose cost is dominated by the fixed number of array calls per tree
+SMALL_BATCH_ROWS = 1_024
+# Models with at most this many trees (e.g. a distilled single tree) walk one row in plain Python
+SCALAR_TREES = 4
+
+# Arrays written to (and memory-mapped from) an exported model directory
+ARRAY_NAMES = ["feature", "threshold", "children", "value", "roots", "depths", "classes"]
+METADATA_FILE = "metadata.json"
+FORMAT_VERSION = 1
+
+
+class CompiledForest:
+    """A tree ensemble flattened into contiguous NumPy node arrays.
+
+    All trees share one node table. Leaves point back to themselves, so a row
+    can be stepped ``depths[tree]`` times without checking for termination.
+    With ``link="mean"`` (random forests, single trees) the probabilities are
+    the mean leaf distribution; with ``link="softmax"`` (gradient boosting)
+    leaf values are raw scores added to ``bias``.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, depths, classes, link="mean", bias=None):
+        self.feature = feature        # (n_nodes,) feature index tested at each node
+        self.threshold = threshold    # (n_nodes,) go left when x <= threshold
+        self.children = children      # (2 * n_nodes,) left/right child interleaved
+        self.value = value            # (n_nodes, n_classes) normalized class distribution or raw score
+        self.roots = roots            # (n_trees,) root node of each tree
+        self.depths = depths          # (n_trees,) depth of each tree
+        self.classes = classes        # (n_classes,) labels as seen by sklearn
+        self.link = link
+        self.bias = np.zeros(value.shape[1]) if bias is None else bias
+        self.max_depth = int(depths.max())
+        self._node_lists = None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestClassifier, DecisionTreeClassifier or multiclass GradientBoostingClassifier"""
+        classes = np.asarray(model.classes_)
+        if hasattr(model, "init_"):
+            # Gradient boosting: one regression tree per (stage, class), scores scaled by the learning rate
+            if model.estimators_.shape[1] != len(classes):
+                raise ValueError("Only multiclass gradient boosting can be compiled")
+            trees = [estimator.tree_ for stage in model.estimators_ for estimator in stage]
+            tree_classes = np.tile(np.arange(len(classes)), len(model.estimators_))
+            bias = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+            link = "softmax"
+        else:
+            estimators = model.estimators_ if hasattr(model, "estimators_") else [model]
+            trees = [estimator.tree_ for estimator in estimators]
+            tree_classes = None
+            bias = None
+            link = "mean"
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        n_nodes = int(offsets[-1])
+
+        feature = np.zeros(n_nodes, dtype=np.intp)
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        children = np.empty(2 * n_nodes, dtype=np.intp)
+        value = np.zeros((n_nodes, len(classes)), dtype=np.float64)
+
+        for i, (tree, start, stop) in enumerate(zip(trees, offsets[:-1], offsets[1:])):
+            nodes = np.arange(start, stop)
+            is_leaf = tree.children_left == -1
+            feature[start:stop] = np.where(is_leaf, 0, tree.feature)
+            threshold[start:stop] = np.where(is_leaf, 0.0, tree.threshold)
+            children[2 * start:2 * stop:2] = np.where(is_leaf, nodes, tree.children_left + start)
+            children[2 * start + 1:2 * stop:2] = np.where(is_leaf, nodes, tree.children_right + start)
+
+            if tree_classes is not None:
+                value[start:stop, tree_classes[i]] = model.learning_rate * tree.value[:, 0, 0]
+            else:
+                # Same normalization as DecisionTreeClassifier.predict_proba
+                counts = tree.value[:, 0, :]
+                totals = counts.sum(axis=1, keepdims=True)
+                totals[totals == 0.0] = 1.0
+                value[start:stop] = counts / totals
+
+        depths = np.array([tree.max_depth for tree in trees], dtype=np.intp)
+        return cls(feature, threshold, children, value, offsets[:-1].astype(np.intp),
+                   depths, classes, link, bias)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def n_classes(self):
+        return self.value.shape[1]
+
+    def _as_input(self, X):
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X
+
+    def _apply_one(self, x):
+        if self.n_trees <= SCALAR_TREES:
+            return self._walk_one(x.tolist())
+        # Single row: step all trees together, one level at a time
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            go_right = x[self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def _walk_one(self, x):
+        # A few trees: plain Python on list copies of the node arrays beats per-level NumPy calls
+        if self._node_lists is None:
+            self._node_lists = (self.feature.tolist(), self.threshold.tolist(), self.children.tolist())
+        feature, threshold, children = self._node_lists
+        leaves = []
+        for node in self.roots.tolist():
+            while children[2 * node] != node:
+                node = children[2 * node + (x[feature[node]] > threshold[node])]
+            leaves.append(node)
+        return np.array(leaves, dtype=np.intp)
+
+    def _apply_rows(self, X):
+        # Small batch: step every (row, tree) pair together, one level at a time
+        flat_X = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat_X[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def _iter_tree_leaves(self, X):
+        # Many rows: walk one tree at a time so each step works on long 1-D arrays
+        flat_X = X.ravel()
+        row_offsets = np.arange(len(X)) * X.shape[1]
+        for root, depth in zip(self.roots, self.depths):
+            nodes = np.full(len(X), root, dtype=np.intp)
+            for _ in range(depth):
+                go_right = flat_X[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                nodes = self.children[2 * nodes + go_right]
+            yield nodes
+
+    def apply(self, X):
+        """Return the (n_rows, n_trees) matrix of leaf node indices"""
+        X = self._as_input(X)
+        if len(X) == 1:
+            return self._apply_one(X[0]).reshape(1, -1)
+        if len(X) <= SMALL_BATCH_ROWS:
+            return self._apply_rows(X)
+        leaves = np.empty((len(X), self.n_trees), dtype=np.intp)
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = X[start:start + CHUNK_ROWS]
+            for tree, nodes in enumerate(self._iter_tree_leaves(chunk)):
+                leaves[start:start + len(chunk), tree] = nodes
+        return leaves
+
+    def _leaf_sum(self, X):
+        # Sum of the leaf values over all trees, (n_rows, n_classes)
+        if len(X) == 1:
+            # Reducing over axis 0 adds tree by tree, the same order as sklearn
+            return self.value[self._apply_one(X[0])].sum(axis=0, keepdims=True)
+        if len(X) <= SMALL_BATCH_ROWS:
+            # Trees on the leading axis keep the tree-by-tree summation order
+            return self.value[self._apply_rows(X).T].sum(axis=0)
+        total = np.zeros((len(X), self.n_classes), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk_total = total[start:start + CHUNK_ROWS]
+            for nodes in self._iter_tree_leaves(X[start:start + CHUNK_ROWS]):
+                chunk_total += self.value[nodes]
+        return total
+
+    def predict_proba(self, X):
+        """Class probabilities, as the compiled sklearn model's predict_proba"""
+        total = self._leaf_sum(self._as_input(X))
+        if self.link == "softmax":
+            total += self.bias
+            total -= total.max(axis=1, keepdims=True)
+            np.exp(total, out=total)
+            return total / total.sum(axis=1, keepdims=True)
+        total /= self.n_trees
+        return total
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def node_depths(self):
+        """Depth of every node below its tree's root"""
+        depth = np.full(self.n_nodes, -1, dtype=np.intp)
+        pairs = self.children.reshape(-1, 2)
+        frontier = np.asarray(self.roots)
+        level = 0
+        while len(frontier):
+            depth[frontier] = level
+            below = pairs[frontier]
+            frontier = below[below[:, 0] != frontier].ravel()
+            level += 1
+        return depth
+
+    def _keep_nodes(self, keep, children, roots, depths):
+        # Engine over the nodes in the ``keep`` mask, renumbered contiguously
+        new_index = np.cumsum(keep) - 1
+        kept = np.flatnonzero(keep)
+        children = new_index[children.reshape(-1, 2)[kept]].ravel()
+        return CompiledForest(self.feature[kept], self.threshold[kept], children, self.value[kept],
+                              new_index[roots], depths, self.classes, self.link, self.bias)
+
+    def subset(self, trees):
+        """Engine made of the given trees only"""
+        trees = np.unique(trees)
+        sizes = np.diff(np.append(self.roots, self.n_nodes))
+        keep = np.isin(np.repeat(np.arange(self.n_trees), sizes), trees)
+        return self._keep_nodes(keep, self.children, self.roots[trees], self.depths[trees])
+
+    def truncate(self, max_depth):
+        """Engine whose trees stop at ``max_depth``; cut nodes predict their own class distribution"""
+        depth = self.node_depths()
+        cut = np.flatnonzero(depth == max_depth)
+        children = np.array(self.children)
+        children[2 * cut] = cut
+        children[2 * cut + 1] = cut
+        keep = (depth >= 0) & (depth <= max_depth)
+        return self._keep_nodes(keep, children, self.roots, np.minimum(self.depths, max_depth))
+
+
+def compile_forest(forest):
+    return CompiledForest.from_sklearn(forest)
+
+
+def save_compiled(engine, directory, features=None, label_mapping=None):
+    """Write the engine as one .npy file per array so workers can memory-map it.
+
+    The files, plus ``label_mapping`` as label_mapping.json, go to a sibling
+    temporary directory that then replaces ``directory``: arrays already
+    mapped by running workers are never truncated.
+    """
+    directory = os.path.abspath(directory)
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.", dir=os.path.dirname(directory))
+    try:
+        os.chmod(staging, 0o755)
+        _write_compiled(engine, staging, features)
+        if label_mapping is not None:
+            with open(os.path.join(staging, "label_mapping.json"), "w") as f:
+                json.dump(label_mapping, f)
+        replace_directory(staging, directory)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def replace_directory(staging, directory):
+    """Rename ``staging`` to ``directory``; an existing one is moved aside first and deleted after.
+
+    Deleting only unlinks the old files, so processes that mapped them keep reading the old inodes.
+    """
+    if not os.path.exists(directory):
+        os.rename(staging, directory)
+        return
+    retired = f"{staging}.old"
+    os.rename(directory, retired)
+    os.rename(staging, directory)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _write_compiled(engine, directory, features):
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(engine, name)))
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "features": list(features) if features is not None else None,
+        "n_trees": engine.n_trees,
+        "n_nodes": engine.n_nodes,
+        "n_classes": engine.n_classes,
+        "link": engine.link,
+        "bias": [float(b) for b in engine.bias],
+    }
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_metadata(directory):
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        return json.load(f)
+
+
+def load_compiled(directory, mmap_mode="r"):
+    """Load an exported engine; with mmap_mode='r' every process shares the same page-cache pages"""
+    metadata = load_metadata(directory)
+    if metadata["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version {metadata['format_version']} in {directory}")
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+              for name in ARRAY_NAMES}
+    bias = np.asarray(metadata["bias"]) if "bias" in metadata else None
+    return CompiledForest(**arrays, link=metadata.get("link", "mean"), bias=bias)
+
+
+def check_parity(engine, forest, X):
+    """Return the indices of rows where the engine and sklearn disagree"""
+    expected = forest.predict(X)
+    return np.flatnonzero(engine.predict(X) != expected)
+
+
+def parity_rows(csv_path, random_rows=20_000):
+    """The CSV's feature rows and uniform random rows over the input domain, as parity check sets"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path).rename(columns={"ph": "pH"})
+    X_csv = df[["N", "P", "K", "temperature", "humidity", "pH", "rainfall"]].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(0)
+    X_random = rng.random((random_rows, 7)) * [140, 145, 205, 50, 100, 14, 300]
+    return X_csv, X_random
+
+
+def verify(model_path, csv_path):
+    """Parity and latency check against the pickled sklearn forest"""
+    import time
+    import warnings
+    import joblib
+
+    warnings.filterwarnings("ignore")
+    forest = joblib.load(model_path)["model"]
+    engine = compile_forest(forest)
+    print(f"Compiled {engine.n_trees} trees, {engine.n_nodes} nodes, max depth {engine.max_depth}")
+
+    X_csv, X_random = parity_rows(csv_path)
+    failed = False
+    for name, X in [("CSV", X_csv), ("random", X_random)]:
+        mismatches = check_parity(engine, forest, X)
+        proba_error = np.abs(engine.predict_proba(X) - forest.predict_proba(X)).max()
+        print(f"{name}: {len(X)} rows, {len(mismatches)} label mismatches, max |proba diff| {proba_error:.2e}")
+        failed |= len(mismatches) > 0
+
+    single_rows = np.concatenate([engine.predict(row) for row in X_csv])
+    single_mismatches = np.flatnonzero(single_rows != forest.predict(X_csv))
+    print(f"CSV row by row: {len(single_mismatches)} label mismatches")
+    failed |= len(single_mismatches) > 0
+
+    row = X_csv[:1]
+    repeats = 2_000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        engine.predict(row)
+    single_us = (time.perf_counter() - start) / repeats * 1e6
+    start = time.perf_counter()
+    for _ in range(20):
+        forest.predict(row)
+    sklearn_single_us = (time.perf_counter() - start) / 20 * 1e6
+
+    start = time.perf_counter()
+    engine.predict(X_random)
+    batch_rate = len(X_random) / (time.perf_counter() - start)
+    start = time.perf_counter()
+    forest.predict(X_random)
+    sklearn_batch_rate = len(X_random) / (time.perf_counter() - start)
+    print(f"Single row: {single_us:.1f} us (sklearn {sklearn_single_us:.1f} us)")
+    print(f"Batch: {batch_rate:,.0f} rows/s (sklearn {sklearn_batch_rate:,.0f} rows/s)")
+    return not failed
+
+
+def export(model_path, out_dir):
+    """Convert the joblib pickle into a memory-mappable array directory"""
+    import joblib
+    from model_registry import pipeline_label_mapping
+
+    pipeline = joblib.load(model_path)
+    engine = compile_forest(pipeline["model"])
+    # The pickle's own label map travels with the arrays; the file next to it only for older pickles
+    label_mapping_path = os.path.join(os.path.dirname(os.path.abspath(model_path)), "label_mapping.json")
+    label_mapping = (pipeline_label_mapping(pipeline, label_mapping_path)
+                     if "label_mapping" in pipeline or os.path.exists(label_mapping_path) else None)
+    save_compiled(engine, out_dir, features=pipeline.get("features"), label_mapping=label_mapping)
+    size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+    print(f"Exported {engine.n_trees} trees ({size / 1e6:.2f} MB) to {out_dir}")
+    print(f"Serve it with CROP_MODEL_PATH={out_dir}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compile, export and verify the crop recommendation forest")
+    parser.add_argument("command", choices=["verify", "export"], nargs="?", default="verify")
+    parser.add_argument("--model", default=os.path.join(base_dir, "crop_recommender_rf.pkl"))
+    parser.add_argument("--csv", default=os.path.join(base_dir, "Crop_recommendation_corrected.csv"))
+    parser.add_argument("--out", default=os.path.join(base_dir, "crop_recommender_rf"))
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model, args.out)
+    else:
+        sys.exit(0 if verify(args.model, args.csv) else 1)
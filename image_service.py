@@ -0,0 +1,130 @@
+# Downscaled, cached renditions of the figures in images/ for the dashboard
+# Pre-generate every rendition (e.g. at deploy time): python image_service.py
+import base64
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from PIL import Image, features
+from data_stats import file_hash
+from timings import timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(BASE_DIR, "images")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "images")
+
+# Streamlit never lays an image out wider than 2 * 730 px, so nothing larger is worth sending
+INLINE_WIDTH = 1_460
+THUMBNAIL_WIDTH = 480
+WEBP_QUALITY = 85
+FORMAT = "WEBP" if features.check("webp") else "PNG"
+
+# Renditions and originals kept in memory, least recently used dropped first
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+Rendition = namedtuple("Rendition", ["data", "mime", "width", "height"])
+
+_memory = OrderedDict()  # (path, width, format, source hash) -> Rendition
+_memory_bytes = 0
+_lock = threading.Lock()
+stats = {"memory_hits": 0, "disk_hits": 0, "generated": 0}
+
+
+def _remember(key, rendition):
+    global _memory_bytes
+    with _lock:
+        if key not in _memory:
+            _memory[key] = rendition
+            _memory_bytes += len(rendition.data)
+        while _memory_bytes > MEMORY_CACHE_BYTES and len(_memory) > 1:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted.data)
+
+
+def _recall(key):
+    with _lock:
+        rendition = _memory.get(key)
+        if rendition is not None:
+            _memory.move_to_end(key)
+            stats["memory_hits"] += 1
+        return rendition
+
+
+def _encode(path, width, fmt):
+    with Image.open(path) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        else:
+            image.load()
+        buffer = io.BytesIO()
+        if fmt == "WEBP":
+            image.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue(), image.size
+
+
+@timed("image_rendition")
+def rendition(path, width=INLINE_WIDTH, fmt=FORMAT):
+    """The image at ``path`` scaled down to at most ``width`` px, generated once per source version"""
+    digest = file_hash(path)
+    key = (os.path.abspath(path), width, fmt, digest)
+    cached = _recall(key)
+    if cached is not None:
+        return cached
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(CACHE_DIR, f"{stem}-{width}-{digest[:16]}.{fmt.lower()}")
+    mime = f"image/{fmt.lower()}"
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        with Image.open(io.BytesIO(data)) as image:
+            size = image.size
+        stats["disk_hits"] += 1
+    else:
+        data, size = _encode(path, width, fmt)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)  # concurrent sessions never see a partial file
+        stats["generated"] += 1
+
+    result = Rendition(data, mime, *size)
+    _remember(key, result)
+    return result
+
+
+@timed("image_original")
+def original_bytes(path):
+    """Full-resolution file contents for downloads, read once per source version"""
+    key = (os.path.abspath(path), None, None, file_hash(path))
+    cached = _recall(key)
+    if cached is None:
+        with open(path, "rb") as f:
+            cached = Rendition(f.read(), "image/png", None, None)
+        _remember(key, cached)
+    return cached.data
+
+
+def data_uri(rendition):
+    return f"data:{rendition.mime};base64,{base64.b64encode(rendition.data).decode('ascii')}"
+
+
+def memory_usage():
+    return {"entries": len(_memory), "bytes": _memory_bytes, **stats}
+
+
+def warm(directory=IMAGE_DIR, widths=(INLINE_WIDTH, THUMBNAIL_WIDTH)):
+    """Generate every rendition ahead of the first page view"""
+    for filename in sorted(os.listdir(directory)):
+        if filename.lower().endswith(".png"):
+            path = os.path.join(directory, filename)
+            sizes = [len(rendition(path, width).data) for width in widths]
+            print(f"{filename:<34} {os.path.getsize(path):>10,} B -> "
+                  + "  ".join(f"{width}px {size:>9,} B" for width, size in zip(widths, sizes)))
+
+
+if __name__ == "__main__":
+    warm()
@@ -0,0 +1,160 @@
+# Vectorized input checks in front of the model: finite values, training ranges and
+# per-crop Mahalanobis distance (out-of-distribution rows)
+#
+#   validator = input_validation.get_validator()
+#   result = validator.check(X)          # X: (n, 7) in model feature order
+#   X[result.ok]                         # rows worth scoring
+import os
+import threading
+import numpy as np
+import pandas as pd
+from scipy.special import chdtri
+from data_stats import clean_dataset, file_hash
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, "Crop_recommendation_corrected.csv")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "validation")
+FEATURES = ["N", "P", "K", "temperature", "humidity", "pH", "rainfall"]
+
+# Share of the training span a value may lie outside the CSV's min/max
+RANGE_TOLERANCE = 0.05
+# A row is out of distribution when its squared Mahalanobis distance to every crop
+# exceeds this chi-square quantile (7 degrees of freedom; no training row does)
+OOD_QUANTILE = 0.999
+# Added to each covariance diagonal, relative to the variance, so tight crops stay invertible
+COVARIANCE_RIDGE = 1e-3
+# Rows per distance block; each holds an (n, 7 * n_crops) float32 intermediate
+CHECK_CHUNK_ROWS = 8_192
+
+STATUS_NAMES = np.array(["ok", "non_finite", "out_of_range", "out_of_distribution"], dtype=object)
+OK, NON_FINITE, OUT_OF_RANGE, OUT_OF_DISTRIBUTION = range(4)
+
+
+class ValidationResult:
+    """Per-row outcome of InputValidator.check.
+
+    ``status`` holds one code per row (OK, NON_FINITE, OUT_OF_RANGE or
+    OUT_OF_DISTRIBUTION, the first that applies), ``outside`` marks the
+    offending features, and ``distance``/``nearest`` give the Mahalanobis
+    distance to the closest crop and that crop's name.
+    """
+
+    def __init__(self, status, outside, distance, nearest):
+        self.status = status
+        self.outside = outside
+        self.distance = distance
+        self.nearest = nearest
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    @property
+    def status_names(self):
+        return STATUS_NAMES[self.status]
+
+    def counts(self):
+        return {name: int(count) for name, count in zip(STATUS_NAMES, np.bincount(self.status, minlength=4))}
+
+
+class InputValidator:
+    """Feature ranges plus class means and whitening matrices (inverse Cholesky factors) per crop"""
+
+    def __init__(self, low, high, crops, means, whiteners, threshold=None):
+        self.low = low
+        self.high = high
+        self.crops = np.asarray(crops, dtype=object)
+        self.means = means              # (n_crops, 7)
+        self.whiteners = whiteners      # (n_crops, 7, 7); |W (x - mean)|^2 is the squared distance
+        self.threshold = chdtri(len(FEATURES), 1 - OOD_QUANTILE) if threshold is None else threshold
+        # Every crop's whitening in one float32 matmul: x @ W.T - mean @ W.T, side by side per crop
+        self._stacked = np.concatenate(list(whiteners), axis=0).T.astype(np.float32).copy()
+        self._offsets = np.einsum("cij,cj->ci", whiteners, means).reshape(-1).astype(np.float32)
+
+    @classmethod
+    def fit(cls, X, labels, tolerance=RANGE_TOLERANCE):
+        span = X.max(axis=0) - X.min(axis=0)
+        crops = np.unique(labels)
+        means, whiteners = [], []
+        for crop in crops:
+            rows = X[labels == crop]
+            cov = np.cov(rows, rowvar=False)
+            cov += COVARIANCE_RIDGE * np.diag(np.diag(cov))
+            means.append(rows.mean(axis=0))
+            whiteners.append(np.linalg.inv(np.linalg.cholesky(cov)))
+        return cls(X.min(axis=0) - tolerance * span, X.max(axis=0) + tolerance * span, crops,
+                   np.array(means), np.array(whiteners))
+
+    @classmethod
+    def from_csv(cls, csv_path=CSV_PATH, cache_dir=CACHE_DIR):
+        """Profile of the CSV, cached on its content hash"""
+        path = os.path.join(cache_dir, f"{file_hash(csv_path)[:16]}.npz")
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as data:
+                return cls(data["low"], data["high"], data["crops"], data["means"], data["whiteners"])
+        df = clean_dataset(pd.read_csv(csv_path))
+        validator = cls.fit(df[FEATURES].to_numpy(dtype=np.float64), df["label"].to_numpy())
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, low=validator.low, high=validator.high, crops=validator.crops.astype(str),
+                 means=validator.means, whiteners=validator.whiteners)
+        os.replace(tmp, path)
+        return validator
+
+    def nearest_crops(self, X):
+        """Index of the closest crop per row and the squared Mahalanobis distance to it"""
+        X = np.asarray(X, dtype=np.float32)
+        n_crops = len(self.crops)
+        nearest = np.empty(len(X), dtype=np.intp)
+        nearest_d2 = np.empty(len(X), dtype=np.float32)
+        for start in range(0, len(X), CHECK_CHUNK_ROWS):
+            z = X[start:start + CHECK_CHUNK_ROWS] @ self._stacked
+            z -= self._offsets
+            z *= z
+            d2 = z.reshape(len(z), n_crops, -1).sum(axis=2)
+            best = d2.argmin(axis=1)
+            nearest[start:start + len(z)] = best
+            nearest_d2[start:start + len(z)] = d2[np.arange(len(z)), best]
+        return nearest, nearest_d2
+
+    def check(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        finite = np.isfinite(X)
+        outside = finite & ((X < self.low) | (X > self.high))
+        nearest, nearest_d2 = self.nearest_crops(np.where(finite, X, self.low))
+
+        status = np.full(len(X), OK, dtype=np.uint8)
+        status[nearest_d2 > self.threshold] = OUT_OF_DISTRIBUTION
+        status[outside.any(axis=1)] = OUT_OF_RANGE
+        status[~finite.all(axis=1)] = NON_FINITE
+        distance = np.where(status == NON_FINITE, np.nan, np.sqrt(nearest_d2))
+        return ValidationResult(status, outside, distance, self.crops[nearest])
+
+    def reasons(self, row):
+        """Readable problems with one row, empty when it is fine"""
+        result = self.check(np.asarray(row, dtype=np.float64).reshape(1, -1))
+        status = int(result.status[0])
+        if status == NON_FINITE:
+            return ["some values are missing or not finite"]
+        if status == OUT_OF_RANGE:
+            return [f"{name} {value:g} is outside the training range {low:g}–{high:g}"
+                    for name, value, low, high, bad in zip(FEATURES, row, self.low, self.high, result.outside[0])
+                    if bad]
+        if status == OUT_OF_DISTRIBUTION:
+            return [f"this combination is unlike any crop in the training data "
+                    f"(closest: {result.nearest[0]}, distance {result.distance[0]:.1f})"]
+        return []
+
+
+_validator = None
+_lock = threading.Lock()
+
+
+def get_validator():
+    """Process-wide validator for the bundled CSV, built on first use"""
+    global _validator
+    if _validator is None:
+        with _lock:
+            if _validator is None:
+                _validator = InputValidator.from_csv()
+    return _validator
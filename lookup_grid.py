@@ -0,0 +1,260 @@
+# Precomputed crop predictions over a quantized lattice of the input domain ("grid mode")
+# Run from the repository root:
+#   python lookup_grid.py                                   # lattice cut at the forest's split thresholds
+#   python lookup_grid.py --steps 10,10,10,2.5,5,0.5,10     # uniform lattice instead
+#   CROP_GRID_PATH=lookup_grid streamlit run dashboard.py
+#
+# The grid is one uint8 class id per lattice cell, memory-mapped from classes.npy,
+# so predict_crop becomes seven bisections and one array read instead of a forest walk.
+import argparse
+import bisect
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GRID_DIR = os.path.join(BASE_DIR, "lookup_grid")
+GRID_PATH = os.environ.get("CROP_GRID_PATH")
+GRID_FILE = "classes.npy"
+METADATA_FILE = "grid.json"
+FORMAT_VERSION = 1
+
+# Bounds of the prediction page's number inputs, in model feature order
+DOMAIN = [("N", 0, 140), ("P", 0, 145), ("K", 0, 205), ("temperature", 0, 50), ("humidity", 0, 100),
+          ("pH", 0, 14), ("rainfall", 0, 300)]
+# Cells per feature of the default lattice (5.8M cells, 5.8 MB)
+DEFAULT_LEVELS = [10, 10, 10, 8, 10, 8, 10]
+# Lattice points scored per forest call while building
+BUILD_CHUNK_ROWS = 200_000
+# Uniform random points in DOMAIN used to measure disagreement off the training data
+CHECK_RANDOM_ROWS = 100_000
+
+
+class LookupGrid:
+    """Class ids of a rectilinear lattice; a row maps to the cell its features fall in.
+
+    Cell ``i`` of feature ``f`` holds ``edges[f][i - 1] < x <= edges[f][i]``,
+    the same side of a threshold the forest sends ``x`` to.
+    """
+
+    def __init__(self, classes, edges, label_names, metadata=None):
+        self.classes = classes
+        self.flat = classes.reshape(-1)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.label_names = np.asarray(label_names, dtype=object)
+        self.metadata = metadata or {}
+        self.strides = np.array(classes.strides) // classes.itemsize
+        self._edge_lists = [e.tolist() for e in self.edges]
+        self._stride_list = self.strides.tolist()
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        if metadata.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{directory} was written by an incompatible version of lookup_grid.py")
+        classes = np.load(os.path.join(directory, GRID_FILE), mmap_mode=mmap_mode)
+        return cls(classes, metadata["edges"], metadata["label_names"], metadata)
+
+    @property
+    def shape(self):
+        return self.classes.shape
+
+    @property
+    def model_artifact_hash(self):
+        """model_registry.artifact_hash of the model the grid was built from"""
+        return self.metadata.get("model_artifact_hash")
+
+    @property
+    def disagreement(self):
+        """Share of rows where the grid and the exact model disagree, per check set"""
+        return self.metadata.get("disagreement", {})
+
+    def cell_ids(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        flat = np.zeros(len(X), dtype=np.intp)
+        for f, edges in enumerate(self.edges):
+            flat += np.searchsorted(edges, X[:, f], side="left") * self.strides[f]
+        return flat
+
+    def predict(self, X):
+        """Class ids for an (n, 7) matrix"""
+        return self.flat[self.cell_ids(X)].astype(np.intp)
+
+    def class_id(self, row):
+        # Plain Python for one row; NumPy call overhead would dominate
+        flat = 0
+        for value, edges, stride in zip(row, self._edge_lists, self._stride_list):
+            flat += bisect.bisect_left(edges, value) * stride
+        return int(self.flat[flat])
+
+    def crop(self, row):
+        return self.label_names[self.class_id(row)]
+
+
+def threshold_edges(engine, levels):
+    """Cell edges at quantiles of each feature's split thresholds, so cells follow the forest's own cuts"""
+    internal = engine.children[0::2] != np.arange(engine.n_nodes)
+    edges = []
+    for f, n_cells in enumerate(levels):
+        thresholds = np.sort(engine.threshold[internal & (engine.feature == f)])
+        if len(thresholds) == 0 or n_cells < 2:
+            edges.append(np.empty(0))
+            continue
+        edges.append(np.unique(np.quantile(thresholds, np.arange(1, n_cells) / n_cells)))
+    return edges
+
+
+def uniform_edges(steps):
+    """Edges halfway between lattice points ``low, low + step, ...``, i.e. rounding to the nearest point"""
+    edges = []
+    for (_, low, high), step in zip(DOMAIN, steps):
+        points = np.arange(low, high + step / 2, step)
+        edges.append((points[:-1] + points[1:]) / 2)
+    return edges
+
+
+def cell_points(edges):
+    """Representative point of every cell: its midpoint, with the outer cells closed at the DOMAIN bounds"""
+    points = []
+    for (_, low, high), e in zip(DOMAIN, edges):
+        bounds = np.concatenate([[min(low, e[0]) if len(e) else low], e, [max(high, e[-1]) if len(e) else high]])
+        points.append((bounds[:-1] + bounds[1:]) / 2)
+    return points
+
+
+def lattice_rows(points, start, stop):
+    shape = tuple(len(p) for p in points)
+    index = np.unravel_index(np.arange(start, stop), shape)
+    return np.column_stack([p[i] for p, i in zip(points, index)])
+
+
+def build(bundle, model_path, edges, directory, workers=1, chunk_rows=BUILD_CHUNK_ROWS, progress=True):
+    """Score every lattice cell with the exact model and write the grid directory atomically"""
+    from numpy.lib.format import open_memmap
+    import score_csv
+
+    engine = bundle.engine
+    if int(engine.classes.max()) > np.iinfo(np.uint8).max:
+        raise ValueError("A uint8 grid holds at most 256 classes")
+    points = cell_points(edges)
+    shape = tuple(len(p) for p in points)
+    n_cells = int(np.prod(shape))
+
+    started = time.perf_counter()
+    tmp_dir = f"{directory.rstrip(os.sep)}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        classes = open_memmap(os.path.join(tmp_dir, GRID_FILE), mode="w+", dtype=np.uint8, shape=shape)
+        flat = classes.reshape(-1)
+        starts = range(0, n_cells, chunk_rows)
+        if workers > 1:
+            # Workers memory-map one exported copy of the model, as in score_csv.py
+            with tempfile.TemporaryDirectory(prefix="lookup-grid-") as workdir:
+                model_dir = score_csv.shared_model_dir(model_path, workdir)
+                with ProcessPoolExecutor(workers, initializer=score_csv._init_worker, initargs=(model_dir,)) as pool:
+                    pending = deque()
+                    for start in starts:
+                        stop = min(start + chunk_rows, n_cells)
+                        pending.append((start, stop, pool.submit(score_csv.score_rows,
+                                                                 lattice_rows(points, start, stop))))
+                        while len(pending) >= workers * score_csv.CHUNKS_IN_FLIGHT_PER_WORKER:
+                            first, last, future = pending.popleft()
+                            flat[first:last] = future.result()[0]
+                    for first, last, future in pending:
+                        flat[first:last] = future.result()[0]
+        else:
+            last_report = started
+            for start in starts:
+                stop = min(start + chunk_rows, n_cells)
+                flat[start:stop] = engine.predict(lattice_rows(points, start, stop))
+                if progress and time.perf_counter() - last_report >= 5:
+                    last_report = time.perf_counter()
+                    print(f"{stop:,} / {n_cells:,} cells", flush=True)
+        classes.flush()
+        del classes, flat
+
+        metadata = {
+            "format_version": FORMAT_VERSION,
+            "features": [name for name, _, _ in DOMAIN],
+            "domain": [[low, high] for _, low, high in DOMAIN],
+            "edges": [e.tolist() for e in edges],
+            "shape": list(shape),
+            "label_names": bundle.label_names.tolist(),
+            "model_path": model_path,
+            "model_artifact_hash": bundle.artifact_hash,
+            "build_seconds": time.perf_counter() - started,
+        }
+        with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+            json.dump(metadata, f, indent=2)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return LookupGrid.load(directory)
+
+
+def check(grid, engine, csv_path=None, random_rows=CHECK_RANDOM_ROWS, seed=0):
+    """Disagreement with the exact model on the CSV rows and on uniform random points of the domain"""
+    rng = np.random.default_rng(seed)
+    low = np.array([low for _, low, _ in DOMAIN], dtype=np.float64)
+    high = np.array([high for _, _, high in DOMAIN], dtype=np.float64)
+    check_sets = {"random_domain_rows": low + rng.random((random_rows, len(DOMAIN))) * (high - low)}
+    if csv_path:
+        from train_model import load_training_data
+        check_sets = {"csv_rows": load_training_data(csv_path)[0], **check_sets}
+    return {name: float((grid.predict(X) != engine.predict(X)).mean()) for name, X in check_sets.items()}
+
+
+def build_grid(model_path, directory=GRID_DIR, levels=DEFAULT_LEVELS, steps=None, csv_path=None, workers=1):
+    """Build the grid, then record its disagreement rate in grid.json"""
+    from model_registry import load_bundle
+    bundle = load_bundle(model_path)
+    edges = uniform_edges(steps) if steps else threshold_edges(bundle.engine, levels)
+    grid = build(bundle, model_path, edges, directory, workers)
+    grid.metadata["lattice"] = {"steps": list(steps)} if steps else {"threshold_quantiles": list(levels)}
+    grid.metadata["disagreement"] = check(grid, bundle.engine, csv_path)
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(grid.metadata, f, indent=2)
+    return grid
+
+
+def float_list(text):
+    return [float(value) for value in text.split(",")]
+
+
+def int_list(text):
+    return [int(value) for value in text.split(",")]
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+    from model_registry import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Precompute crop predictions over a lattice of the input domain")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--out-dir", default=GRID_DIR)
+    parser.add_argument("--levels", type=int_list, default=DEFAULT_LEVELS,
+                        help="cells per feature, cut at quantiles of the forest's split thresholds")
+    parser.add_argument("--steps", type=float_list,
+                        help="uniform lattice spacing per feature (N,P,K,temperature,humidity,pH,rainfall)")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "Crop_recommendation_corrected.csv"))
+    parser.add_argument("--workers", type=int, default=1, help="scoring processes")
+    args = parser.parse_args()
+    if args.steps and len(args.steps) != len(DOMAIN) or len(args.levels) != len(DOMAIN):
+        raise SystemExit(f"--levels and --steps need {len(DOMAIN)} values")
+
+    grid = build_grid(args.model, args.out_dir, args.levels, args.steps, args.csv, args.workers)
+    size = grid.classes.nbytes
+    print(f"{int(np.prod(grid.shape)):,} cells {grid.shape}, {size / 1e6:.1f} MB, "
+          f"built in {grid.metadata['build_seconds']:.1f} s -> {args.out_dir}")
+    for name, rate in grid.disagreement.items():
+        print(f"disagreement with the exact model on {name}: {rate:.2%}")
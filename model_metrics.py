@@ -0,0 +1,206 @@
+# Live ANOVA and evaluation metrics for the "Model Evaluation & ANOVA Analysis" page
+import hashlib
+import io
+import os
+import threading
+import numpy as np
+import pandas as pd
+from scipy.special import fdtrc
+from data_stats import FEATURES, clean_dataset
+from model_script import FEATURES as MODEL_FEATURES
+
+# Held-out split used by train_random_forest in the notebook
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+# Bytes read per block when scanning the CSV, and bytes compared to recognise an append
+READ_BLOCK_BYTES = 64 * 1024 * 1024
+TAIL_CHECK_BYTES = 64 * 1024
+
+
+class AnovaAccumulator:
+    """One-way ANOVA across crops from per-crop count, sum and sum of squares.
+
+    ``update`` folds in new rows in O(rows); the F-statistics never need the
+    raw data again. Missing values are skipped per feature.
+    """
+
+    def __init__(self, features=FEATURES):
+        self.features = list(features)
+        self.labels = []
+        self._label_index = {}
+        self.counts = np.zeros((0, len(self.features)))
+        self.sums = np.zeros((0, len(self.features)))
+        self.squares = np.zeros((0, len(self.features)))
+
+    @property
+    def n_rows(self):
+        return int(self.counts[:, 0].sum()) if len(self.counts) else 0
+
+    def _crop_index(self, labels):
+        uniques, inverse = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        for label in uniques:
+            if label not in self._label_index:
+                self._label_index[label] = len(self.labels)
+                self.labels.append(label)
+        grow = len(self.labels) - len(self.counts)
+        if grow:
+            padding = np.zeros((grow, len(self.features)))
+            self.counts = np.vstack([self.counts, padding])
+            self.sums = np.vstack([self.sums, padding])
+            self.squares = np.vstack([self.squares, padding])
+        return np.array([self._label_index[label] for label in uniques], dtype=np.intp)[inverse.ravel()]
+
+    def update(self, df):
+        if len(df) == 0:
+            return
+        crops = self._crop_index(df["label"])
+        k = len(self.labels)
+        for j, feature in enumerate(self.features):
+            x = df[feature].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(x)
+            x = np.where(valid, x, 0.0)
+            self.counts[:, j] += np.bincount(crops, weights=valid, minlength=k)
+            self.sums[:, j] += np.bincount(crops, weights=x, minlength=k)
+            self.squares[:, j] += np.bincount(crops, weights=x * x, minlength=k)
+
+    def table(self):
+        """F-value and p-value per feature"""
+        counts = self.counts
+        present = counts > 0
+        safe_counts = np.where(present, counts, 1.0)
+        n = counts.sum(axis=0)
+        k = present.sum(axis=0)
+        grand_mean = self.sums.sum(axis=0) / n
+        means = self.sums / safe_counts
+        between = (counts * (means - grand_mean) ** 2).sum(axis=0)
+        within = (self.squares - self.sums ** 2 / safe_counts).sum(axis=0)
+        df_between = k - 1
+        df_within = n - k
+        with np.errstate(divide="ignore", invalid="ignore"):
+            f_values = (between / df_between) / (within / df_within)
+        p_values = fdtrc(df_between, df_within, f_values)
+        return pd.DataFrame({"F-value": f_values, "p-value": p_values}, index=self.features)
+
+
+class CsvAnovaTracker:
+    """ANOVA sufficient statistics for a CSV file that grows by appended rows.
+
+    ``refresh`` reads only the bytes past the last consumed line when the file
+    still ends the way it did before; any other change triggers a full rescan.
+    A last line without a newline is read once the file size is unchanged
+    between two refreshes; if the file then grows, it is rescanned in case that
+    line was still being written.
+    """
+
+    def __init__(self, path, features=FEATURES):
+        self.path = path
+        self.features = list(features)
+        self.accumulator = AnovaAccumulator(self.features)
+        self.header = None
+        self.offset = 0
+        self._tail_digest = None
+        self._last_size = None
+        self._unterminated = False  # the consumed bytes end mid-line
+        self._lock = threading.Lock()
+        self.full_scans = 0
+        self.appended_rows = 0
+
+    def _digest_before(self, offset):
+        with open(self.path, "rb") as f:
+            f.seek(max(0, offset - TAIL_CHECK_BYTES))
+            return hashlib.sha256(f.read(min(offset, TAIL_CHECK_BYTES))).hexdigest()
+
+    def _parse(self, data):
+        frame = pd.read_csv(io.BytesIO(self.header + data))
+        return frame.rename(columns={"humidity ": "humidity"})
+
+    def _consume(self, start, through_eof=False):
+        rows = 0
+        with open(self.path, "rb") as f:
+            if start == 0:
+                self.header = f.readline()
+                start = f.tell()
+            f.seek(start)
+            carry = b""
+            while True:
+                block = f.read(READ_BLOCK_BYTES)
+                if not block:
+                    break
+                data = carry + block
+                end = data.rfind(b"\n") + 1  # only complete lines
+                if end:
+                    frame = self._parse(data[:end])
+                    self.accumulator.update(frame)
+                    rows += len(frame)
+                    start += end
+                carry = data[end:]
+            if through_eof and carry.strip():
+                frame = self._parse(carry + b"\n")
+                self.accumulator.update(frame)
+                rows += len(frame)
+            if through_eof:
+                start += len(carry)
+        self.offset = start
+        self._unterminated = bool(through_eof and carry)
+        self._tail_digest = self._digest_before(self.offset)
+        return rows
+
+    def refresh(self):
+        """Bring the statistics up to date with the file; returns the number of rows read"""
+        with self._lock:
+            size = os.path.getsize(self.path)
+            stable = size == self._last_size
+            self._last_size = size
+            appended = (self.offset and size >= self.offset and not (self._unterminated and size > self.offset)
+                        and self._digest_before(self.offset) == self._tail_digest)
+            if appended:
+                if size == self.offset:
+                    return 0
+                rows = self._consume(self.offset, through_eof=stable)
+                self.appended_rows += rows
+                return rows
+            self.accumulator = AnovaAccumulator(self.features)
+            self.full_scans += 1
+            return self._consume(0, through_eof=stable)
+
+    def table(self):
+        with self._lock:
+            return self.accumulator.table()
+
+
+def evaluate_model(df, bundle):
+    """Metrics of the model on the same held-out split train_random_forest used"""
+    from sklearn.metrics import (accuracy_score, classification_report, confusion_matrix,
+                                 precision_recall_fscore_support)
+    from sklearn.model_selection import train_test_split
+
+    df = clean_dataset(df)
+    y = df["label"].map(bundle.label_mapping).to_numpy()
+    X = df[MODEL_FEATURES].to_numpy(dtype=np.float64)
+    _, X_test, _, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y)
+    y_pred = bundle.engine.predict(X_test)
+
+    precision, recall, f1, _ = precision_recall_fscore_support(y_test, y_pred, average="weighted", zero_division=0)
+    overall = pd.DataFrame({
+        "Metric": ["Accuracy", "Precision", "Recall", "F1-Score"],
+        "Value": [accuracy_score(y_test, y_pred), precision, recall, f1],
+    })
+
+    class_ids = sorted(bundle.label_reverse)
+    names = [bundle.label_reverse[class_id] for class_id in class_ids]
+    report = classification_report(y_test, y_pred, labels=class_ids, target_names=names,
+                                   output_dict=True, zero_division=0)
+    per_class = pd.DataFrame({
+        "Crop": names,
+        "Precision": [report[name]["precision"] for name in names],
+        "Recall": [report[name]["recall"] for name in names],
+        "F1-score": [report[name]["f1-score"] for name in names],
+        "Support": [int(report[name]["support"]) for name in names],
+    })
+    return {
+        "overall": overall,
+        "per_class": per_class,
+        "confusion_matrix": pd.DataFrame(confusion_matrix(y_test, y_pred, labels=class_ids), index=names, columns=names),
+        "test_rows": len(y_test),
+    }
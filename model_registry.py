@@ -0,0 +1,206 @@
+# Lazy, process-wide cache of the trained model and its label mapping
+import hashlib
+import json
+import os
+import threading
+import time
+import joblib
+import numpy as np
+from explanations import ForestExplainer
+from forest_engine import compile_forest, load_compiled
+from timings import timed
+
+# Artifacts are resolved next to this file, not the current working directory.
+# CROP_MODEL_PATH may point at the pickle or at an exported array directory.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.environ.get("CROP_MODEL_PATH", os.path.join(BASE_DIR, "crop_recommender_rf.pkl"))
+LABEL_MAPPING_PATH = os.path.join(BASE_DIR, "label_mapping.json")
+# Seconds between checks for a replaced artifact (e.g. by online_update.py); 0 turns hot reload off
+RELOAD_CHECK_SECONDS = float(os.environ.get("CROP_MODEL_RELOAD_SECONDS", "2"))
+
+
+class ModelBundle:
+    """The compiled forest and label maps used for prediction.
+
+    ``pipeline`` is the unpickled sklearn pipeline, or None when the model was
+    memory-mapped from an exported array directory.
+    """
+
+    def __init__(self, engine, label_mapping, pipeline=None, artifact_hash=None):
+        self.pipeline = pipeline
+        self.engine = engine
+        self.artifact_hash = artifact_hash
+        self.label_mapping = label_mapping
+        self.label_reverse = {v: k for k, v in label_mapping.items()}
+        # Class id -> crop name, so whole prediction arrays decode with one take
+        self.label_names = np.empty(max(self.label_reverse) + 1, dtype=object)
+        for class_id, name in self.label_reverse.items():
+            self.label_names[class_id] = name
+        self._explainer = None
+
+    def explainer(self, n_features):
+        """ForestExplainer for this engine, built on first use"""
+        if self._explainer is None:
+            self._explainer = ForestExplainer(self.engine, n_features)
+        return self._explainer
+
+
+def artifact_hash(*paths):
+    """SHA-256 over the given files, or over every file of a directory artifact"""
+    digest = hashlib.sha256()
+    for path in paths:
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+        for file_path in files:
+            digest.update(os.path.basename(file_path).encode())
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_stamp(*paths):
+    """(mtime_ns, size) per path; replacing a file, or a file inside a directory, changes it"""
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def pipeline_label_mapping(pipeline, label_mapping_path=LABEL_MAPPING_PATH):
+    """The label map a pickled pipeline was trained with.
+
+    train_model.py embeds it; older pickles fall back to ``label_mapping_path``,
+    which may already belong to the next training run.
+    """
+    if "label_mapping" in pipeline:
+        return pipeline["label_mapping"]
+    with open(label_mapping_path) as f:
+        return json.load(f)
+
+
+@timed("model_load")
+def load_bundle(model_path=MODEL_PATH, label_mapping_path=LABEL_MAPPING_PATH):
+    # Exported directories (e.g. compress_model.py variants) may carry their own label map
+    bundled_mapping = os.path.join(model_path, "label_mapping.json")
+    if os.path.isdir(model_path) and os.path.exists(bundled_mapping):
+        label_mapping_path = bundled_mapping
+    content_hash = artifact_hash(model_path, label_mapping_path)
+    if os.path.isdir(model_path):
+        with open(label_mapping_path) as f:
+            label_mapping = json.load(f)
+        return ModelBundle(load_compiled(model_path, mmap_mode="r"), label_mapping, artifact_hash=content_hash)
+    pipeline = joblib.load(model_path)
+    return ModelBundle(compile_forest(pipeline["model"]), pipeline_label_mapping(pipeline, label_mapping_path),
+                       pipeline, content_hash)
+
+
+class ModelRegistry:
+    """Loads the model on first use and hands the same instance to every caller.
+
+    ``cold_load_seconds`` is the time of the first (unpickling) load and
+    ``warm_load_seconds`` the time of the most recent cache hit. Every
+    ``reload_check_seconds`` one caller stats the artifact; when it was
+    replaced, a background thread loads the new one and swaps it in, and
+    callers keep getting the previous bundle until then.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, label_mapping_path=LABEL_MAPPING_PATH,
+                 reload_check_seconds=RELOAD_CHECK_SECONDS):
+        self.model_path = model_path
+        self.label_mapping_path = label_mapping_path
+        self.reload_check_seconds = reload_check_seconds
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stamp = None
+        self._next_check = 0.0
+        self.cold_load_seconds = None
+        self.warm_load_seconds = None
+        self.warm_hits = 0
+        self.reloads = 0
+        self.reload_error = None
+
+    def _artifact_stamp(self):
+        return artifact_stamp(self.model_path, self.label_mapping_path)
+
+    def get(self):
+        start = time.perf_counter()
+        bundle = self._bundle
+        if bundle is None:
+            with self._lock:
+                if self._bundle is None:
+                    # Stamped before loading, so a replacement during the load is picked up later
+                    self._stamp = self._artifact_stamp()
+                    self._next_check = start + self.reload_check_seconds
+                    self._bundle = load_bundle(self.model_path, self.label_mapping_path)
+                    self.cold_load_seconds = time.perf_counter() - start
+                    return self._bundle
+                bundle = self._bundle
+        elif self.reload_check_seconds and start >= self._next_check:
+            self._check_for_update(start)
+        self.warm_hits += 1
+        self.warm_load_seconds = time.perf_counter() - start
+        return bundle
+
+    def _check_for_update(self, now):
+        # Only one caller checks; a reload in progress keeps the lock until it is done
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        self._next_check = now + self.reload_check_seconds
+        stamp = self._artifact_stamp()
+        if stamp == self._stamp:
+            self._reload_lock.release()
+            return
+        threading.Thread(target=self._reload_locked, args=(stamp,), name="model-reload", daemon=True).start()
+
+    def _reload_locked(self, stamp):
+        try:
+            self._swap(stamp)
+        except Exception as exc:
+            # Keep serving the previous bundle; the next replacement is tried again
+            self._stamp = stamp
+            self.reload_error = f"{type(exc).__name__}: {exc}"
+        finally:
+            self._reload_lock.release()
+
+    def _swap(self, stamp):
+        bundle = load_bundle(self.model_path, self.label_mapping_path)
+        with self._lock:
+            self._bundle = bundle
+            self._stamp = stamp
+            self.reloads += 1
+            self.reload_error = None
+        return bundle
+
+    def reload(self):
+        """Load the artifact again now and swap it in atomically; returns the new bundle"""
+        with self._reload_lock:
+            return self._swap(self._artifact_stamp())
+
+    @property
+    def is_loaded(self):
+        return self._bundle is not None
+
+    def clear(self):
+        with self._lock:
+            self._bundle = None
+            self.cold_load_seconds = None
+            self.warm_load_seconds = None
+            self.warm_hits = 0
+            self._stamp = None
+
+    def stats(self):
+        return {
+            "model_path": self.model_path,
+            "loaded": self.is_loaded,
+            "cold_load_seconds": self.cold_load_seconds,
+            "warm_load_seconds": self.warm_load_seconds,
+            "warm_hits": self.warm_hits,
+            "reloads": self.reloads,
+            "reload_error": self.reload_error,
+        }
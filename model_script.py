@@ -1,18 +1,392 @@
-# model_script.py
-import joblib
-import json
 import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from bundle_store import ModelPool
+from lookup_grid import GRID_PATH, LookupGrid
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from sensitivity import DEFAULT_STEPS, Sweep, score_sweep, sweep_axes, sweep_rows
+from timings import timed
 
-# Load label mapping
-with open("label_mapping.json") as f:
-    label_mapping = json.load(f)
-    label_reverse = {v: k for k, v in label_mapping.items()}
+# Feature order expected by the model; the CSV spells pH as "ph"
+FEATURES = ["N", "P", "K", "temperature", "humidity", "pH", "rainfall"]
+CSV_COLUMN_ALIASES = {"ph": "pH"}
+
+# The model is unpickled on first use, not at import time
+registry = ModelRegistry()
+
+# Per-region bundles (bundle_store.py), loaded on first use and kept warm up to the pool's size.
+# Calls with region=... are served from here; the caches and grid mode below serve the default model
+bundle_pool = ModelPool()
+
+# Optional cache of predictions keyed on quantized inputs; off until enabled
+prediction_cache = None
+
+# Optional cache of explanations (probabilities + per-feature contributions) keyed the same way
+explanation_cache = None
+
+# What-if sweeps per (model, quantized reading, swept features, steps, ranges); each entry is one
+# class-id array. On by default since sweeps are re-requested on every dashboard rerun; None turns it off
+sweep_cache = PredictionCache(max_entries=256, max_bytes=16 * 1024 * 1024)
+
+# Optional precomputed lookup grid (lookup_grid.py); when set, predict_crop and
+# predict_crops_batch answer from it without walking the forest. It is dropped as soon as the
+# served model no longer has the artifact hash it was built from; grid_error then says why
+grid = LookupGrid.load(GRID_PATH) if GRID_PATH else None
+grid_error = None
+
+# Module attributes kept for callers that used the old import-time globals
+_BUNDLE_ATTRIBUTES = {
+    "loaded_model": "pipeline",
+    "engine": "engine",
+    "label_mapping": "label_mapping",
+    "label_reverse": "label_reverse",
+    "label_names": "label_names",
+}
+
+
+def __getattr__(name):
+    if name in _BUNDLE_ATTRIBUTES:
+        return getattr(registry.get(), _BUNDLE_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_model(region=None):
+    return registry.get() if region is None else bundle_pool.get(region)
+
+
+def load_stats():
+    return {**registry.stats(), "pool": bundle_pool.stats(), "grid_mode": grid is not None, "grid_error": grid_error}
+
+
+def use_model(model_path):
+    """Serve from another artifact: a pickle, an exported directory or a compress_model.py variant"""
+    global registry
+    registry = ModelRegistry(model_path)
+    bundle = registry.get()
+    active_grid()
+    return bundle
+
+
+def enable_prediction_cache(**options):
+    """Route predict_crop and predict_crops_batch through a PredictionCache"""
+    global prediction_cache
+    prediction_cache = PredictionCache(**options)
+    return prediction_cache
+
+
+def disable_prediction_cache():
+    global prediction_cache
+    prediction_cache = None
+
+
+def enable_explanation_cache(**options):
+    """Route explain_crop and explain_crops_batch through a PredictionCache"""
+    global explanation_cache
+    explanation_cache = PredictionCache(**options)
+    return explanation_cache
+
+
+def disable_explanation_cache():
+    global explanation_cache
+    explanation_cache = None
+
+
+def enable_grid_mode(path):
+    """Answer predict_crop and predict_crops_batch from a lookup_grid.py directory (approximate).
+
+    Refuses a grid built from any other model than the one being served.
+    """
+    global grid, grid_error
+    loaded = LookupGrid.load(path)
+    mismatch = _grid_mismatch(loaded, get_model())
+    if mismatch:
+        raise ValueError(f"{path}: {mismatch}")
+    grid, grid_error = loaded, None
+    return grid
+
+
+def disable_grid_mode():
+    global grid
+    grid = None
+
+
+def _grid_mismatch(lookup, bundle):
+    if lookup.model_artifact_hash != bundle.artifact_hash:
+        return (f"grid was built from model {str(lookup.model_artifact_hash)[:12]} but {registry.model_path} "
+                f"is {str(bundle.artifact_hash)[:12]}; rebuild it with lookup_grid.py")
+    return None
+
+
+def active_grid(region=None):
+    """The lookup grid if it answers for ``region``, else None.
+
+    Checked against the served model on every call, so a hot reload, online
+    update or use_model() switches grid mode off rather than mixing models.
+    """
+    global grid, grid_error
+    current = grid
+    if current is None or region is not None:
+        return None
+    mismatch = _grid_mismatch(current, get_model())
+    if mismatch:
+        grid, grid_error = None, mismatch
+        return None
+    return current
+
+
+def _cached_class_ids(bundle, cache, X):
+    # One lookup per distinct quantized row; misses are scored in one engine call
+    cache.check_model(bundle.artifact_hash)
+    unique, inverse = np.unique(cache.quantize(X), axis=0, return_inverse=True)
+    keys = [tuple(row) for row in unique.tolist()]
+    class_ids = np.empty(len(keys), dtype=np.intp)
+    missing = []
+    for i, key in enumerate(keys):
+        class_id = cache.get(key)
+        if class_id is None:
+            missing.append(i)
+        else:
+            class_ids[i] = class_id
+    if missing:
+        predicted = bundle.engine.predict(cache.dequantize(unique[missing]))
+        class_ids[missing] = predicted
+        for i, class_id in zip(missing, predicted.tolist()):
+            cache.put(keys[i], class_id)
+    return class_ids[inverse.ravel()]
+
+
+def _explanations(bundle, X, cache):
+    # (n, n_classes) probabilities and (n, n_features, n_classes) contributions.
+    # Cached entries hold both as one (n_features + 1, n_classes) array.
+    explainer = bundle.explainer(len(FEATURES))
+    if cache is None:
+        return explainer.explain(X)
+    cache.check_model(bundle.artifact_hash)
+    if len(X) == 1:
+        # explain_crop: skip np.unique, as predict_crop does
+        key = cache.quantize_row(X[0])
+        entry = cache.get(key)
+        if entry is None:
+            proba, contributions = explainer.explain(cache.dequantize([key]))
+            entry = np.vstack([proba[0], contributions[0]])
+            cache.put(key, entry)
+        return entry[None, 0].astype(np.float64), entry[None, 1:]
+    unique, inverse = np.unique(cache.quantize(X), axis=0, return_inverse=True)
+    keys = [tuple(row) for row in unique.tolist()]
+    entries = [cache.get(key) for key in keys]
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+    if missing:
+        proba, contributions = explainer.explain(cache.dequantize(unique[missing]))
+        for i, p, c in zip(missing, proba, contributions):
+            entries[i] = np.vstack([p, c])
+            cache.put(keys[i], entries[i])
+    stacked = np.stack(entries)[inverse.ravel()]
+    return stacked[:, 0].astype(np.float64), stacked[:, 1:]
 
-# Load the trained pipeline
-loaded_model = joblib.load("crop_recommender_rf.pkl")
 
 # Predict function
-def predict_crop(N, P, K, temperature, humidity, pH, rainfall):
+@timed("predict_crop")
+def predict_crop(N, P, K, temperature, humidity, pH, rainfall, region=None):
+    lookup = active_grid(region)
+    if lookup is not None:
+        return lookup.crop((N, P, K, temperature, humidity, pH, rainfall))
+    bundle = get_model(region)
+    cache = prediction_cache if region is None else None
+    if cache is not None:
+        cache.check_model(bundle.artifact_hash)
+        key = cache.quantize_row((N, P, K, temperature, humidity, pH, rainfall))
+        class_id = cache.get(key)
+        if class_id is None:
+            class_id = int(bundle.engine.predict(cache.dequantize([key]))[0])
+            cache.put(key, class_id)
+        return bundle.label_reverse[class_id]
     sample = np.array([[N, P, K, temperature, humidity, pH, rainfall]])
-    prediction = loaded_model["model"].predict(sample)[0]
-    return label_reverse[int(prediction)]
+    prediction = bundle.engine.predict(sample)[0]
+    return bundle.label_reverse[int(prediction)]
+
+
+@timed("explain_crop")
+def explain_crop(N, P, K, temperature, humidity, pH, rainfall, region=None):
+    """The forest's crop for one sample and how each feature moved its probability.
+
+    ``crop`` and ``probability`` are predict_crop's answer and its predict_proba
+    value; ``base`` is the crop's average probability at the tree roots and
+    ``base`` plus the contributions gives ``probability`` up to float32
+    rounding. Explains the forest even in grid mode.
+    """
+    bundle = get_model(region)
+    cache = explanation_cache if region is None else None
+    proba, contributions = _explanations(bundle, np.array([[N, P, K, temperature, humidity, pH, rainfall]]), cache)
+    j = int(np.argmax(proba[0]))
+    explainer = bundle.explainer(len(FEATURES))
+    return {
+        "crop": bundle.label_names[int(bundle.engine.classes[j])],
+        "probability": float(proba[0, j]),
+        "base": float(explainer.bias[j]),
+        "contributions": dict(zip(FEATURES, contributions[0, :, j].tolist())),
+    }
+
+
+@timed("explain_crops_batch")
+def explain_crops_batch(data, chunk_size=50_000, region=None):
+    """explain_crop for many samples: a DataFrame of crop, probability, base and one column per feature"""
+    X = as_feature_matrix(data)
+    bundle = get_model(region)
+    cache = explanation_cache if region is None else None
+    explainer = bundle.explainer(len(FEATURES))
+    class_names = bundle.label_names[bundle.engine.classes.astype(np.intp)]
+    crops = np.empty(len(X), dtype=object)
+    probability = np.empty(len(X))
+    base = np.empty(len(X))
+    contributions = np.empty((len(X), len(FEATURES)))
+    for start in range(0, len(X), chunk_size):
+        proba, contrib = _explanations(bundle, X[start:start + chunk_size], cache)
+        best = proba.argmax(axis=1)
+        rows = slice(start, start + len(proba))
+        crops[rows] = class_names[best]
+        probability[rows] = proba[np.arange(len(proba)), best]
+        base[rows] = explainer.bias[best]
+        contributions[rows] = np.take_along_axis(contrib, best[:, None, None], axis=2)[:, :, 0]
+    report = pd.DataFrame({"crop": crops, "probability": probability, "base": base})
+    report[FEATURES] = contributions
+    return report
+
+
+@timed("sweep_crop")
+def sweep_crop(base, features, steps=DEFAULT_STEPS, ranges=None, region=None):
+    """sensitivity.Sweep of the recommendation over 1 or 2 features around one reading.
+
+    ``base`` is one sample as predict_crop takes it (7 values or a dict);
+    ``ranges`` maps feature -> (low, high) to override sensitivity.SWEEP_RANGES.
+    The whole grid is scored in one forest call, or from the lookup grid in grid mode.
+    """
+    base = as_feature_matrix(base)[0]
+    axes = sweep_axes(features, steps, ranges)
+    columns = [FEATURES.index(name) for name in features]
+    lookup = active_grid(region)
+    if lookup is not None:
+        return Sweep(base, features, columns, axes, lookup.predict(sweep_rows(base, columns, axes)),
+                     lookup.label_names)
+    bundle = get_model(region)
+    cache = sweep_cache
+    class_ids = key = None
+    if cache is not None:
+        # Keyed and scored at the quantized reading, like predict_crop's cache. The model's hash is
+        # part of the key so regions share the cache; superseded models' entries age out
+        key = cache.quantize_row(base)
+        base = cache.dequantize([key])[0]
+        key += (bundle.artifact_hash, tuple(features), steps, tuple(tuple(values[[0, -1]].tolist()) for values in axes))
+        class_ids = cache.get(key)
+    if class_ids is None:
+        class_ids = score_sweep(bundle.engine, base, columns, axes)
+        if cache is not None:
+            cache.put(key, class_ids)
+    return Sweep(base, features, columns, axes, class_ids, bundle.label_names)
+
+
+def as_feature_matrix(data):
+    """Convert an array, DataFrame or iterable of records into an (n, 7) float matrix"""
+    if isinstance(data, pd.DataFrame):
+        df = data.rename(columns=CSV_COLUMN_ALIASES)
+        missing = [col for col in FEATURES if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        return df[FEATURES].to_numpy(dtype=np.float64)
+
+    if isinstance(data, Mapping):
+        data = [data]
+    if not isinstance(data, np.ndarray):
+        records = list(data)
+        if records and isinstance(records[0], Mapping):
+            return as_feature_matrix(pd.DataFrame.from_records(records))
+        data = np.asarray(records, dtype=np.float64)
+
+    X = np.asarray(data, dtype=np.float64)
+    if X.ndim == 1 and X.size == len(FEATURES):
+        X = X.reshape(1, -1)
+    if X.size == 0:
+        # [] or np.empty(0): no samples, not a malformed one
+        X = X.reshape(0, len(FEATURES))
+    if X.ndim != 2 or X.shape[1] != len(FEATURES):
+        raise ValueError(f"Expected shape (n, {len(FEATURES)}), got {X.shape}")
+    return X
+
+
+@timed("predict_crops_batch")
+def predict_crops_batch(data, chunk_size=50_000, n_threads=None, validate=False, region=None):
+    """Predict crop names for many samples in chunked, vectorized forest calls.
+
+    With ``validate=True`` rows that fail input_validation (non-finite, out of
+    the training range or unlike every crop) are not scored and come back as None.
+    """
+    X = as_feature_matrix(data)
+    if not validate:
+        return _predict_labels(X, chunk_size, n_threads, region)
+    valid = region_validator(region).check(X).ok
+    labels = np.full(len(X), None, dtype=object)
+    labels[valid] = _predict_labels(X[valid], chunk_size, n_threads, region)
+    return labels
+
+
+def validate_inputs(data, region=None):
+    """input_validation.ValidationResult for anything predict_crops_batch accepts"""
+    return region_validator(region).check(as_feature_matrix(data))
+
+
+def region_validator(region=None):
+    """The default CSV's validator, or the pool's one for the region's current bundle"""
+    # Imported here so scoring without validation doesn't load scipy
+    from input_validation import get_validator
+
+    if region is None:
+        return get_validator()
+    return bundle_pool.validator(region)
+
+
+def _predict_labels(X, chunk_size, n_threads, region=None):
+    lookup = active_grid(region)
+    if lookup is not None:
+        return lookup.label_names[lookup.predict(X)]
+    bundle = get_model(region)
+    cache = prediction_cache if region is None else None
+    starts = range(0, len(X), chunk_size)
+
+    def predict_chunk(start):
+        if cache is not None:
+            return _cached_class_ids(bundle, cache, X[start:start + chunk_size])
+        return bundle.engine.predict(X[start:start + chunk_size])
+
+    if n_threads and n_threads > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            parts = list(pool.map(predict_chunk, starts))
+    else:
+        parts = [predict_chunk(start) for start in starts]
+
+    if not parts:
+        return np.empty(0, dtype=object)
+    return bundle.label_names[np.concatenate(parts).astype(np.intp)]
+
+
+@timed("recommend_top_k")
+def recommend_top_k(features, k=3, chunk_size=50_000, region=None):
+    """Top-k crops with their probabilities from a single probability pass.
+
+    ``features`` is one sample (7 values or a dict) or anything
+    predict_crops_batch accepts. Returns ``(crops, probabilities)``, both
+    shaped (n_samples, k) and sorted by decreasing probability.
+    """
+    X = as_feature_matrix(features)
+    bundle = get_model(region)
+    k = min(k, bundle.engine.n_classes)
+    crops = np.empty((len(X), k), dtype=object)
+    probabilities = np.empty((len(X), k), dtype=np.float64)
+    class_names = bundle.label_names[bundle.engine.classes.astype(np.intp)]
+    for start in range(0, len(X), chunk_size):
+        proba = bundle.engine.predict_proba(X[start:start + chunk_size])
+        # Stable sort breaks ties toward the lower class id, like argmax in predict_crop
+        order = np.argsort(-proba, axis=1, kind="stable")[:, :k]
+        crops[start:start + len(proba)] = class_names[order]
+        probabilities[start:start + len(proba)] = np.take_along_axis(proba, order, axis=1)
+    return crops, probabilities
@@ -0,0 +1,262 @@
+# Incremental model updates from newly labeled field samples
+# Labeled batches are appended to a versioned store (field_samples/): version n is the training
+# CSV plus batches 1..n. An update fits a bounded number of new trees on the rows added since the
+# model's dataset version plus a per-crop sample of older rows, drops the oldest trees beyond
+# --max-trees, and replaces the pickle atomically; running model_script consumers swap it in on
+# their next reload check (model_registry.RELOAD_CHECK_SECONDS) without a restart.
+#
+#   python online_update.py add week_42.csv
+#   python online_update.py update --trees 20 --compare
+#   python online_update.py status
+import argparse
+import json
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.utils.class_weight import compute_sample_weight
+import model_script
+from data_stats import clean_dataset, file_hash
+from forest_engine import compile_forest
+from model_metrics import RANDOM_STATE, TEST_SIZE
+from model_registry import artifact_hash
+from model_script import FEATURES
+from train_model import LABEL_MAPPING_FILE, MODEL_FILE, fit_forest, oversample, write_atomically, write_json
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_PATH = os.path.join(BASE_DIR, "Crop_recommendation_corrected.csv")
+STORE_DIR = os.path.join(BASE_DIR, "field_samples")
+MANIFEST_FILE = "manifest.json"
+UPDATE_METRICS_FILE = "update_metrics.json"
+
+# New trees per update (a quarter of the default forest); with the default --max-trees the
+# same number of oldest trees is dropped. More trees adapt faster to drift in the new rows
+UPDATE_TREES = 50
+# Older training rows per crop mixed into an update, so new trees still know every crop
+REFERENCE_ROWS_PER_CROP = 40
+
+
+class FieldSampleStore:
+    """Append-only labeled batches on top of the training CSV; version n is the CSV plus batches 1..n"""
+
+    def __init__(self, directory=STORE_DIR, base_csv=CSV_PATH):
+        self.directory = directory
+        self.base_csv = base_csv
+        path = os.path.join(directory, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"base_csv": os.path.abspath(base_csv), "batches": []}
+
+    @property
+    def version(self):
+        return len(self.manifest["batches"])
+
+    def append(self, csv_path):
+        """Store a labeled CSV (training CSV columns) as the next batch; returns the new version"""
+        df = clean_dataset(pd.read_csv(csv_path))
+        missing = [col for col in FEATURES + ["label"] if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing columns in {csv_path}: {missing}")
+        df = df[FEATURES + ["label"]]
+        if df[FEATURES].isna().any().any():
+            raise ValueError(f"{csv_path} has rows with missing feature values")
+
+        version = self.version + 1
+        name = f"batch-{version:05d}.csv"
+        write_atomically(self.directory, [(name, lambda path: df.to_csv(path, index=False))])
+        batch = {"version": version, "file": name, "rows": len(df), "sha256": file_hash(os.path.join(self.directory, name)),
+                 "source": os.path.abspath(csv_path), "added_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+        manifest = {**self.manifest, "batches": self.manifest["batches"] + [batch]}
+        # The batch file lands first, so a manifest never names a missing batch
+        write_atomically(self.directory, [(MANIFEST_FILE, write_json(manifest, indent=2))])
+        self.manifest = manifest
+        return version
+
+    def load(self, version=None):
+        """Features, labels and the version that added each row, up to ``version`` (default: latest)"""
+        version = self.version if version is None else version
+        frames = [clean_dataset(pd.read_csv(self.base_csv)).assign(version=0)]
+        for batch in self.manifest["batches"][:version]:
+            frames.append(pd.read_csv(os.path.join(self.directory, batch["file"]), dtype={"label": str})
+                          .assign(version=batch["version"]))
+        df = pd.concat(frames, ignore_index=True)
+        return df[FEATURES].to_numpy(dtype=np.float64), df["label"].to_numpy(dtype=str), df["version"].to_numpy()
+
+
+def held_out(y, versions):
+    """Test rows: train_model's split of the CSV rows and a fixed TEST_SIZE share of every batch"""
+    test = np.zeros(len(y), dtype=bool)
+    base = np.flatnonzero(versions == 0)
+    _, base_test = train_test_split(base, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y[base])
+    test[base_test] = True
+    for version in np.unique(versions[versions > 0]):
+        rows = np.flatnonzero(versions == version)
+        test[rows] = np.random.default_rng(RANDOM_STATE + int(version)).random(len(rows)) < TEST_SIZE
+    return test
+
+
+def update_window(y, versions, train, since, seed, reference_rows=REFERENCE_ROWS_PER_CROP):
+    """Training rows added after version ``since`` plus up to ``reference_rows`` older rows per crop"""
+    rng = np.random.default_rng(seed)
+    window = [np.flatnonzero(train & (versions > since))]
+    older = train & (versions <= since)
+    for class_id in np.unique(y):
+        rows = np.flatnonzero(older & (y == class_id))
+        window.append(rng.choice(rows, min(reference_rows, len(rows)), replace=False))
+    return np.sort(np.concatenate(window))
+
+
+def grow_trees(forest, X, y, n_trees, seed, n_jobs=-1):
+    """``n_trees`` trees built the way the forest builds its own: same parameters, bootstrap and class weights"""
+    # Only parameters the installed tree accepts: the pickle may come from a newer scikit-learn
+    accepted = set(DecisionTreeClassifier().get_params()) - {"random_state"}
+    params = {name: getattr(forest, name) for name in forest.estimator_params if name in accepted}
+    seeds = np.random.RandomState(seed).randint(np.iinfo(np.int32).max, size=n_trees)
+
+    def fit_tree(tree_seed):
+        tree = DecisionTreeClassifier(**params, random_state=tree_seed)
+        weight = np.ones(len(X))
+        sample = None
+        if forest.bootstrap:
+            n_samples = len(X) if forest.max_samples is None else max(round(len(X) * forest.max_samples), 1)
+            # Bootstrap as sample weights (draw counts), so every class stays in each tree's classes_
+            sample = np.random.RandomState(tree_seed).randint(0, len(X), n_samples)
+            weight = np.bincount(sample, minlength=len(X)).astype(np.float64)
+        if forest.class_weight == "balanced_subsample":
+            weight *= compute_sample_weight("balanced", y, indices=sample)
+        elif forest.class_weight is not None:
+            weight *= compute_sample_weight(forest.class_weight, y)
+        return tree.fit(X, y, sample_weight=weight)
+
+    # Tree fitting releases the GIL, as in RandomForestClassifier
+    return Parallel(n_jobs=n_jobs, prefer="threads")(delayed(fit_tree)(tree_seed) for tree_seed in seeds)
+
+
+def accuracy(forest, X, y):
+    return float((compile_forest(forest).predict(X) == y).mean()) if len(y) else None
+
+
+def update(model_dir=BASE_DIR, store=None, n_trees=UPDATE_TREES, max_trees=None, n_jobs=-1, compare=False):
+    """Refresh the forest in ``model_dir`` with the store's new rows; returns the run's metrics, or None"""
+    started = time.perf_counter()
+    store = store or FieldSampleStore()
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    pipeline = joblib.load(model_path)
+    forest, encoder = pipeline["model"], pipeline["encoder"]
+    since = pipeline.get("dataset_version", 0)
+    version = store.version
+    if version <= since:
+        print(f"Model is already at dataset version {since}; nothing to update")
+        return None
+
+    X, labels, versions = store.load(version)
+    unknown = sorted(set(labels) - set(encoder.classes_))
+    if unknown:
+        raise SystemExit(f"New crops {unknown} change the class set; run a full retrain (python train_model.py)")
+    y = encoder.transform(labels)
+    test = held_out(y, versions)
+    new_test = test & (versions > since)
+    before = accuracy(forest, X[test], y[test]), accuracy(forest, X[new_test], y[new_test])
+
+    fit_started = time.perf_counter()
+    window = update_window(y, versions, ~test, since, seed=RANDOM_STATE + version)
+    trees = grow_trees(forest, X[window], y[window], n_trees, seed=RANDOM_STATE + version, n_jobs=n_jobs)
+    max_trees = max_trees or forest.n_estimators
+    drop = max(len(forest.estimators_) + n_trees - max_trees, 0)
+    tree_versions = pipeline.get("tree_versions", [since] * len(forest.estimators_))
+    forest.estimators_ = forest.estimators_[drop:] + trees
+    forest.n_estimators = len(forest.estimators_)
+    fit_seconds = time.perf_counter() - fit_started
+
+    pipeline = {**pipeline, "model": forest, "dataset_version": version,
+                "tree_versions": tree_versions[drop:] + [version] * n_trees}
+    write_atomically(model_dir, [(MODEL_FILE, lambda path: joblib.dump(pipeline, path))])
+    # Same-process consumers swap now; other processes on their next reload check
+    if os.path.abspath(model_script.registry.model_path) == os.path.abspath(model_path):
+        model_script.registry.reload()
+
+    metrics = {
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "dataset_version": version,
+        "previous_dataset_version": since,
+        "new_rows": int((versions > since).sum()),
+        "window_rows": len(window),
+        "trees_added": n_trees,
+        "trees_dropped": drop,
+        "n_estimators": forest.n_estimators,
+        "fit_seconds": fit_seconds,
+        "accuracy_before": before[0],
+        "accuracy_after": accuracy(forest, X[test], y[test]),
+        "new_rows_accuracy_before": before[1],
+        "new_rows_accuracy_after": accuracy(forest, X[new_test], y[new_test]),
+        "artifact_sha256": artifact_hash(model_path, os.path.join(model_dir, LABEL_MAPPING_FILE)),
+        "seconds": time.perf_counter() - started,
+    }
+    if compare:
+        X_train, y_train, _ = oversample(X[~test], y[~test], "auto")
+        start = time.perf_counter()
+        full = fit_forest(X_train, y_train, n_jobs, n_estimators=max_trees, max_depth=forest.max_depth)
+        metrics["full_retrain"] = {
+            "fit_seconds": time.perf_counter() - start,
+            "train_rows": len(X_train),
+            "accuracy": accuracy(full, X[test], y[test]),
+            "new_rows_accuracy": accuracy(full, X[new_test], y[new_test]),
+        }
+    write_atomically(model_dir, [(UPDATE_METRICS_FILE, write_json(metrics, indent=2))])
+    return metrics
+
+
+def print_report(metrics):
+    def percent(value):
+        return "n/a" if value is None else f"{value:.2%}"
+
+    print(f"Dataset version {metrics['previous_dataset_version']} -> {metrics['dataset_version']}: "
+          f"{metrics['new_rows']:,} new rows, {metrics['window_rows']:,} rows in the update window")
+    print(f"Incremental: +{metrics['trees_added']} / -{metrics['trees_dropped']} trees "
+          f"({metrics['n_estimators']} total) in {metrics['fit_seconds']:.2f} s")
+    print(f"  held-out accuracy {percent(metrics['accuracy_before'])} -> {percent(metrics['accuracy_after'])}, "
+          f"new rows {percent(metrics['new_rows_accuracy_before'])} -> {percent(metrics['new_rows_accuracy_after'])}")
+    full = metrics.get("full_retrain")
+    if full:
+        print(f"Full retrain: {metrics['n_estimators']} trees on {full['train_rows']:,} rows in "
+              f"{full['fit_seconds']:.2f} s, held-out accuracy {percent(full['accuracy'])}, "
+              f"new rows {percent(full['new_rows_accuracy'])}")
+        print(f"Incremental update took {metrics['fit_seconds'] / full['fit_seconds']:.1%} of the full retrain's fit time")
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    parser = argparse.ArgumentParser(description="Incremental updates of the crop forest from labeled field samples")
+    parser.add_argument("--store", default=STORE_DIR, help="versioned field sample directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="append a labeled CSV as the next dataset version")
+    add.add_argument("csv")
+    refresh = commands.add_parser("update", help="grow or replace trees with the rows added since the model's version")
+    refresh.add_argument("--model-dir", default=BASE_DIR, help="directory holding the pickle and label map")
+    refresh.add_argument("--trees", type=int, default=UPDATE_TREES, help="new trees fitted in this update")
+    refresh.add_argument("--max-trees", type=int, help="oldest trees beyond this are dropped (default: current count)")
+    refresh.add_argument("--n-jobs", type=int, default=-1)
+    refresh.add_argument("--compare", action="store_true", help="also time a full retrain on the same data")
+    commands.add_parser("status", help="list dataset versions")
+    args = parser.parse_args()
+
+    store = FieldSampleStore(args.store)
+    if args.command == "add":
+        version = store.append(args.csv)
+        print(f"Stored {store.manifest['batches'][-1]['rows']:,} rows as dataset version {version}")
+    elif args.command == "update":
+        result = update(args.model_dir, store, args.trees, args.max_trees, args.n_jobs, args.compare)
+        if result:
+            print_report(result)
+    else:
+        print(f"Base CSV {store.manifest['base_csv']}, dataset version {store.version}")
+        for batch in store.manifest["batches"]:
+            print(f"  v{batch['version']}: {batch['rows']:,} rows from {batch['source']} ({batch['added_at']})")
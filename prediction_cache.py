@@ -0,0 +1,113 @@
+# LRU/TTL cache of predictions keyed on quantized feature vectors
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Step per feature (N, P, K, temperature, humidity, pH, rainfall). Sensors report
+# N/P/K as integers and the climate values with limited precision.
+DEFAULT_RESOLUTION = (1.0, 1.0, 1.0, 0.01, 0.01, 0.01, 0.1)
+
+# Rough per-entry bookkeeping cost (OrderedDict node, value tuple) on top of key and value
+ENTRY_OVERHEAD_BYTES = 120
+
+
+class PredictionCache:
+    """Bounded LRU cache from quantized 7-feature vectors to predicted class ids.
+
+    Entries are evicted least-recently-used first once either ``max_entries``
+    or ``max_bytes`` is exceeded, and expire after ``ttl`` seconds if set. The
+    whole cache is dropped when the model artifact hash it was filled from
+    changes.
+    """
+
+    def __init__(self, resolution=DEFAULT_RESOLUTION, max_entries=100_000, max_bytes=32 * 1024 * 1024,
+                 ttl=None, clock=time.monotonic):
+        self.resolution = np.asarray(resolution, dtype=np.float64)
+        self._steps = tuple(float(step) for step in resolution)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.model_hash = None
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def quantize_row(self, row):
+        # Python's round() and np.rint both round half to even, so both key paths agree
+        return tuple(round(value / step) for value, step in zip(row, self._steps))
+
+    def quantize(self, X):
+        return np.rint(np.asarray(X, dtype=np.float64) / self.resolution).astype(np.int64)
+
+    def dequantize(self, Q):
+        """Representative point of each cell; misses are scored here so results don't depend on arrival order"""
+        return np.asarray(Q, dtype=np.float64) * self.resolution
+
+    def check_model(self, model_hash):
+        with self._lock:
+            if model_hash != self.model_hash:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self.model_hash = model_hash
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry[1] <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = sys.getsizeof(key) + 8 * len(key) + sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,109 @@
+# Process-wide prediction executor for the dashboard: rows submitted by concurrent
+# sessions are coalesced into one vectorized recommend_top_k call on a background thread
+#
+#   executor = PredictionExecutor(k=3)      # share it, e.g. through st.cache_resource
+#   crops, probabilities = executor.predict([90, 42, 43, 20.8, 82, 6.5, 202.9])
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+import model_script
+
+
+class Overloaded(Exception):
+    pass
+
+
+class PredictionExecutor:
+    """Background thread answering many sessions' rows with one recommend_top_k call.
+
+    submit() returns a concurrent.futures.Future resolving to the row's
+    ``(crops, probabilities)``, k of each. Each batch takes whatever queued up
+    while the previous one was scored, so there is no added delay by default;
+    with ``max_wait`` > 0 it behaves like prediction_service.MicroBatcher and
+    waits that long for more rows once batches start to fill up. ``region``
+    selects a bundle_store.py model, as in model_script.
+    """
+
+    def __init__(self, k=3, max_batch=256, max_wait=0.0, max_queue=4_096, region=None):
+        self.k = k
+        self.region = region
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_sizes = deque(maxlen=1_000)
+        self.recent_batch_size = 1.0
+        self.batches = 0
+        self.rejected = 0
+        self._thread = threading.Thread(target=self._run, name="prediction-executor", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        future = Future()
+        try:
+            self.queue.put_nowait((np.asarray(row, dtype=np.float64), future))
+        except queue.Full:
+            self.rejected += 1
+            raise Overloaded("prediction queue is full") from None
+        return future
+
+    def predict(self, row, timeout=None):
+        return self.submit(row).result(timeout)
+
+    def close(self):
+        """Stop the thread after the rows already queued"""
+        self.queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait if self.recent_batch_size > 1.5 else None
+        while len(batch) < self.max_batch and batch[-1] is not None:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            timeout = deadline - time.perf_counter() if deadline is not None else 0
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is None
+            # Sessions that gave up (cancelled futures) are dropped before scoring
+            batch = [(row, future) for row, future in batch[:-1 if stop else None]
+                     if future.set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    rows = np.vstack([row for row, _ in batch])
+                    crops, probabilities = model_script.recommend_top_k(rows, self.k, region=self.region)
+                except Exception as exc:
+                    for _, future in batch:
+                        future.set_exception(exc)
+                else:
+                    for i, (_, future) in enumerate(batch):
+                        future.set_result((crops[i], probabilities[i]))
+                self.batches += 1
+                self.batch_sizes.append(len(batch))
+                self.recent_batch_size = 0.8 * self.recent_batch_size + 0.2 * len(batch)
+            if stop:
+                return
+
+    def stats(self):
+        sizes = np.fromiter(self.batch_sizes, dtype=np.float64)
+        return {
+            "batches": self.batches,
+            "mean_batch_size": round(float(sizes.mean()), 2) if len(sizes) else 0.0,
+            "max_batch_size": int(sizes.max()) if len(sizes) else 0,
+            "queue_depth": self.queue.qsize(),
+            "rejected": self.rejected,
+        }
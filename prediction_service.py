@@ -0,0 +1,299 @@
+# Standalone HTTP prediction service with request micro-batching
+# Run from the repository root: python prediction_service.py --port 8000
+#
+#   POST /predict        {"N": 90, "P": 42, ..., "rainfall": 202.9}  or  [90, 42, ...]
+#   POST /predict/batch  {"samples": [{...}, ...]}  or  {"samples": [[...], ...]}
+#   POST /explain        one sample as for /predict; crop, probability and per-feature contributions
+#                        (501 when the served model is a boosted compress_model.py variant)
+#   Objects may add "region": "<key>" to use that bundle_store.py model instead of the default one
+#   GET  /metrics        latency percentiles, batching and backpressure counters
+#   GET  /health
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from functools import partial
+import numpy as np
+import model_script
+import timings
+from bundle_store import UnknownRegion
+from model_script import FEATURES, CSV_COLUMN_ALIASES
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 501: "Not Implemented",
+                503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class LatencyTracker:
+    """Rolling window of request latencies"""
+
+    def __init__(self, window=10_000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds, ok=True):
+        self.samples.append(seconds)
+        self.count += 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        summary = {"count": self.count, "errors": self.errors}
+        if self.samples:
+            p50, p90, p99 = np.percentile(np.fromiter(self.samples, dtype=np.float64), [50, 90, 99]) * 1e3
+            summary.update({"p50_ms": round(p50, 3), "p90_ms": round(p90, 3), "p99_ms": round(p99, 3),
+                            "max_ms": round(max(self.samples) * 1e3, 3)})
+        return summary
+
+
+class MicroBatcher:
+    """Merges concurrent single-row requests into one vectorized forest call.
+
+    When requests arrive one at a time the batcher dispatches immediately; once
+    batches start to fill up it waits up to ``max_wait`` seconds for more rows.
+    """
+
+    def __init__(self, predict_rows, max_batch=256, max_wait=0.002, max_queue=4_096):
+        self.predict_rows = predict_rows
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_sizes = deque(maxlen=1_000)
+        self.recent_batch_size = 1.0
+        self.batches = 0
+        self.rejected = 0
+
+    async def submit(self, row):
+        if self.queue.full():
+            self.rejected += 1
+            raise Overloaded("prediction queue is full")
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((row, future))
+        return await future
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch and self.recent_batch_size > 1.5:
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                    self._drain(batch)
+
+            rows = np.array([row for row, _ in batch], dtype=np.float64)
+            try:
+                labels = await loop.run_in_executor(None, self.predict_rows, rows)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            else:
+                for (_, future), label in zip(batch, labels):
+                    if not future.done():
+                        future.set_result(label)
+
+            self.batches += 1
+            self.batch_sizes.append(len(batch))
+            self.recent_batch_size = 0.8 * self.recent_batch_size + 0.2 * len(batch)
+
+    def stats(self):
+        sizes = np.fromiter(self.batch_sizes, dtype=np.float64)
+        return {
+            "batches": self.batches,
+            "mean_batch_size": round(float(sizes.mean()), 2) if len(sizes) else 0.0,
+            "max_batch_size": int(sizes.max()) if len(sizes) else 0,
+            "queue_depth": self.queue.qsize(),
+            "rejected": self.rejected,
+        }
+
+
+def parse_sample(payload):
+    """One sample as a dict keyed by feature name (CSV spelling allowed) or a list of 7 values"""
+    if isinstance(payload, dict):
+        payload = {CSV_COLUMN_ALIASES.get(key, key): value for key, value in payload.items()}
+        missing = [name for name in FEATURES if name not in payload]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        payload = [payload[name] for name in FEATURES]
+    if not isinstance(payload, list) or len(payload) != len(FEATURES):
+        raise ValueError(f"Expected an object with {FEATURES} or a list of {len(FEATURES)} numbers")
+    values = []
+    for name, value in zip(FEATURES, payload):
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number, got {value!r}") from None
+    return values
+
+
+def region_of(payload):
+    return payload.get("region") if isinstance(payload, dict) else None
+
+
+class PredictionService:
+    def __init__(self, max_batch=256, max_wait=0.002, max_queue=4_096, max_batch_rows=100_000,
+                 max_concurrent_batches=4):
+        self.batcher = MicroBatcher(model_script.predict_crops_batch, max_batch, max_wait, max_queue)
+        self.batcher_options = (max_batch, max_wait, max_queue)
+        self.region_batchers = {}  # region -> (MicroBatcher, its task), started on the region's first request
+        self.max_batch_rows = max_batch_rows
+        self.batch_slots = asyncio.Semaphore(max_concurrent_batches)
+        self.latency = {"/predict": LatencyTracker(), "/predict/batch": LatencyTracker(),
+                        "/explain": LatencyTracker()}
+        self.handlers = {"/predict": self.predict, "/predict/batch": self.predict_batch, "/explain": self.explain}
+        self.started = time.time()
+
+    def batcher_for(self, region):
+        if region is None:
+            return self.batcher
+        if region not in self.region_batchers:
+            model_script.bundle_pool.current_version(region)  # unknown regions fail here, before a batcher exists
+            batcher = MicroBatcher(partial(model_script.predict_crops_batch, region=region), *self.batcher_options)
+            self.region_batchers[region] = (batcher, asyncio.create_task(batcher.run()))
+        return self.region_batchers[region][0]
+
+    async def predict(self, body):
+        payload = json.loads(body)
+        label = await self.batcher_for(region_of(payload)).submit(parse_sample(payload))
+        return 200, {"crop": label}
+
+    async def predict_batch(self, body):
+        payload = json.loads(body)
+        samples = payload.get("samples") if isinstance(payload, dict) else payload
+        if not isinstance(samples, list) or not samples:
+            raise ValueError('Expected {"samples": [...]} with at least one sample')
+        if len(samples) > self.max_batch_rows:
+            return 413, {"error": f"At most {self.max_batch_rows} samples per request"}
+        if self.batch_slots.locked():
+            raise Overloaded("too many batch requests in flight")
+        X = np.array([parse_sample(sample) for sample in samples], dtype=np.float64)
+        predict = partial(model_script.predict_crops_batch, region=region_of(payload))
+        async with self.batch_slots:
+            labels = await asyncio.get_running_loop().run_in_executor(None, predict, X)
+        return 200, {"crops": labels.tolist()}
+
+    async def explain(self, body):
+        payload = json.loads(body)
+        sample, region = parse_sample(payload), region_of(payload)
+        loop = asyncio.get_running_loop()
+        # Off the event loop: a cold model load or the first explainer build takes seconds
+        bundle = await loop.run_in_executor(None, model_script.get_model, region)
+        if bundle.engine.link != "mean":
+            return 501, {"error": "The served model is boosted; per-feature contributions need an averaged forest"}
+        return 200, await loop.run_in_executor(None, partial(model_script.explain_crop, *sample, region=region))
+
+    def metrics(self):
+        return 200, {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "endpoints": {path: tracker.summary() for path, tracker in self.latency.items()},
+            "batcher": self.batcher.stats(),
+            "region_batchers": {region: batcher.stats() for region, (batcher, _) in self.region_batchers.items()},
+            "model": model_script.load_stats(),
+            "operations": timings.snapshot(),
+        }
+
+    async def dispatch(self, method, path, body):
+        if path in ("/metrics", "/health"):
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return self.metrics() if path == "/metrics" else (200, {"status": "ok"})
+        if path not in self.latency:
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        start = time.perf_counter()
+        try:
+            status, payload = await self.handlers[path](body)
+        except Overloaded as exc:
+            status, payload = 503, {"error": str(exc)}
+        except ValueError as exc:  # includes malformed JSON
+            status, payload = 400, {"error": str(exc)}
+        except UnknownRegion as exc:
+            status, payload = 404, {"error": exc.args[0]}
+        except Exception as exc:
+            status, payload = 500, {"error": str(exc)}
+        self.latency[path].record(time.perf_counter() - start, ok=status == 200)
+        return status, payload
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self.dispatch(method, target.split("?", 1)[0], body)
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, warm_regions=(), **options):
+    service = PredictionService(**options)
+    # Pay the model loads before accepting traffic
+    await asyncio.get_running_loop().run_in_executor(None, model_script.get_model)
+    await asyncio.get_running_loop().run_in_executor(None, model_script.bundle_pool.warm, warm_regions)
+    batcher_task = asyncio.create_task(service.batcher.run())
+    server = await asyncio.start_server(service.handle_connection, host, port, backlog=1_024)
+    print(f"Serving crop predictions on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+        for _, task in service.region_batchers.values():
+            task.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP crop prediction service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=256, help="rows merged into one forest call")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long a batch waits to fill under load")
+    parser.add_argument("--max-queue", type=int, default=4_096, help="queued single requests before answering 503")
+    parser.add_argument("--warm-regions", default="", help="comma-separated bundle_store.py regions to load at startup")
+    args = parser.parse_args()
+    warm_regions = [region for region in args.warm_regions.split(",") if region]
+    try:
+        asyncio.run(serve(args.host, args.port, warm_regions, max_batch=args.max_batch,
+                          max_wait=args.max_wait_ms / 1e3, max_queue=args.max_queue))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,291 @@
+# Stream a large sensor CSV through the model and write one predicted crop per row
+#
+#   python score_csv.py readings.csv predictions.parquet --proba --workers 8
+#
+# Input needs the 7 feature columns (CSV spelling "ph" and "humidity " accepted);
+# the output keeps the input order and any --keep columns, followed by "crop",
+# optionally one "p_<crop>" probability column per class, and with --check-inputs
+# the "input_check" status and "ood_distance" of input_validation.py, checked against the
+# data the scored model was trained on.
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import model_script
+from forest_engine import save_compiled
+from bundle_store import DATASET_FILE
+from input_validation import InputValidator, get_validator
+from model_registry import MODEL_PATH, load_bundle
+from model_script import CSV_COLUMN_ALIASES, FEATURES
+
+CHUNK_ROWS = 100_000
+# Chunks parsed ahead of the writer per worker; bounds memory to a few chunks per process
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+PROGRESS_SECONDS = 2.0
+COLUMN_ALIASES = {**CSV_COLUMN_ALIASES, "humidity ": "humidity"}
+
+
+def label_mapping_for(model_path, label_mapping_path=None):
+    """The given label map, else the label_mapping.json inside an exported directory or next to a pickle"""
+    if label_mapping_path is None:
+        model_dir = model_path if os.path.isdir(model_path) else os.path.dirname(os.path.abspath(model_path))
+        label_mapping_path = os.path.join(model_dir, "label_mapping.json")
+    if not os.path.exists(label_mapping_path):
+        raise FileNotFoundError(f"No label map for {model_path} (looked for {label_mapping_path}); pass --labels")
+    return label_mapping_path
+
+
+def shared_model_dir(model_path, workdir, label_mapping_path=None):
+    """Exported array directory for ``model_path`` that every worker memory-maps instead of unpickling.
+
+    The directory carries the label map the workers decode with: an explicit
+    ``label_mapping_path`` (--labels), else the pickle's embedded map or the
+    label_mapping.json inside or next to the model.
+    """
+    bundled = label_mapping_path is None
+    label_mapping_path = label_mapping_for(model_path, label_mapping_path)
+    directory = os.path.join(workdir, "model")
+    if os.path.isdir(model_path):
+        if bundled:
+            return model_path
+        shutil.copytree(model_path, directory)
+        shutil.copy(label_mapping_path, os.path.join(directory, "label_mapping.json"))
+        return directory
+    # The bundle's map is the pickle's embedded one when it has one, not necessarily the file
+    bundle = load_bundle(model_path, label_mapping_path)
+    label_mapping = bundle.label_mapping
+    if not bundled:
+        with open(label_mapping_path) as f:
+            label_mapping = json.load(f)
+    save_compiled(bundle.engine, directory, features=FEATURES, label_mapping=label_mapping)
+    return directory
+
+
+def validator_for(model_path, dataset_path=None):
+    """InputValidator for the data ``model_path`` was trained on.
+
+    ``dataset_path`` (--dataset) wins; otherwise the dataset.csv of a
+    bundle_store.py version, the CSV recorded in train_model.py's metrics next
+    to the model, or the bundled CSV for the default model.
+    """
+    from train_model import METRICS_FILE
+
+    model_dir = os.path.dirname(os.path.abspath(os.path.normpath(model_path)))
+    metrics_path = os.path.join(model_dir, METRICS_FILE)
+    if dataset_path is None and os.path.exists(os.path.join(model_dir, DATASET_FILE)):
+        dataset_path = os.path.join(model_dir, DATASET_FILE)
+    if dataset_path is None and os.path.exists(metrics_path):
+        with open(metrics_path) as f:
+            dataset_path = json.load(f).get("csv")
+    if dataset_path is not None:
+        return InputValidator.from_csv(dataset_path)
+    if os.path.abspath(model_path) == os.path.abspath(MODEL_PATH):
+        return get_validator()
+    raise ValueError(f"No training data known for {model_path}; pass --dataset to check inputs against")
+
+
+def _init_worker(model_dir):
+    import warnings
+    warnings.filterwarnings("ignore")
+    model_script.use_model(model_dir)
+
+
+def score_rows(X, with_proba=False):
+    """Class ids (and float32 probabilities) for a feature matrix, run inside a worker"""
+    engine = model_script.get_model().engine
+    if not with_proba:
+        return engine.predict(X), None
+    proba = engine.predict_proba(X)
+    return engine.classes[np.argmax(proba, axis=1)], proba.astype(np.float32)
+
+
+def validate_columns(columns, keep):
+    renamed = [COLUMN_ALIASES.get(col, col) for col in columns]
+    missing = [col for col in FEATURES + keep if col not in renamed]
+    if missing:
+        raise SystemExit(f"Input is missing columns {missing}; found {list(columns)}")
+    return dict(zip(columns, renamed))
+
+
+def parse_chunk(chunk, first_row, invalid):
+    """Feature matrix of a chunk plus the mask of rows that have all 7 features as finite numbers"""
+    X = np.column_stack([pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float64)
+                         for col in FEATURES])
+    valid = np.isfinite(X).all(axis=1)
+    if invalid == "fail" and not valid.all():
+        bad = np.flatnonzero(~valid)[:5] + first_row + 2  # 1-based line numbers after the header
+        raise SystemExit(f"Non-numeric or missing feature values on lines {bad.tolist()} "
+                         f"(use --invalid skip or --invalid empty)")
+    return X, valid
+
+
+class OutputWriter:
+    """Appends scored chunks to a temporary file that replaces ``path`` only once every row is written"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._parquet = None
+        self._header = True
+
+    def write(self, frame):
+        if self.fmt == "csv":
+            frame.to_csv(self.tmp_path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.tmp_path, table.schema)
+        self._parquet.write_table(table)
+
+    def _close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def commit(self):
+        self._close()
+        if not os.path.exists(self.tmp_path):
+            raise SystemExit("No rows to write")
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def score_csv(input_path, output_path, fmt=None, chunk_rows=CHUNK_ROWS, workers=None, with_proba=False,
+              keep=(), invalid="fail", model_path=MODEL_PATH, progress=sys.stderr, check_inputs="off",
+              label_mapping_path=None, dataset_path=None):
+    fmt = fmt or ("parquet" if output_path.endswith((".parquet", ".pq")) else "csv")
+    workers = workers or os.cpu_count() or 1
+    keep = list(keep)
+    header = pd.read_csv(input_path, nrows=0).columns
+    renames = validate_columns(header, keep)
+    usecols = [col for col, name in renames.items() if name in FEATURES or name in keep]
+
+    validator = validator_for(model_path, dataset_path) if check_inputs != "off" else None
+
+    with tempfile.TemporaryDirectory(prefix="score-csv-") as workdir:
+        model_dir = shared_model_dir(model_path, workdir, label_mapping_path)
+        _init_worker(model_dir)
+        bundle = model_script.get_model()
+        class_names = bundle.label_names[bundle.engine.classes.astype(np.intp)]
+        if workers > 1:
+            pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_dir,))
+            submit = pool.submit
+        else:
+            pool = None
+
+            def submit(fn, *args):
+                return _Done(fn(*args))
+
+        writer = OutputWriter(output_path, fmt)
+        pending = deque()
+        rows_done = 0
+        started = last_report = time.perf_counter()
+        total_bytes = os.path.getsize(input_path)
+
+        def finish_one():
+            nonlocal rows_done, last_report
+            frame, valid, future = pending.popleft()
+            class_ids, proba = future.result()
+            crops = np.full(len(frame), "", dtype=object)
+            crops[valid] = bundle.label_names[class_ids.astype(np.intp)]
+            frame["crop"] = crops
+            if with_proba:
+                probabilities = np.full((len(frame), len(class_names)), np.nan, dtype=np.float32)
+                probabilities[valid] = proba
+                for j, name in enumerate(class_names):
+                    frame[f"p_{name}"] = probabilities[:, j]
+            writer.write(frame)
+            rows_done += len(frame)
+            now = time.perf_counter()
+            if progress and now - last_report >= PROGRESS_SECONDS:
+                last_report = now
+                done = min(f.tell() / total_bytes, 1.0) if total_bytes else 1.0
+                print(f"{rows_done:,} rows  {done:.0%}  {rows_done / (now - started):,.0f} rows/s",
+                      file=progress, flush=True)
+
+        try:
+            with open(input_path, "rb") as f:
+                # Kept columns are copied verbatim; features are coerced in parse_chunk
+                text_columns = {col: str for col, name in renames.items() if name in keep}
+                reader = pd.read_csv(f, usecols=usecols, chunksize=chunk_rows, dtype=text_columns)
+                first_row = 0
+                for chunk in reader:
+                    chunk = chunk.rename(columns=renames)
+                    X, valid = parse_chunk(chunk, first_row, invalid)
+                    first_row += len(chunk)
+                    if invalid == "skip":
+                        chunk, X, valid = chunk[valid], X[valid], valid[valid]
+                    frame = chunk[keep].reset_index(drop=True)
+                    if validator is not None:
+                        result = validator.check(X)
+                        if check_inputs == "skip":
+                            valid &= result.ok  # out of range / distribution: not scored, crop left empty
+                        frame["input_check"] = result.status_names
+                        frame["ood_distance"] = result.distance.astype(np.float32)
+                    pending.append((frame, valid, submit(score_rows, X[valid], with_proba)))
+                    while len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                        finish_one()
+                while pending:
+                    finish_one()
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    if progress:
+        print(f"Scored {rows_done:,} rows in {seconds:.1f} s ({rows_done / seconds:,.0f} rows/s) "
+              f"with {workers} worker(s) -> {output_path}", file=progress, flush=True)
+    return rows_done, seconds
+
+
+class _Done:
+    """Already-computed stand-in for a Future when scoring in-process"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Score a large crop sensor CSV in streaming chunks")
+    parser.add_argument("input")
+    parser.add_argument("output", help=".csv or .parquet")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the output extension")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, help="scoring processes (default: all cores)")
+    parser.add_argument("--proba", action="store_true", help="add one p_<crop> column per class")
+    parser.add_argument("--keep", default="", help="comma-separated input columns copied to the output")
+    parser.add_argument("--invalid", choices=["fail", "skip", "empty"], default="fail",
+                        help="rows with missing/non-numeric features: stop, drop them, or leave crop empty")
+    parser.add_argument("--model", default=MODEL_PATH, help="pickle, exported directory or compress_model.py variant")
+    parser.add_argument("--labels", help="label_mapping.json (default: inside or next to the model)")
+    parser.add_argument("--check-inputs", choices=["off", "flag", "skip"], default="off",
+                        help="range and out-of-distribution checks: add status columns, or also leave failing rows unscored")
+    parser.add_argument("--dataset", help="training CSV for --check-inputs (default: the one recorded for the model)")
+    args = parser.parse_args()
+    score_csv(args.input, args.output, args.format, args.chunk_rows, args.workers, args.proba,
+              [col for col in args.keep.split(",") if col], args.invalid, args.model, check_inputs=args.check_inputs,
+              label_mapping_path=args.labels, dataset_path=args.dataset)
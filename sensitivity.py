@@ -0,0 +1,127 @@
+# What-if sweeps: the recommended crop over a 1-D or 2-D grid of changes to one field reading
+#
+#   sweep = model_script.sweep_crop([90, 42, 43, 20.9, 82.0, 6.5, 202.9], ["N", "pH"], steps=100)
+#   sweep.crops()        # (100, 100) crop names, rows vary N
+#   sweep.crossings()    # where the recommendation flips along N and along pH from the reading
+import numpy as np
+import pandas as pd
+
+# Default sweep span per feature: the prediction page's input limits
+SWEEP_RANGES = {
+    "N": (0.0, 140.0),
+    "P": (0.0, 145.0),
+    "K": (0.0, 205.0),
+    "temperature": (0.0, 50.0),
+    "humidity": (0.0, 100.0),
+    "pH": (0.0, 14.0),
+    "rainfall": (0.0, 300.0),
+}
+# Grid points per swept feature
+DEFAULT_STEPS = 100
+MAX_SWEPT_FEATURES = 2
+
+
+def sweep_axes(features, steps=DEFAULT_STEPS, ranges=None):
+    """Evenly spaced values for each swept feature; ``ranges`` overrides SWEEP_RANGES per feature"""
+    if not 1 <= len(features) <= MAX_SWEPT_FEATURES or len(set(features)) != len(features):
+        raise ValueError(f"Sweep 1 to {MAX_SWEPT_FEATURES} distinct features, got {list(features)}")
+    unknown = [name for name in features if name not in SWEEP_RANGES]
+    if unknown:
+        raise ValueError(f"Unknown features: {unknown}")
+    ranges = {**SWEEP_RANGES, **(ranges or {})}
+    return [np.linspace(*ranges[name], steps) for name in features]
+
+
+def sweep_rows(base, columns, axes):
+    """The reading itself, every grid point, then each feature's own axis with the others held at the reading"""
+    base = np.asarray(base, dtype=np.float64)
+    mesh = np.meshgrid(*axes, indexing="ij")
+    grid = np.tile(base, (mesh[0].size, 1))
+    for column, values in zip(columns, mesh):
+        grid[:, column] = values.ravel()
+    lines = []
+    for column, values in zip(columns, axes):
+        line = np.tile(base, (len(values), 1))
+        line[:, column] = values
+        lines.append(line)
+    return np.vstack([base[None], grid, *lines])
+
+
+def score_sweep(engine, base, columns, axes):
+    """Class ids over sweep_rows(base, columns, axes), scoring each distinct cell once.
+
+    Values of a feature between the same two of the forest's split thresholds
+    on it send every tree down the same path, so one value per interval is
+    scored and the result is broadcast back over the full grid.
+    """
+    split = engine.children[0::2] != np.arange(engine.n_nodes)
+    representatives, expand = [], []
+    for column, values in zip(columns, axes):
+        thresholds = np.unique(engine.threshold[split & (engine.feature == column)])
+        # x <= threshold goes left, so searchsorted's "left" side numbers the intervals;
+        # the engine compares float32 inputs, so the values are binned as float32 too
+        intervals = np.searchsorted(thresholds, np.asarray(values, dtype=np.float32))
+        _, first, inverse = np.unique(intervals, return_index=True, return_inverse=True)
+        representatives.append(values[first])
+        expand.append(inverse.ravel())
+    scored = engine.predict(sweep_rows(base, columns, representatives)).astype(np.intp)
+    shape = tuple(len(values) for values in representatives)
+    grid_size = int(np.prod(shape))
+    grid = scored[1:1 + grid_size].reshape(shape)[np.ix_(*expand)]
+    lines = np.split(scored[1 + grid_size:], np.cumsum(shape)[:-1])
+    return np.concatenate([scored[:1], grid.ravel(), *(line[inverse] for line, inverse in zip(lines, expand))])
+
+
+class Sweep:
+    """Recommended class ids over a grid around one reading.
+
+    ``class_ids`` (as scored over sweep_rows) becomes ``base_class`` and a grid
+    with one axis per swept feature, in the order given.
+    ``lines[i]`` holds the class along ``axes[i]`` with every other feature at
+    the reading, so its changes are the boundary crossings one input at a time.
+    """
+
+    def __init__(self, base, features, columns, axes, class_ids, label_names):
+        self.base = np.asarray(base, dtype=np.float64)
+        self.features = list(features)
+        self.columns = list(columns)
+        self.axes = axes
+        self.label_names = np.asarray(label_names, dtype=object)
+        shape = tuple(len(values) for values in axes)
+        grid_size = int(np.prod(shape))
+        self.base_class = int(class_ids[0])
+        self.class_ids = class_ids[1:1 + grid_size].reshape(shape)
+        self.lines = np.split(class_ids[1 + grid_size:], np.cumsum(shape)[:-1])
+
+    @property
+    def base_crop(self):
+        return self.label_names[self.base_class]
+
+    def crops(self):
+        return self.label_names[self.class_ids]
+
+    def crossings(self):
+        """DataFrame of recommendation flips along each feature, nearest to the reading first.
+
+        ``value`` is the midpoint between the two grid points on either side of
+        the flip and ``change`` is its distance from the reading.
+        """
+        parts = []
+        for feature, column, values, line in zip(self.features, self.columns, self.axes, self.lines):
+            flips = np.flatnonzero(line[1:] != line[:-1])
+            value = (values[flips] + values[flips + 1]) / 2
+            part = pd.DataFrame({
+                "feature": feature,
+                "value": value,
+                "change": value - self.base[column],
+                "from": self.label_names[line[flips]],
+                "to": self.label_names[line[flips + 1]],
+            })
+            parts.append(part.iloc[np.argsort(np.abs(part["change"].to_numpy()), kind="stable")])
+        return pd.concat(parts, ignore_index=True)
+
+    def frame(self):
+        """One row per grid cell: the swept features' values and the recommended crop"""
+        mesh = np.meshgrid(*self.axes, indexing="ij")
+        columns = {name: values.ravel() for name, values in zip(self.features, mesh)}
+        return pd.DataFrame({**columns, "crop": self.crops().ravel()})
@@ -0,0 +1,145 @@
+# Exactness checks: compiled engine vs the sklearn forest, online updates, what-if sweeps
+# Run from the repository root:
+#   python -m pytest -q tests
+# benchmarks/run_suite.py runs the same PARITY_CHECKS and fails its run on any mismatch
+import os
+import shutil
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PATH = os.path.join(REPO_DIR, "Crop_recommendation_corrected.csv")
+# Largest |probability difference| between the compiled engine and sklearn still counted as equal
+PROBA_TOLERANCE = 1e-9
+
+PARITY_CHECKS = []
+
+
+def parity_check(fn):
+    """Register a function returning {check name: mismatching rows}; any nonzero count is a failure"""
+    PARITY_CHECKS.append(fn)
+    return fn
+
+
+def field_batch(n_rows, seed=0):
+    """The CSV resampled to ``n_rows`` with 2% feature noise, spelled like a field upload"""
+    import data_stats
+    base = data_stats.load_dataset(CSV_PATH)
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(base), n_rows)
+    data = {}
+    for feature in data_stats.FEATURES:
+        values = base[feature].to_numpy(dtype=np.float32)[picks]
+        data[feature] = values * (1 + rng.normal(0, 0.02, n_rows).astype(np.float32))
+    data["label"] = base["label"].to_numpy()[picks]
+    return pd.DataFrame(data).astype(data_stats.CSV_DTYPES).rename(columns={"pH": "ph"})
+
+
+@parity_check
+def compiled_forest_parity():
+    # forest_engine.py verify's row sets, plus the same engine exported and memory-mapped back
+    import joblib
+    from forest_engine import check_parity, compile_forest, load_compiled, parity_rows, save_compiled
+    from model_registry import MODEL_PATH
+
+    forest = joblib.load(MODEL_PATH)["model"]
+    engine = compile_forest(forest)
+    X_csv, X_random = parity_rows(CSV_PATH)
+    export_dir = tempfile.mkdtemp(prefix="parity-")
+    try:
+        save_compiled(engine, os.path.join(export_dir, "model"))
+        mapped = load_compiled(os.path.join(export_dir, "model"), mmap_mode="r")
+        return {
+            "compiled vs sklearn, CSV rows": len(check_parity(engine, forest, X_csv)),
+            "compiled vs sklearn, random rows": len(check_parity(engine, forest, X_random)),
+            "compiled vs sklearn, CSV row by row": int(
+                (np.concatenate([engine.predict(row[None]) for row in X_csv]) != forest.predict(X_csv)).sum()),
+            "compiled vs sklearn, probabilities": int(
+                (np.abs(engine.predict_proba(X_random) - forest.predict_proba(X_random)) > PROBA_TOLERANCE)
+                .any(axis=1).sum()),
+            "exported arrays vs sklearn, random rows": len(check_parity(mapped, forest, X_random)),
+        }
+    finally:
+        shutil.rmtree(export_dir)
+
+
+@parity_check
+def online_update_parity():
+    # One small update on a copy of the model: the new pickle compiles exactly and the registry swaps it in
+    import joblib
+    import model_script
+    import online_update
+    from forest_engine import check_parity, compile_forest, parity_rows
+    from model_registry import LABEL_MAPPING_PATH, MODEL_PATH, ModelRegistry, artifact_hash
+
+    work_dir = tempfile.mkdtemp(prefix="parity-update-")
+    saved_registry = model_script.registry
+    try:
+        model_dir = os.path.join(work_dir, "model")
+        os.makedirs(model_dir)
+        shutil.copy(MODEL_PATH, os.path.join(model_dir, online_update.MODEL_FILE))
+        shutil.copy(LABEL_MAPPING_PATH, os.path.join(model_dir, online_update.LABEL_MAPPING_FILE))
+        batch_path = os.path.join(work_dir, "batch.csv")
+        field_batch(300, seed=2).to_csv(batch_path, index=False)
+        store = online_update.FieldSampleStore(os.path.join(work_dir, "samples"), CSV_PATH)
+        store.append(batch_path)
+
+        model_path = os.path.join(model_dir, online_update.MODEL_FILE)
+        label_mapping_path = os.path.join(model_dir, online_update.LABEL_MAPPING_FILE)
+        model_script.registry = ModelRegistry(model_path, label_mapping_path, reload_check_seconds=0)
+        model_script.get_model()
+        online_update.update(model_dir, store, n_trees=10, n_jobs=1)
+        forest = joblib.load(model_path)["model"]
+        served = model_script.get_model()
+        X_csv, X_random = parity_rows(CSV_PATH)
+        return {
+            "updated forest compiled vs sklearn, CSV rows": len(check_parity(compile_forest(forest), forest, X_csv)),
+            "updated forest compiled vs sklearn, random rows": len(
+                check_parity(compile_forest(forest), forest, X_random)),
+            "served model after update vs sklearn, random rows": len(check_parity(served.engine, forest, X_random)),
+            "served model not reloaded": int(served.artifact_hash != artifact_hash(model_path, label_mapping_path)),
+        }
+    finally:
+        model_script.registry = saved_registry
+        shutil.rmtree(work_dir)
+
+
+@parity_check
+def sweep_parity():
+    # Threshold-interval dedupe in sensitivity.score_sweep vs scoring every sweep row
+    import model_script
+    from forest_engine import parity_rows
+    from sensitivity import score_sweep, sweep_axes, sweep_rows
+
+    engine = model_script.get_model().engine
+    _, bases = parity_rows(CSV_PATH, random_rows=20)
+    results = {}
+    for features, steps in [(["N"], 150), (["N", "P"], 60), (["temperature", "rainfall"], 60), (["K", "pH"], 60)]:
+        columns = [model_script.FEATURES.index(name) for name in features]
+        axes = sweep_axes(features, steps)
+        results[f"sweep {'+'.join(features)} vs every cell"] = sum(
+            int((score_sweep(engine, base, columns, axes) != engine.predict(sweep_rows(base, columns, axes))).sum())
+            for base in bases)
+    return results
+
+
+def assert_no_mismatches(check):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # sklearn's pickle version notes
+        results = check()
+    mismatches = {name: rows for name, rows in results.items() if rows}
+    assert not mismatches, f"mismatching rows: {mismatches}"
+
+
+def test_compiled_forest_parity():
+    assert_no_mismatches(compiled_forest_parity)
+
+
+def test_online_update_parity():
+    assert_no_mismatches(online_update_parity)
+
+
+def test_sweep_parity():
+    assert_no_mismatches(sweep_parity)
@@ -0,0 +1,148 @@
+# In-process timing of the hot paths (model load, prediction, data load, image rendering)
+#
+#   @timed("predict_crop")          # decorator
+#   with timed("render overview"):  # context manager
+#
+# Set CROP_TIMINGS=0 to turn recording off; decorated functions then cost one flag check.
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Upper bounds (seconds) of the cumulative buckets in the Prometheus export
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Most recent samples per operation used for the rolling percentiles
+WINDOW = 2_048
+METRIC_NAME = "crop_dashboard_operation_duration_seconds"
+
+enabled = os.environ.get("CROP_TIMINGS", "1") != "0"
+_histograms = {}
+_lock = threading.Lock()
+
+
+class RollingHistogram:
+    """Lifetime bucket counts plus a ring buffer of the last ``window`` durations"""
+
+    def __init__(self, window=WINDOW, buckets=BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.samples = np.zeros(window)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples[self.count % len(self.samples)] = seconds
+            self.count += 1
+            self.total += seconds
+            self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def summary(self):
+        with self._lock:
+            recent = self.samples[:min(self.count, len(self.samples))].copy()
+            count, total = self.count, self.total
+        summary = {"count": count, "total_seconds": total, "mean_ms": total / count * 1e3 if count else 0.0}
+        if len(recent):
+            p50, p90, p99 = np.percentile(recent, [50, 90, 99]) * 1e3
+            summary.update({"p50_ms": p50, "p90_ms": p90, "p99_ms": p99, "max_ms": recent.max() * 1e3,
+                            "window": len(recent)})
+        return summary
+
+
+def histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(name, RollingHistogram())
+    return hist
+
+
+def record(name, seconds):
+    if enabled:
+        histogram(name).record(seconds)
+
+
+class timed:
+    """Decorator or context manager recording wall time under ``name``"""
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram(name).record(time.perf_counter() - start)
+        return wrapper
+
+    def __enter__(self):
+        if enabled:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            histogram(self.name).record(time.perf_counter() - self._start)
+            self._start = None
+        return False
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def _sorted_histograms():
+    # Copied under the lock: another thread may be adding a histogram meanwhile
+    with _lock:
+        return sorted(_histograms.items())
+
+
+def snapshot():
+    """{operation: summary} for everything recorded so far, sorted by name"""
+    return {name: hist.summary() for name, hist in _sorted_histograms()}
+
+
+def to_json():
+    return json.dumps({"enabled": enabled, "pid": os.getpid(), "operations": snapshot()}, indent=2)
+
+
+def to_prometheus():
+    """Prometheus text exposition format, one histogram labelled by operation"""
+    lines = [f"# HELP {METRIC_NAME} Wall time of instrumented dashboard operations",
+             f"# TYPE {METRIC_NAME} histogram"]
+    for name, hist in _sorted_histograms():
+        with hist._lock:
+            counts = list(hist.bucket_counts)
+            count, total = hist.count, hist.total
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, bucket_count in zip(hist.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{METRIC_NAME}_bucket{{operation="{label}",le="{bound:g}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_bucket{{operation="{label}",le="+Inf"}} {count}')
+        lines.append(f'{METRIC_NAME}_sum{{operation="{label}"}} {total:.9f}')
+        lines.append(f'{METRIC_NAME}_count{{operation="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
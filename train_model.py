@@ -0,0 +1,254 @@
+# Command-line training pipeline for the crop recommendation Random Forest
+# (the train_random_forest steps of Notebooks/Final_csv.ipynb without the notebook)
+#
+#   python train_model.py                                   # notebook settings, all cores
+#   python train_model.py --search --trees 50,100,200 --depths 6,8,10,none --tolerance 0.005
+import argparse
+import copy
+import json
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+from data_stats import clean_dataset, file_hash
+from forest_engine import compile_forest
+from model_metrics import RANDOM_STATE, TEST_SIZE
+from model_registry import artifact_hash
+from model_script import FEATURES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_FILE = "crop_recommender_rf.pkl"
+LABEL_MAPPING_FILE = "label_mapping.json"
+METRICS_FILE = "training_metrics.json"
+
+# Hyperparameters of train_random_forest in the notebook
+DEFAULT_PARAMS = {"n_estimators": 200, "max_depth": 10, "min_samples_split": 5,
+                  "class_weight": "balanced_subsample"}
+
+# Calls timed per candidate for single-row latency (median), rows for batch throughput
+LATENCY_CALLS = 300
+LATENCY_BATCH_ROWS = 20_000
+
+
+def load_training_data(csv_path):
+    df = clean_dataset(pd.read_csv(csv_path))
+    encoder = LabelEncoder()
+    y = encoder.fit_transform(df["label"])
+    return df[FEATURES].to_numpy(dtype=np.float64), y, encoder
+
+
+def oversample(X, y, smote):
+    """SMOTE on the training split, as in the notebook; needs imbalanced-learn"""
+    if smote == "off":
+        return X, y, False
+    try:
+        from imblearn.over_sampling import SMOTE
+    except ImportError:
+        if smote == "on":
+            raise SystemExit("--smote on needs imbalanced-learn (pip install imbalanced-learn)")
+        print("imbalanced-learn not installed, training without SMOTE")
+        return X, y, False
+    X, y = SMOTE(random_state=RANDOM_STATE).fit_resample(X, y)
+    return X, y, True
+
+
+def fit_forest(X, y, n_jobs, **params):
+    forest = RandomForestClassifier(**{**DEFAULT_PARAMS, **params}, random_state=RANDOM_STATE, n_jobs=n_jobs)
+    forest.fit(X, y)
+    return forest
+
+
+def first_trees(forest, n_trees):
+    # With a fixed random_state the first k trees are exactly the trees of an
+    # n_estimators=k forest, so one fit per depth covers every tree count
+    subset = copy.copy(forest)
+    subset.estimators_ = forest.estimators_[:n_trees]
+    subset.n_estimators = n_trees
+    return subset
+
+
+def score(forest, X_test, y_test):
+    """Accuracy, model size and prediction latency of one candidate on the serving engine"""
+    return {"n_estimators": forest.n_estimators, "max_depth": forest.max_depth,
+            **score_engine(compile_forest(forest), X_test, y_test)}
+
+
+def score_engine(engine, X_test, y_test):
+    y_pred = engine.predict(X_test)
+    precision, recall, f1, _ = precision_recall_fscore_support(y_test, y_pred, average="weighted", zero_division=0)
+
+    rows = X_test[np.arange(LATENCY_CALLS) % len(X_test)]
+    for row in rows[:20]:  # warm up before timing
+        engine.predict(row)
+    timings = np.empty(LATENCY_CALLS)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        engine.predict(row)
+        timings[i] = time.perf_counter() - start
+    single_us = float(np.median(timings)) * 1e6  # median, so one scheduler hiccup doesn't decide the search
+    batch = X_test[np.arange(LATENCY_BATCH_ROWS) % len(X_test)]
+    start = time.perf_counter()
+    engine.predict(batch)
+    batch_us = (time.perf_counter() - start) / LATENCY_BATCH_ROWS * 1e6
+
+    size = sum(getattr(engine, name).nbytes for name in ["feature", "threshold", "children", "value"])
+    return {
+        "accuracy": accuracy_score(y_test, y_pred),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "n_nodes": engine.n_nodes,
+        "size_bytes": int(size),
+        "single_row_us": single_us,
+        "batch_us_per_row": batch_us,
+    }
+
+
+def search(X_train, y_train, X_test, y_test, trees, depths, n_jobs, **params):
+    """Score every (tree count, depth) pair; the trees of each fit are built in parallel"""
+    results = []
+    forests = {}
+    for depth in depths:
+        start = time.perf_counter()
+        forest = fit_forest(X_train, y_train, n_jobs, **{**params, "n_estimators": max(trees), "max_depth": depth})
+        print(f"depth {depth}: fitted {max(trees)} trees in {time.perf_counter() - start:.2f} s")
+        for n_trees in sorted(trees):
+            candidate = first_trees(forest, n_trees)
+            results.append(score(candidate, X_test, y_test))
+            forests[(n_trees, depth)] = candidate
+    return results, forests
+
+
+def choose(results, tolerance=0.0, max_latency_us=None):
+    """Fastest candidate within ``tolerance`` of the best accuracy (and under the latency budget)"""
+    eligible = [r for r in results if max_latency_us is None or r["single_row_us"] <= max_latency_us]
+    if not eligible:
+        raise SystemExit(f"No candidate predicts a row in under {max_latency_us} us")
+    best = max(r["accuracy"] for r in eligible)
+    close = [r for r in eligible if r["accuracy"] >= best - tolerance]
+    return min(close, key=lambda r: (r["single_row_us"], r["size_bytes"]))
+
+
+def write_atomically(out_dir, files):
+    """Write every file to a temporary name first, then move them into place in the given order"""
+    os.makedirs(out_dir, exist_ok=True)
+    pending = []
+    for name, write in files:
+        tmp = os.path.join(out_dir, f".{name}.{os.getpid()}.tmp")
+        write(tmp)
+        pending.append((tmp, os.path.join(out_dir, name)))
+    for tmp, path in pending:
+        os.replace(tmp, path)
+
+
+def write_json(data, indent=None):
+    def write(path):
+        with open(path, "w") as f:
+            json.dump(data, f, indent=indent)
+    return write
+
+
+def train(csv_path, out_dir, n_jobs=-1, smote="auto", trees=None, depths=None, tolerance=0.0,
+          max_latency_us=None, **params):
+    started = time.perf_counter()
+    X, y, encoder = load_training_data(csv_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE,
+                                                        stratify=y)
+    X_train, y_train, smoted = oversample(X_train, y_train, smote)
+    print(f"{len(X)} rows, {len(encoder.classes_)} crops, {len(X_train)} training rows"
+          + (" after SMOTE" if smoted else ""))
+
+    candidates = []
+    if trees or depths:
+        trees = trees or [params.get("n_estimators", DEFAULT_PARAMS["n_estimators"])]
+        depths = depths or [params.get("max_depth", DEFAULT_PARAMS["max_depth"])]
+        candidates, forests = search(X_train, y_train, X_test, y_test, trees, depths, n_jobs, **params)
+        print(f"{'trees':>6} {'depth':>6} {'accuracy':>9} {'nodes':>8} {'size KB':>9} {'row us':>8} {'batch us':>9}")
+        for r in candidates:
+            print(f"{r['n_estimators']:>6} {str(r['max_depth']):>6} {r['accuracy']:>9.4f} {r['n_nodes']:>8} "
+                  f"{r['size_bytes'] / 1e3:>9.0f} {r['single_row_us']:>8.1f} {r['batch_us_per_row']:>9.2f}")
+        chosen = choose(candidates, tolerance, max_latency_us)
+        forest = forests[(chosen["n_estimators"], chosen["max_depth"])]
+        print(f"Chose {chosen['n_estimators']} trees, max depth {chosen['max_depth']}")
+    else:
+        start = time.perf_counter()
+        forest = fit_forest(X_train, y_train, n_jobs, **params)
+        print(f"Fitted {forest.n_estimators} trees in {time.perf_counter() - start:.2f} s")
+        chosen = score(forest, X_test, y_test)
+
+    label_mapping = {str(k): int(v) for k, v in zip(encoder.classes_, encoder.transform(encoder.classes_))}
+    # The pickle carries its own label map, so no reload can pair it with another run's label_mapping.json
+    pipeline = {"model": forest, "encoder": encoder, "features": FEATURES, "label_mapping": label_mapping}
+    metrics = {
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "csv": os.path.abspath(csv_path),
+        "csv_sha256": file_hash(csv_path),
+        "rows": len(X),
+        "train_rows": len(X_train),
+        "test_rows": len(X_test),
+        "smote": smoted,
+        "params": {**DEFAULT_PARAMS, **params, "n_estimators": forest.n_estimators, "max_depth": forest.max_depth,
+                   "random_state": RANDOM_STATE},
+        "sklearn_version": sklearn.__version__,
+        "metrics": chosen,
+        "search": candidates,
+        "seconds": time.perf_counter() - started,
+    }
+    write_atomically(out_dir, [
+        (LABEL_MAPPING_FILE, write_json(label_mapping)),
+        (MODEL_FILE, lambda path: joblib.dump(pipeline, path)),
+    ])
+    model_path = os.path.join(out_dir, MODEL_FILE)
+    metrics["artifact_sha256"] = artifact_hash(model_path, os.path.join(out_dir, LABEL_MAPPING_FILE))
+    write_atomically(out_dir, [(METRICS_FILE, write_json(metrics, indent=2))])
+    print(f"Accuracy {chosen['accuracy']:.4f}; wrote {MODEL_FILE}, {LABEL_MAPPING_FILE} and {METRICS_FILE} "
+          f"to {out_dir} in {metrics['seconds']:.1f} s")
+    return metrics
+
+
+def int_list(text):
+    return [int(value) for value in text.split(",")]
+
+
+def depth(text):
+    return None if text.lower() == "none" else int(text)
+
+
+def depth_list(text):
+    return [depth(value) for value in text.split(",")]
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+    parser = argparse.ArgumentParser(description="Train the crop recommendation Random Forest")
+    parser.add_argument("--csv", default=os.path.join(BASE_DIR, "Crop_recommendation_corrected.csv"))
+    parser.add_argument("--out-dir", default=BASE_DIR, help="where the pickle, label map and metrics JSON go")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores used to build trees (-1 = all)")
+    parser.add_argument("--smote", choices=["auto", "on", "off"], default="auto",
+                        help="oversample the training split (auto: when imbalanced-learn is installed)")
+    parser.add_argument("--n-estimators", type=int, default=DEFAULT_PARAMS["n_estimators"])
+    parser.add_argument("--max-depth", type=depth, default=DEFAULT_PARAMS["max_depth"])
+    parser.add_argument("--min-samples-split", type=int, default=DEFAULT_PARAMS["min_samples_split"])
+    parser.add_argument("--search", action="store_true", help="search --trees x --depths and keep the best trade-off")
+    parser.add_argument("--trees", type=int_list, default=[25, 50, 100, 200])
+    parser.add_argument("--depths", type=depth_list, default=[6, 8, 10, None])
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="accuracy the search may give up for a faster, smaller forest")
+    parser.add_argument("--max-latency-us", type=float, help="only keep candidates this fast per single row")
+    args = parser.parse_args()
+
+    options = {"n_jobs": args.n_jobs, "smote": args.smote, "min_samples_split": args.min_samples_split}
+    if args.search:
+        options.update(trees=args.trees, depths=args.depths, tolerance=args.tolerance,
+                       max_latency_us=args.max_latency_us)
+    else:
+        options.update(n_estimators=args.n_estimators, max_depth=args.max_depth)
+    train(args.csv, args.out_dir, **options)